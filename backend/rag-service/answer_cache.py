@@ -0,0 +1,96 @@
+"""
+Answer Cache - Cache câu trả lời cho /api/v1/question
+
+Người dùng hỏi lặp lại rất nhiều câu giống nhau, mỗi câu tốn 1 lần gọi
+Gemini (có thể tới 60s). Cache giữ câu trả lời theo câu hỏi đã chuẩn hóa
++ model + phiên bản dữ liệu, có TTL và giới hạn kích thước (LRU).
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]', re.UNICODE)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_question(question):
+    """
+    Chuẩn hóa câu hỏi để làm cache key
+
+    Unicode NFC, lowercase, bỏ dấu câu, gộp khoảng trắng.
+    VD: "Mức hỗ trợ  học nghề?" -> "mức hỗ trợ học nghề"
+    """
+    text = unicodedata.normalize('NFC', question or '').lower()
+    text = PUNCTUATION_PATTERN.sub(' ', text)
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
+class AnswerCache:
+    """
+    Cache LRU có TTL, thread-safe
+
+    Args:
+        max_entries: Số câu trả lời tối đa, vượt quá thì bỏ entry ít dùng nhất
+        ttl: Thời gian sống của mỗi entry (giây)
+    """
+
+    def __init__(self, max_entries=1000, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(question, model, corpus_version):
+        return (normalize_question(question), model, str(corpus_version))
+
+    def get(self, key):
+        """Trả về value đã cache hoặc None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Thông tin cache cho /health"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
@@ -3,12 +3,28 @@ VN-Law-Mini - RAG Service with Real HuggingFace API
 Không có mock mode - kết nối thật với AI model
 """
 
+import json
 import os
-import requests
-from flask import Flask, request, jsonify
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 
+from answer_cache import AnswerCache, normalize_question
+from bm25_index import BM25Index
+from http_client import PooledClient
+from retrieval import HybridRetriever
+from semantic_cache import SemanticCache
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from models.batching_embedder import BatchingEmbedder, get_query_embedder
+from models.embedding_cache import normalize_text
+from models.vector_store import VectorStore
+
 load_dotenv()
 
 app = Flask(__name__)
@@ -21,6 +37,48 @@ MODEL_NAME = GEMINI_MODEL
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_ANON_KEY = os.getenv('SUPABASE_ANON_KEY')
 
+# Retrieval engine: 'supabase' (RPC search_articles) hoặc 'bm25' (index trong process)
+RETRIEVAL_ENGINE = os.getenv('RETRIEVAL_ENGINE', 'supabase').lower()
+BM25_PAGE_SIZE = int(os.getenv('BM25_PAGE_SIZE', 1000))
+BM25_REFRESH_INTERVAL = int(os.getenv('BM25_REFRESH_INTERVAL', 300))
+BM25_FULL_RELOAD_INTERVAL = int(os.getenv('BM25_FULL_RELOAD_INTERVAL', 3600))
+
+# HTTP connection pool (keep-alive) cho Supabase và Gemini
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 10))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 20))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+SUPABASE_TIMEOUT = float(os.getenv('SUPABASE_TIMEOUT', 10))
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', 60))
+GEMINI_API_BASE = 'https://generativelanguage.googleapis.com/v1beta'
+
+# Fan-out song song cho các query theo từng từ khóa (fallback ilike)
+KEYWORD_SEARCH_WORKERS = int(os.getenv('KEYWORD_SEARCH_WORKERS', 8))
+KEYWORD_SEARCH_DEADLINE = float(os.getenv('KEYWORD_SEARCH_DEADLINE', 5))
+
+# Cache câu trả lời (key = câu hỏi chuẩn hóa + model + phiên bản dữ liệu)
+ANSWER_CACHE_ENABLED = os.getenv('ANSWER_CACHE_ENABLED', 'true').lower() == 'true'
+ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', 1000))
+ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', 3600))
+CORPUS_VERSION = os.getenv('CORPUS_VERSION', '1')
+
+# Semantic cache: trả lời lại cho các câu hỏi diễn đạt khác nhưng cùng ý
+SEMANTIC_CACHE_ENABLED = os.getenv('SEMANTIC_CACHE_ENABLED', 'false').lower() == 'true'
+SEMANTIC_CACHE_SIZE = int(os.getenv('SEMANTIC_CACHE_SIZE', 2000))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.92))
+
+# Hybrid retrieval: gộp tìm kiếm từ khóa + vector (VectorStore) bằng reciprocal-rank fusion
+HYBRID_SEARCH_ENABLED = os.getenv('HYBRID_SEARCH_ENABLED', 'false').lower() == 'true'
+HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', 10))
+HYBRID_RRF_K = int(os.getenv('HYBRID_RRF_K', 60))
+HYBRID_LEXICAL_TIMEOUT = float(os.getenv('HYBRID_LEXICAL_TIMEOUT', 3))
+HYBRID_VECTOR_TIMEOUT = float(os.getenv('HYBRID_VECTOR_TIMEOUT', 3))
+# Số lần gọi tối đa đang chạy của mỗi nhánh hybrid (đầy thì bỏ qua nhánh cho câu hỏi mới)
+HYBRID_MAX_IN_FLIGHT = int(os.getenv('HYBRID_MAX_IN_FLIGHT', 8))
+
+# Batch endpoint POST /api/v1/questions
+BATCH_MAX_QUESTIONS = int(os.getenv('BATCH_MAX_QUESTIONS', 500))
+BATCH_GENERATION_CONCURRENCY = int(os.getenv('BATCH_GENERATION_CONCURRENCY', 8))
+
 
 print("="*60)
 print("🚀 VN-Law-Mini RAG Service - GOOGLE GEMINI")
@@ -28,25 +86,274 @@ print("="*60)
 print(f"Gemini API Key: {'✅ OK' if GEMINI_API_KEY else '❌ Missing'}")
 print(f"Supabase: {'✅ OK' if SUPABASE_URL else '❌ Missing'}")
 print(f"Model: {MODEL_NAME}")
+print(f"Retrieval: {RETRIEVAL_ENGINE}")
 print("="*60)
 
 
+def supabase_headers():
+    """Headers chung cho Supabase REST API"""
+    return {
+        'apikey': SUPABASE_ANON_KEY,
+        'Authorization': f'Bearer {SUPABASE_ANON_KEY}',
+        'Content-Type': 'application/json'
+    }
+
+
+supabase_http = PooledClient(
+    f"{SUPABASE_URL}/rest/v1",
+    headers=supabase_headers(),
+    timeout=SUPABASE_TIMEOUT,
+    connect_timeout=HTTP_CONNECT_TIMEOUT,
+    pool_connections=HTTP_POOL_CONNECTIONS,
+    pool_maxsize=HTTP_POOL_MAXSIZE
+)
+
+gemini_http = PooledClient(
+    GEMINI_API_BASE,
+    headers={
+        'Content-Type': 'application/json',
+        'x-goog-api-key': GEMINI_API_KEY or ''
+    },
+    timeout=GEMINI_TIMEOUT,
+    connect_timeout=HTTP_CONNECT_TIMEOUT,
+    pool_connections=HTTP_POOL_CONNECTIONS,
+    pool_maxsize=HTTP_POOL_MAXSIZE
+)
+
+
+keyword_executor = ThreadPoolExecutor(
+    max_workers=KEYWORD_SEARCH_WORKERS,
+    thread_name_prefix='keyword-search'
+)
+
+
+# Dùng chung cho mọi batch -> giới hạn tổng số lần gọi Gemini song song
+batch_executor = ThreadPoolExecutor(
+    max_workers=BATCH_GENERATION_CONCURRENCY,
+    thread_name_prefix='batch-generation'
+)
+
+
+def fetch_articles_page(params):
+    """Fetch 1 trang rows từ bảng articles (dùng để build BM25 index)"""
+    response = supabase_http.get('/articles', params=params, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
+def init_bm25_index():
+    """Build BM25 index lúc khởi động nếu RETRIEVAL_ENGINE=bm25"""
+    if RETRIEVAL_ENGINE != 'bm25':
+        return None
+
+    index = BM25Index(fetch_articles_page, page_size=BM25_PAGE_SIZE)
+    try:
+        index.load()
+    except Exception as e:
+        # Index chưa sẵn sàng -> search_documents dùng Supabase, thread nền sẽ thử load lại
+        print(f"❌ BM25 index load error: {e}")
+    index.start_auto_refresh(BM25_REFRESH_INTERVAL, BM25_FULL_RELOAD_INTERVAL)
+    return index
+
+
+bm25_index = init_bm25_index()
+
+answer_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL) if ANSWER_CACHE_ENABLED else None
+
+def embed_question(question):
+    """
+    Embedding câu hỏi cho semantic cache
+
+    Cùng chuẩn hóa với embedding cache (NFC, gộp khoảng trắng, giữ hoa/thường vì model
+    phân biệt hoa thường), và đi qua cache đó khi hybrid search bật, nên vector của
+    semantic cache và của VectorStore.search dùng chung 1 entry.
+    """
+    if vector_store is not None:
+        return vector_store.embed_query(question)
+    return get_query_embedder().encode_one(normalize_text(question))
+
+
+semantic_cache = SemanticCache(
+    embed_question,
+    max_entries=SEMANTIC_CACHE_SIZE,
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    ttl=ANSWER_CACHE_TTL
+) if SEMANTIC_CACHE_ENABLED else None
+
+
+def embedding_batcher_stats():
+    """Histogram batch size của BatchingEmbedder (None nếu chưa dùng / không bật)"""
+    if vector_store is None and semantic_cache is None:
+        return None
+    embedder = get_query_embedder()
+    return embedder.stats() if isinstance(embedder, BatchingEmbedder) else None
+
+
+def corpus_version():
+    """Phiên bản dữ liệu cho cache key - đổi khi BM25 index được refresh"""
+    if bm25_index is not None and bm25_index.ready:
+        return f"{CORPUS_VERSION}-bm25-{bm25_index.version}"
+    return CORPUS_VERSION
+
+
 def search_documents(query, limit=3):
     """
-    Tìm kiếm văn bản trong Supabase với nhiều chiến lược
-    Đảm bảo luôn trả về ít nhất 3 kết quả
+    Tìm kiếm điều luật liên quan tới câu hỏi
+
+    - HYBRID_SEARCH_ENABLED=true: gộp search_lexical + search_vectors (RRF)
+    - Mặc định: search_lexical
     """
+    if hybrid_retriever is not None:
+        print(f"\n🔍 Hybrid searching for: {query}")
+        results = hybrid_retriever.search(query, limit)
+        if results:
+            return results
+        print("↪️ Hybrid search returned nothing, falling back to lexical search")
+
+    return search_lexical(query, limit)
+
+
+def search_lexical(query, limit=3, timeout=None):
+    """
+    Tìm kiếm điều luật theo từ khóa
+
+    - RETRIEVAL_ENGINE=bm25: tìm trong BM25 index trong process (không gọi mạng)
+    - Mặc định: gọi hàm search_articles trong Supabase (full-text search
+      xếp hạng ts_rank trên articles.search_vector), chỉ tốn 1 round trip.
+      Nếu database chưa có hàm này (xem infrastructure/supabase-schema.sql)
+      thì fallback sang search_documents_ilike.
+
+    timeout: Read timeout của RPC (nhánh hybrid); khi có timeout thì không
+    fallback sang ilike (nhiều round trip, không kịp deadline của nhánh).
+    """
+    if bm25_index is not None and bm25_index.ready:
+        print(f"\n🔍 Searching (BM25) for: {query}")
+        results = bm25_index.search(query, limit)
+        print(f"✅ Total found: {len(results)} articles")
+        return results
+
     try:
         print(f"\n🔍 Searching for: {query}")
-        
-        headers = {
-            'apikey': SUPABASE_ANON_KEY,
-            'Authorization': f'Bearer {SUPABASE_ANON_KEY}',
-            'Content-Type': 'application/json'
+
+        payload = {
+            'query_text': query,
+            'match_limit': limit
         }
-        
-        url = f"{SUPABASE_URL}/rest/v1/articles"
-        
+
+        response = supabase_http.post('/rpc/search_articles', json=payload, timeout=timeout)
+        if response.status_code == 200:
+            results = response.json()
+            for item in results:
+                print(f"  ✅ Found (rank {item.get('rank', 0):.3f}): {(item.get('ten') or 'N/A')[:60]}...")
+            print(f"✅ Total found: {len(results)} articles")
+            return results
+
+        print(f"⚠️ RPC search_articles failed ({response.status_code}): {response.text[:200]}")
+    except Exception as e:
+        print(f"❌ RPC search error: {e}")
+
+    if timeout is not None:
+        return []
+    print("↪️ Falling back to ilike search")
+    return search_documents_ilike(query, limit)
+
+
+def search_vectors(query, top_k=10, timeout=None):
+    """Tìm kiếm vector trong VectorStore, trả về cùng format với search_lexical"""
+    return [
+        {
+            'mapc': item.get('article_mapc') or item.get('mapc'),
+            'ten': item.get('ten'),
+            'noi_dung': item.get('noi_dung') or item.get('noidung') or '',
+            'document_id': item.get('document_id'),
+            'score': item.get('score')
+        }
+        for item in vector_store.search(query, top_k=top_k, timeout=timeout)
+    ]
+
+
+def init_hybrid_retriever():
+    """Khởi tạo VectorStore + HybridRetriever nếu HYBRID_SEARCH_ENABLED=true"""
+    global vector_store
+    if not HYBRID_SEARCH_ENABLED:
+        return None
+
+    try:
+        vector_store = VectorStore(embedder=get_query_embedder())
+    except Exception as e:
+        print(f"❌ Vector store init error, hybrid search disabled: {e}")
+        return None
+
+    # Load embedding model ở nền để câu hỏi đầu tiên không bị timeout nhánh vector
+    threading.Thread(target=lambda: vector_store.embedder.encode(['khởi động']), daemon=True).start()
+
+    def lexical(query, top_k, timeout):
+        # Bỏ các điều luật "mới nhất" được thêm vào cho đủ số lượng (rank = 0)
+        return [item for item in search_lexical(query, top_k, timeout=timeout) if item.get('rank', 1) > 0]
+
+    return HybridRetriever(
+        {
+            'lexical': (lexical, HYBRID_LEXICAL_TIMEOUT),
+            'vector': (search_vectors, HYBRID_VECTOR_TIMEOUT),
+        },
+        candidates=HYBRID_CANDIDATES,
+        rrf_k=HYBRID_RRF_K,
+        max_in_flight=HYBRID_MAX_IN_FLIGHT
+    )
+
+
+vector_store = None
+hybrid_retriever = init_hybrid_retriever()
+
+
+def search_documents_batch(queries, limit=3):
+    """
+    Tìm kiếm cho nhiều câu hỏi trong 1 lượt
+
+    - BM25: tìm trong index trong process
+    - Supabase: 1 lần gọi hàm search_articles_batch cho cả danh sách;
+      nếu chưa có hàm này thì chạy search_documents song song
+
+    Returns:
+        List các list articles, cùng thứ tự với `queries`
+    """
+    if not queries:
+        return []
+
+    if hybrid_retriever is not None:
+        return list(batch_executor.map(lambda query: search_documents(query, limit), queries))
+
+    if bm25_index is not None and bm25_index.ready:
+        return [bm25_index.search(query, limit) for query in queries]
+
+    try:
+        print(f"\n🔍 Batch searching {len(queries)} questions...")
+        response = supabase_http.post(
+            '/rpc/search_articles_batch',
+            json={'query_texts': list(queries), 'match_limit': limit},
+            timeout=SUPABASE_TIMEOUT * 3
+        )
+        if response.status_code == 200:
+            results = [[] for _ in queries]
+            for row in response.json():
+                query_index = row.pop('query_index', None)
+                if query_index is not None and 0 <= query_index < len(results):
+                    results[query_index].append(row)
+            return results
+
+        print(f"⚠️ RPC search_articles_batch failed ({response.status_code}): {response.text[:200]}")
+    except Exception as e:
+        print(f"❌ Batch search error: {e}")
+
+    return list(batch_executor.map(lambda query: search_lexical(query, limit), queries))
+
+
+def search_documents_ilike(query, limit=3):
+    """
+    Tìm kiếm văn bản trong Supabase với nhiều chiến lược (ilike)
+    Đảm bảo luôn trả về ít nhất 3 kết quả
+    """
+    try:
         # Tách query thành các từ khóa
         keywords = query.split()
         results = []
@@ -60,7 +367,7 @@ def search_documents(query, limit=3):
             'select': 'mapc,ten,noi_dung,document_id'
         }
         
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        response = supabase_http.get('/articles', params=params)
         if response.status_code == 200:
             for item in response.json():
                 item_id = item.get('mapc')
@@ -74,30 +381,13 @@ def search_documents(query, limit=3):
             print(f"✅ Found {len(results)} articles (Strategy 1)")
             return results[:limit]
         
-        # Chiến lược 2: Tìm kiếm từng từ khóa riêng lẻ
+        # Chiến lược 2: Tìm kiếm từng từ khóa riêng lẻ (song song)
         print(f"🔍 Strategy 2: Individual keyword search ({len(keywords)} keywords)")
-        for keyword in keywords:
-            if len(keyword) < 2:  # Bỏ qua từ quá ngắn
-                continue
-            
-            params = {
-                'or': f'(noi_dung.ilike.%{keyword}%,ten.ilike.%{keyword}%)',
-                'limit': limit * 2,  # Lấy nhiều hơn để lọc
-                'select': 'mapc,ten,noi_dung,document_id'
-            }
-            
-            response = requests.get(url, headers=headers, params=params, timeout=10)
-            if response.status_code == 200:
-                for item in response.json():
-                    item_id = item.get('mapc')
-                    if item_id and item_id not in seen_ids:
-                        results.append(item)
-                        seen_ids.add(item_id)
-                        print(f"  ✅ Found (keyword '{keyword}'): {item.get('ten', 'N/A')[:60]}...")
-                        
-                        if len(results) >= limit:
-                            break
-            
+        for item in search_keywords_concurrent(keywords, limit, seen_ids):
+            results.append(item)
+            seen_ids.add(item.get('mapc'))
+            print(f"  ✅ Found (keywords {item['matched_keywords']}): {item.get('ten', 'N/A')[:60]}...")
+
             if len(results) >= limit:
                 break
         
@@ -110,7 +400,7 @@ def search_documents(query, limit=3):
                 'order': 'mapc.desc'
             }
             
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = supabase_http.get('/articles', params=params)
             if response.status_code == 200:
                 for item in response.json():
                     item_id = item.get('mapc')
@@ -133,17 +423,11 @@ def search_documents(query, limit=3):
         # Fallback cuối cùng: Lấy bất kỳ 3 bài viết nào
         try:
             print("🔍 Emergency fallback: Get any 3 articles")
-            headers = {
-                'apikey': SUPABASE_ANON_KEY,
-                'Authorization': f'Bearer {SUPABASE_ANON_KEY}',
-                'Content-Type': 'application/json'
-            }
-            url = f"{SUPABASE_URL}/rest/v1/articles"
             params = {
                 'limit': limit,
                 'select': 'mapc,ten,noi_dung,document_id'
             }
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = supabase_http.get('/articles', params=params)
             if response.status_code == 200:
                 return response.json()
         except:
@@ -152,31 +436,84 @@ def search_documents(query, limit=3):
         return []
 
 
+def search_keywords_concurrent(keywords, limit, exclude_ids=()):
+    """
+    Gửi song song 1 query ilike cho mỗi từ khóa (tối đa KEYWORD_SEARCH_WORKERS
+    request cùng lúc, dừng chờ sau KEYWORD_SEARCH_DEADLINE giây) rồi gộp kết quả
+
+    Thứ tự gộp không phụ thuộc request nào về trước:
+    1. Khớp nhiều từ khóa hơn xếp trước
+    2. Khớp từ khóa đứng sớm hơn trong câu hỏi xếp trước
+    3. Vị trí trong kết quả của từ khóa đó, cuối cùng là mapc
+    """
+    # Bỏ từ quá ngắn và từ trùng, giữ thứ tự trong câu hỏi
+    unique_keywords = []
+    for keyword in keywords:
+        if len(keyword) >= 2 and keyword.lower() not in (k.lower() for k in unique_keywords):
+            unique_keywords.append(keyword)
+
+    if not unique_keywords:
+        return []
+
+    def fetch_keyword(keyword):
+        params = {
+            'or': f'(noi_dung.ilike.%{keyword}%,ten.ilike.%{keyword}%)',
+            'limit': limit * 2,  # Lấy nhiều hơn để lọc
+            'select': 'mapc,ten,noi_dung,document_id'
+        }
+        response = supabase_http.get('/articles', params=params, timeout=KEYWORD_SEARCH_DEADLINE)
+        return response.json() if response.status_code == 200 else []
+
+    futures = [keyword_executor.submit(fetch_keyword, keyword) for keyword in unique_keywords]
+    _, not_done = wait(futures, timeout=KEYWORD_SEARCH_DEADLINE)
+    for future in not_done:
+        future.cancel()
+    if not_done:
+        print(f"  ⏱️ {len(not_done)}/{len(futures)} keyword queries missed the deadline")
+
+    # mapc -> [số từ khóa khớp, vị trí từ khóa đầu tiên, vị trí trong kết quả, item, từ khóa]
+    merged = {}
+    for keyword_idx, (keyword, future) in enumerate(zip(unique_keywords, futures)):
+        if future in not_done or future.exception() is not None:
+            continue
+        for position, item in enumerate(future.result()):
+            item_id = item.get('mapc')
+            if not item_id or item_id in exclude_ids:
+                continue
+            entry = merged.get(item_id)
+            if entry is None:
+                merged[item_id] = [1, keyword_idx, position, item, [keyword]]
+            else:
+                entry[0] += 1
+                entry[4].append(keyword)
+
+    ranked = sorted(merged.items(), key=lambda kv: (-kv[1][0], kv[1][1], kv[1][2], kv[0]))
+    return [dict(entry[3], matched_keywords=entry[4]) for _, entry in ranked]
+
+
+def gemini_payload(prompt, max_tokens=512):
+    """Request body cho Gemini generateContent / streamGenerateContent"""
+    return {
+        'contents': [{
+            'parts': [{
+                'text': prompt
+            }]
+        }],
+        'generationConfig': {
+            'temperature': 0.7,
+            'maxOutputTokens': max_tokens,
+            'topP': 0.9,
+        }
+    }
+
+
 def call_gemini_api(prompt, max_tokens=512):
     """Gọi Google Gemini API"""
     try:
-        headers = {
-            'Content-Type': 'application/json'
-        }
-        
-        # Gemini API endpoint
-        api_url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
-        
-        payload = {
-            'contents': [{
-                'parts': [{
-                    'text': prompt
-                }]
-            }],
-            'generationConfig': {
-                'temperature': 0.7,
-                'maxOutputTokens': max_tokens,
-                'topP': 0.9,
-            }
-        }
+        payload = gemini_payload(prompt, max_tokens)
         
         print(f"🤖 Calling Google Gemini API...")
-        response = requests.post(api_url, headers=headers, json=payload, timeout=60)
+        response = gemini_http.post(f"/models/{GEMINI_MODEL}:generateContent", json=payload)
         
         print(f"Status: {response.status_code}")
         
@@ -196,6 +533,154 @@ def call_gemini_api(prompt, max_tokens=512):
         return None
 
 
+def stream_gemini_api(prompt, max_tokens=512):
+    """
+    Gọi Gemini streamGenerateContent (SSE), yield từng đoạn text ngay khi về
+
+    Raise RuntimeError nếu API trả lỗi.
+    """
+    print(f"🤖 Streaming from Google Gemini API...")
+    response = gemini_http.post(
+        f"/models/{GEMINI_MODEL}:streamGenerateContent",
+        json=gemini_payload(prompt, max_tokens),
+        params={'alt': 'sse'},
+        stream=True
+    )
+
+    with response:
+        if response.status_code != 200:
+            raise RuntimeError(f"Gemini API error {response.status_code}: {response.text[:200]}")
+
+        for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            chunk = json.loads(line[len('data:'):])
+            for candidate in chunk.get('candidates', [])[:1]:
+                for part in candidate.get('content', {}).get('parts', []):
+                    if part.get('text'):
+                        yield part['text']
+
+
+def build_citations(articles):
+    """Citations trả về cho client (nội dung rút gọn)"""
+    return [
+        {
+            'mapc': art.get('mapc'),
+            'ten': art.get('ten'),
+            'noi_dung': (art.get('noi_dung') or '')[:200] + '...',
+            'document_id': art.get('document_id')
+        }
+        for art in articles
+    ]
+
+
+def lookup_cached_answer(question):
+    """
+    Tra answer cache rồi semantic cache
+
+    Returns:
+        (response dict hoặc None, cache_state để lưu câu trả lời mới qua store_answer)
+    """
+    cache_state = {
+        'key': None,
+        'vector': None,
+        'namespace': (MODEL_NAME, corpus_version()),
+        'question': question
+    }
+
+    # Câu hỏi đã được trả lời gần đây -> trả về từ cache
+    if answer_cache is not None:
+        cache_state['key'] = answer_cache.make_key(question, MODEL_NAME, corpus_version())
+        cached = answer_cache.get(cache_state['key'])
+        if cached is not None:
+            print("⚡ Answer served from cache\n")
+            return dict(cached, question=question, cached=True, cache_type='exact'), cache_state
+
+    # Câu hỏi gần giống (theo embedding) một câu đã trả lời
+    if semantic_cache is not None:
+        try:
+            cache_state['vector'] = semantic_cache.embed(question)
+            match = semantic_cache.lookup(cache_state['vector'], cache_state['namespace'])
+        except Exception as e:
+            print(f"❌ Semantic cache error: {e}")
+            match = None
+        if match is not None:
+            cached, similarity, matched_question = match
+            print(f"⚡ Answer served from semantic cache (similarity {similarity:.3f}): {matched_question}\n")
+            if cache_state['key'] is not None:
+                answer_cache.set(cache_state['key'], cached)
+            return dict(
+                cached,
+                question=question,
+                cached=True,
+                cache_type='semantic',
+                cache_similarity=round(similarity, 4),
+                cached_question=matched_question
+            ), cache_state
+
+    return None, cache_state
+
+
+def build_answer_result(answer, articles):
+    """Phần response được cache (không kèm question / cached)"""
+    return {
+        'success': True,
+        'answer': answer,
+        'citations': build_citations(articles),
+        'model': MODEL_NAME,
+        'context_used': len(articles) > 0
+    }
+
+
+def plan_question_batch(questions):
+    """
+    Validate + gộp các câu hỏi trùng nhau trong 1 batch
+
+    Returns:
+        (slots, unique_questions): slots[i] là vị trí câu hỏi i trong
+        unique_questions, hoặc chuỗi lỗi nếu câu hỏi i không hợp lệ
+    """
+    slots = []
+    unique_questions = []
+    unique_index = {}
+
+    for item in questions:
+        if not isinstance(item, str) or not item.strip():
+            slots.append('Question must be a non-empty string')
+            continue
+
+        question = item.strip()
+        key = normalize_question(question)
+        if key not in unique_index:
+            unique_index[key] = len(unique_questions)
+            unique_questions.append(question)
+        slots.append(unique_index[key])
+
+    return slots, unique_questions
+
+
+def assemble_batch_results(questions, slots, unique_results):
+    """Trả kết quả về đúng thứ tự ban đầu, kèm lỗi riêng cho từng câu hỏi"""
+    results = []
+    for index, slot in enumerate(slots):
+        if isinstance(slot, str):
+            results.append({'index': index, 'success': False, 'error': slot})
+        else:
+            result = dict(unique_results[slot], index=index)
+            if result.get('success'):
+                result['question'] = questions[index].strip()
+            results.append(result)
+    return results
+
+
+def store_answer(cache_state, result):
+    """Lưu câu trả lời mới vào answer cache + semantic cache"""
+    if cache_state['key'] is not None:
+        answer_cache.set(cache_state['key'], result)
+    if cache_state['vector'] is not None:
+        semantic_cache.add(cache_state['vector'], result, cache_state['namespace'], cache_state['question'])
+
+
 def build_rag_prompt(question, articles):
     """Tạo prompt RAG - Model tự trả lời dựa trên kiến thức của nó"""
     
@@ -238,6 +723,8 @@ def index():
         'model': MODEL_NAME,
         'endpoints': {
             'question': 'POST /api/v1/question',
+            'question_stream': 'POST /api/v1/question/stream',
+            'questions_batch': 'POST /api/v1/questions',
             'health': 'GET /health'
         }
     })
@@ -252,7 +739,14 @@ def health():
         'model': MODEL_NAME,
         'provider': 'Google Gemini',
         'gemini_configured': bool(GEMINI_API_KEY),
-        'supabase_configured': bool(SUPABASE_URL)
+        'supabase_configured': bool(SUPABASE_URL),
+        'retrieval_engine': RETRIEVAL_ENGINE,
+        'hybrid_search': hybrid_retriever is not None,
+        'vector_store': vector_store.stats() if vector_store is not None else None,
+        'embedding_batcher': embedding_batcher_stats(),
+        'bm25_index': bm25_index.stats() if bm25_index is not None else None,
+        'answer_cache': answer_cache.stats() if answer_cache is not None else None,
+        'semantic_cache': semantic_cache.stats() if semantic_cache is not None else None
     })
 
 
@@ -271,13 +765,15 @@ def ask_question():
         "success": true,
         "answer": "...",
         "citations": [...],
-        "model": "Arcee-VyLinh"
+        "model": "Arcee-VyLinh",
+        "cached": false,
+        "cache_type": null       // "exact" | "semantic" khi cached = true
     }
     """
     try:
         data = request.get_json()
         
-        if not data or 'question' not in data:
+        if not isinstance(data, dict) or not isinstance(data.get('question'), str):
             return jsonify({
                 'success': False,
                 'error': 'Question is required'
@@ -294,6 +790,11 @@ def ask_question():
         print(f"\n{'='*60}")
         print(f"📝 Question: {question}")
         print(f"{'='*60}")
+
+        # Step 0: Câu hỏi đã trả lời rồi (hoặc gần giống) -> trả về từ cache
+        cached, cache_state = lookup_cached_answer(question)
+        if cached is not None:
+            return jsonify(cached)
         
         # Step 1: Tìm kiếm văn bản liên quan
         print("🔍 Searching documents...")
@@ -318,28 +819,113 @@ def ask_question():
                 'error': 'Không thể kết nối với AI model. Vui lòng thử lại.'
             }), 500
         
-        # Prepare citations
-        citations = [
-            {
-                'mapc': art.get('mapc'),
-                'ten': art.get('ten'),
-                'noi_dung': art.get('noi_dung', '')[:200] + '...',
-                'document_id': art.get('document_id')
-            }
-            for art in articles
-        ]
-        
         print(f"✅ Answer generated successfully\n")
+
+        result = build_answer_result(answer, articles)
+        store_answer(cache_state, result)
+
+        return jsonify(dict(result, question=question, cached=False, cache_type=None))
         
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/v1/questions', methods=['POST'])
+def ask_questions_batch():
+    """
+    Batch Q&A endpoint cho công cụ nội bộ (sinh FAQ, regression check)
+
+    Body:
+    {
+        "questions": ["Mức hỗ trợ học nghề là bao nhiêu?", "..."]
+    }
+
+    Câu hỏi trùng nhau chỉ được trả lời 1 lần, retrieval cho cả batch chạy
+    trong 1 lượt, Gemini được gọi song song (tối đa BATCH_GENERATION_CONCURRENCY).
+
+    Response:
+    {
+        "success": true,
+        "count": 2,
+        "unique": 2,
+        "results": [
+            {"index": 0, "success": true, "question": "...", "answer": "...", "citations": [...], ...},
+            {"index": 1, "success": false, "error": "..."}
+        ]
+    }
+    """
+    data = request.get_json(silent=True)
+    questions = data.get('questions') if isinstance(data, dict) else None
+
+    if not isinstance(questions, list) or not questions:
+        return jsonify({
+            'success': False,
+            'error': 'questions must be a non-empty list'
+        }), 400
+
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return jsonify({
+            'success': False,
+            'error': f'Too many questions (max {BATCH_MAX_QUESTIONS})'
+        }), 400
+
+    if not GEMINI_API_KEY:
+        return jsonify({
+            'success': False,
+            'error': 'Gemini API key chưa được cấu hình'
+        }), 500
+
+    try:
+        slots, unique_questions = plan_question_batch(questions)
+        print(f"\n📦 Batch: {len(questions)} questions ({len(unique_questions)} unique)")
+
+        # Step 1: Tra cache
+        unique_results = [None] * len(unique_questions)
+        cache_states = [None] * len(unique_questions)
+        for i, question in enumerate(unique_questions):
+            cached, cache_states[i] = lookup_cached_answer(question)
+            if cached is not None:
+                unique_results[i] = cached
+
+        pending = [i for i, result in enumerate(unique_results) if result is None]
+
+        # Step 2: Retrieval cho tất cả câu hỏi chưa có trong cache trong 1 lượt
+        articles_list = search_documents_batch([unique_questions[i] for i in pending], limit=3)
+
+        # Step 3: Sinh câu trả lời song song
+        def generate(i, articles):
+            try:
+                answer = call_gemini_api(build_rag_prompt(unique_questions[i], articles))
+            except Exception as e:
+                return {'success': False, 'error': str(e)}
+
+            if not answer:
+                return {'success': False, 'error': 'Không thể kết nối với AI model. Vui lòng thử lại.'}
+
+            result = build_answer_result(answer, articles)
+            store_answer(cache_states[i], result)
+            return dict(result, cached=False, cache_type=None)
+
+        for i, result in zip(pending, batch_executor.map(generate, pending, articles_list)):
+            unique_results[i] = result
+
+        results = assemble_batch_results(questions, slots, unique_results)
+        print(f"✅ Batch done: {sum(1 for r in results if r.get('success'))}/{len(results)} succeeded\n")
+
         return jsonify({
             'success': True,
-            'question': question,
-            'answer': answer,
-            'citations': citations,
+            'count': len(results),
+            'unique': len(unique_questions),
             'model': MODEL_NAME,
-            'context_used': len(articles) > 0
+            'results': results
         })
-        
+
     except Exception as e:
         print(f"❌ Error: {e}")
         import traceback
@@ -350,6 +936,113 @@ def ask_question():
         }), 500
 
 
+def sse_event(event, data):
+    """Format 1 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route('/api/v1/question/stream', methods=['POST'])
+def ask_question_stream():
+    """
+    Q&A endpoint dạng stream (Server-Sent Events)
+
+    Body giống /api/v1/question. Các event trả về theo thứ tự:
+        event: citations  {"citations": [...], "context_used": true, "cached": false}
+        event: token      {"text": "..."}   (lặp lại, ngay khi Gemini sinh ra)
+        event: done       {"success": true, "answer": "...", "model": "...", "cached": false}
+        event: error      {"success": false, "error": "..."}   (thay cho done nếu lỗi)
+    """
+    data = request.get_json(silent=True)
+    question = data.get('question') if isinstance(data, dict) else None
+
+    if not isinstance(question, str) or not question.strip():
+        return jsonify({
+            'success': False,
+            'error': 'Question is required'
+        }), 400
+    question = question.strip()
+
+    if not GEMINI_API_KEY:
+        return jsonify({
+            'success': False,
+            'error': 'Gemini API key chưa được cấu hình'
+        }), 500
+
+    print(f"\n{'='*60}")
+    print(f"📝 Question (stream): {question}")
+    print(f"{'='*60}")
+
+    def generate():
+        cached, cache_state = lookup_cached_answer(question)
+        if cached is not None:
+            yield sse_event('citations', {
+                'citations': cached['citations'],
+                'context_used': cached['context_used'],
+                'cached': True
+            })
+            yield sse_event('token', {'text': cached['answer']})
+            yield sse_event('done', {
+                'success': True,
+                'question': question,
+                'answer': cached['answer'],
+                'model': cached['model'],
+                'cached': True,
+                'cache_type': cached['cache_type']
+            })
+            return
+
+        # Citations gửi ngay khi retrieval xong, trước khi model bắt đầu sinh
+        articles = search_documents(question, limit=3)
+        citations = build_citations(articles)
+        yield sse_event('citations', {
+            'citations': citations,
+            'context_used': len(articles) > 0,
+            'cached': False
+        })
+
+        parts = []
+        try:
+            for text in stream_gemini_api(build_rag_prompt(question, articles)):
+                parts.append(text)
+                yield sse_event('token', {'text': text})
+        except Exception as e:
+            print(f"❌ Stream error: {e}")
+            yield sse_event('error', {
+                'success': False,
+                'error': 'Không thể kết nối với AI model. Vui lòng thử lại.'
+            })
+            return
+
+        answer = ''.join(parts)
+        if not answer:
+            yield sse_event('error', {
+                'success': False,
+                'error': 'Không thể kết nối với AI model. Vui lòng thử lại.'
+            })
+            return
+
+        print(f"✅ Answer streamed successfully\n")
+        store_answer(cache_state, build_answer_result(answer, articles))
+
+        yield sse_event('done', {
+            'success': True,
+            'question': question,
+            'answer': answer,
+            'model': MODEL_NAME,
+            'cached': False,
+            'cache_type': None
+        })
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(e):
@@ -0,0 +1,435 @@
+"""
+VN-Law-Mini - RAG Service (ASGI / asyncio)
+
+Cùng routes với app.py (/, /health, /api/v1/question, /api/v1/question/stream,
+/api/v1/questions) nhưng chạy trên asyncio: Supabase và Gemini được gọi bằng
+httpx.AsyncClient, nên 1 process giữ được hàng trăm câu hỏi đang chờ Gemini
+mà không chiếm worker thread nào.
+
+Dùng chung config, cache, BM25 index và prompt với app.py.
+
+Chạy:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5001
+"""
+
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+
+import httpx
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+import app as rag
+
+# Số connection tối đa tới mỗi upstream (Gemini giữ connection suốt thời gian sinh câu trả lời)
+ASGI_MAX_CONNECTIONS = int(os.getenv('ASGI_MAX_CONNECTIONS', 200))
+ASGI_MAX_KEEPALIVE = int(os.getenv('ASGI_MAX_KEEPALIVE', 50))
+
+clients = {}
+batch_limits = {}
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    """Tạo / đóng các AsyncClient cùng vòng đời với server"""
+    limits = httpx.Limits(
+        max_connections=ASGI_MAX_CONNECTIONS,
+        max_keepalive_connections=ASGI_MAX_KEEPALIVE
+    )
+    clients['supabase'] = httpx.AsyncClient(
+        base_url=f"{rag.SUPABASE_URL}/rest/v1",
+        # httpx không nhận header None (SUPABASE_ANON_KEY chưa đặt) -> '' như app.py vẫn chạy được
+        headers={name: value or '' for name, value in rag.supabase_headers().items()},
+        timeout=httpx.Timeout(rag.SUPABASE_TIMEOUT, connect=rag.HTTP_CONNECT_TIMEOUT),
+        limits=limits
+    )
+    clients['gemini'] = httpx.AsyncClient(
+        base_url=rag.GEMINI_API_BASE,
+        headers={
+            'Content-Type': 'application/json',
+            'x-goog-api-key': rag.GEMINI_API_KEY or ''
+        },
+        timeout=httpx.Timeout(rag.GEMINI_TIMEOUT, connect=rag.HTTP_CONNECT_TIMEOUT),
+        limits=limits
+    )
+    # Giới hạn tổng số lần gọi Gemini song song của các batch
+    batch_limits['generation'] = asyncio.Semaphore(rag.BATCH_GENERATION_CONCURRENCY)
+    try:
+        yield
+    finally:
+        for client in clients.values():
+            await client.aclose()
+        clients.clear()
+
+
+async def search_documents(query, limit=3):
+    """Bản async của app.search_documents"""
+    if rag.hybrid_retriever is not None:
+        # Các nhánh hybrid đã chạy song song trong thread pool riêng
+        return await asyncio.to_thread(rag.search_documents, query, limit)
+
+    if rag.bm25_index is not None and rag.bm25_index.ready:
+        # Chấm điểm BM25 tốn CPU -> chạy trong thread, không chặn event loop
+        return await asyncio.to_thread(rag.bm25_index.search, query, limit)
+
+    try:
+        response = await clients['supabase'].post(
+            '/rpc/search_articles',
+            json={'query_text': query, 'match_limit': limit}
+        )
+        if response.status_code == 200:
+            results = response.json()
+            print(f"✅ Total found: {len(results)} articles")
+            return results
+        print(f"⚠️ RPC search_articles failed ({response.status_code}): {response.text[:200]}")
+    except Exception as e:
+        print(f"❌ RPC search error: {e}")
+
+    # Fallback ilike hiếm khi dùng -> chạy bản sync trong thread
+    print("↪️ Falling back to ilike search")
+    return await asyncio.to_thread(rag.search_documents_ilike, query, limit)
+
+
+async def search_documents_batch(queries, limit=3):
+    """Bản async của app.search_documents_batch"""
+    if not queries:
+        return []
+
+    if rag.hybrid_retriever is not None:
+        return await asyncio.gather(*(search_documents(query, limit) for query in queries))
+
+    if rag.bm25_index is not None and rag.bm25_index.ready:
+        return await asyncio.gather(*(asyncio.to_thread(rag.bm25_index.search, query, limit) for query in queries))
+
+    try:
+        response = await clients['supabase'].post(
+            '/rpc/search_articles_batch',
+            json={'query_texts': list(queries), 'match_limit': limit},
+            timeout=rag.SUPABASE_TIMEOUT * 3
+        )
+        if response.status_code == 200:
+            results = [[] for _ in queries]
+            for row in response.json():
+                query_index = row.pop('query_index', None)
+                if query_index is not None and 0 <= query_index < len(results):
+                    results[query_index].append(row)
+            return results
+        print(f"⚠️ RPC search_articles_batch failed ({response.status_code}): {response.text[:200]}")
+    except Exception as e:
+        print(f"❌ Batch search error: {e}")
+
+    return await asyncio.gather(*(search_documents(query, limit) for query in queries))
+
+
+async def call_gemini_api(prompt, max_tokens=512):
+    """Bản async của app.call_gemini_api"""
+    try:
+        print(f"🤖 Calling Google Gemini API...")
+        response = await clients['gemini'].post(
+            f"/models/{rag.GEMINI_MODEL}:generateContent",
+            json=rag.gemini_payload(prompt, max_tokens)
+        )
+        if response.status_code != 200:
+            print(f"API Error: {response.text}")
+            return None
+
+        result = response.json()
+        if result.get('candidates'):
+            return result['candidates'][0]['content']['parts'][0]['text']
+        return None
+    except Exception as e:
+        print(f"Gemini API error: {e}")
+        return None
+
+
+async def stream_gemini_api(prompt, max_tokens=512):
+    """Bản async của app.stream_gemini_api"""
+    async with clients['gemini'].stream(
+        'POST',
+        f"/models/{rag.GEMINI_MODEL}:streamGenerateContent",
+        json=rag.gemini_payload(prompt, max_tokens),
+        params={'alt': 'sse'}
+    ) as response:
+        if response.status_code != 200:
+            body = await response.aread()
+            raise RuntimeError(f"Gemini API error {response.status_code}: {body[:200]}")
+
+        async for line in response.aiter_lines():
+            if not line.startswith('data:'):
+                continue
+            chunk = json.loads(line[len('data:'):])
+            for candidate in chunk.get('candidates', [])[:1]:
+                for part in candidate.get('content', {}).get('parts', []):
+                    if part.get('text'):
+                        yield part['text']
+
+
+async def lookup_cached_answer(question):
+    """Tra cache; semantic cache cần encode câu hỏi (CPU) nên chạy trong thread"""
+    if rag.semantic_cache is None:
+        return rag.lookup_cached_answer(question)
+    return await asyncio.to_thread(rag.lookup_cached_answer, question)
+
+
+async def read_question(request):
+    """Đọc + validate câu hỏi từ body. Trả về (question, error response)"""
+    try:
+        data = await request.json()
+    except Exception:
+        data = None
+
+    if not isinstance(data, dict) or 'question' not in data:
+        return None, JSONResponse({'success': False, 'error': 'Question is required'}, status_code=400)
+
+    if not isinstance(data['question'], str):
+        return None, JSONResponse({'success': False, 'error': 'Question is required'}, status_code=400)
+
+    question = data['question'].strip()
+    if not question:
+        return None, JSONResponse({'success': False, 'error': 'Question cannot be empty'}, status_code=400)
+
+    if not rag.GEMINI_API_KEY:
+        return None, JSONResponse({'success': False, 'error': 'Gemini API key chưa được cấu hình'}, status_code=500)
+
+    return question, None
+
+
+async def index(request):
+    """Service info"""
+    return JSONResponse({
+        'service': 'VN-Law-Mini RAG Service',
+        'version': '2.0.0',
+        'status': 'running',
+        'mode': 'GOOGLE GEMINI - REAL AI (ASGI)',
+        'model': rag.MODEL_NAME,
+        'endpoints': {
+            'question': 'POST /api/v1/question',
+            'question_stream': 'POST /api/v1/question/stream',
+            'questions_batch': 'POST /api/v1/questions',
+            'health': 'GET /health'
+        }
+    })
+
+
+async def health(request):
+    """Health check"""
+    return JSONResponse({
+        'status': 'ok',
+        'service': 'Real RAG Service (ASGI)',
+        'model': rag.MODEL_NAME,
+        'provider': 'Google Gemini',
+        'gemini_configured': bool(rag.GEMINI_API_KEY),
+        'supabase_configured': bool(rag.SUPABASE_URL),
+        'retrieval_engine': rag.RETRIEVAL_ENGINE,
+        'hybrid_search': rag.hybrid_retriever is not None,
+        'vector_store': rag.vector_store.stats() if rag.vector_store is not None else None,
+        'embedding_batcher': rag.embedding_batcher_stats(),
+        'bm25_index': rag.bm25_index.stats() if rag.bm25_index is not None else None,
+        'answer_cache': rag.answer_cache.stats() if rag.answer_cache is not None else None,
+        'semantic_cache': rag.semantic_cache.stats() if rag.semantic_cache is not None else None
+    })
+
+
+async def ask_question(request):
+    """Q&A endpoint - cùng request/response với app.ask_question"""
+    question, error = await read_question(request)
+    if error is not None:
+        return error
+
+    try:
+        print(f"\n📝 Question: {question}")
+
+        cached, cache_state = await lookup_cached_answer(question)
+        if cached is not None:
+            return JSONResponse(cached)
+
+        articles = await search_documents(question, limit=3)
+        answer = await call_gemini_api(rag.build_rag_prompt(question, articles))
+
+        if not answer:
+            return JSONResponse({
+                'success': False,
+                'error': 'Không thể kết nối với AI model. Vui lòng thử lại.'
+            }, status_code=500)
+
+        result = rag.build_answer_result(answer, articles)
+        rag.store_answer(cache_state, result)
+
+        return JSONResponse(dict(result, question=question, cached=False, cache_type=None))
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
+
+
+async def ask_question_stream(request):
+    """SSE endpoint - cùng thứ tự event với app.ask_question_stream"""
+    question, error = await read_question(request)
+    if error is not None:
+        return error
+
+    print(f"\n📝 Question (stream): {question}")
+
+    async def generate():
+        cached, cache_state = await lookup_cached_answer(question)
+        if cached is not None:
+            yield rag.sse_event('citations', {
+                'citations': cached['citations'],
+                'context_used': cached['context_used'],
+                'cached': True
+            })
+            yield rag.sse_event('token', {'text': cached['answer']})
+            yield rag.sse_event('done', {
+                'success': True,
+                'question': question,
+                'answer': cached['answer'],
+                'model': cached['model'],
+                'cached': True,
+                'cache_type': cached['cache_type']
+            })
+            return
+
+        articles = await search_documents(question, limit=3)
+        citations = rag.build_citations(articles)
+        yield rag.sse_event('citations', {
+            'citations': citations,
+            'context_used': len(articles) > 0,
+            'cached': False
+        })
+
+        parts = []
+        try:
+            async for text in stream_gemini_api(rag.build_rag_prompt(question, articles)):
+                parts.append(text)
+                yield rag.sse_event('token', {'text': text})
+        except Exception as e:
+            print(f"❌ Stream error: {e}")
+            parts = []
+
+        answer = ''.join(parts)
+        if not answer:
+            yield rag.sse_event('error', {
+                'success': False,
+                'error': 'Không thể kết nối với AI model. Vui lòng thử lại.'
+            })
+            return
+
+        rag.store_answer(cache_state, rag.build_answer_result(answer, articles))
+        yield rag.sse_event('done', {
+            'success': True,
+            'question': question,
+            'answer': answer,
+            'model': rag.MODEL_NAME,
+            'cached': False,
+            'cache_type': None
+        })
+
+    return StreamingResponse(
+        generate(),
+        media_type='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+async def ask_questions_batch(request):
+    """Batch Q&A endpoint - cùng request/response với app.ask_questions_batch"""
+    try:
+        data = await request.json()
+    except Exception:
+        data = None
+    questions = data.get('questions') if isinstance(data, dict) else None
+
+    if not isinstance(questions, list) or not questions:
+        return JSONResponse({'success': False, 'error': 'questions must be a non-empty list'}, status_code=400)
+
+    if len(questions) > rag.BATCH_MAX_QUESTIONS:
+        return JSONResponse({
+            'success': False,
+            'error': f'Too many questions (max {rag.BATCH_MAX_QUESTIONS})'
+        }, status_code=400)
+
+    if not rag.GEMINI_API_KEY:
+        return JSONResponse({'success': False, 'error': 'Gemini API key chưa được cấu hình'}, status_code=500)
+
+    try:
+        slots, unique_questions = rag.plan_question_batch(questions)
+        print(f"\n📦 Batch: {len(questions)} questions ({len(unique_questions)} unique)")
+
+        lookups = await asyncio.gather(*(lookup_cached_answer(q) for q in unique_questions))
+        unique_results = [cached for cached, _ in lookups]
+        pending = [i for i, result in enumerate(unique_results) if result is None]
+
+        articles_list = await search_documents_batch([unique_questions[i] for i in pending], limit=3)
+
+        async def generate(i, articles):
+            async with batch_limits['generation']:
+                answer = await call_gemini_api(rag.build_rag_prompt(unique_questions[i], articles))
+
+            if not answer:
+                return {'success': False, 'error': 'Không thể kết nối với AI model. Vui lòng thử lại.'}
+
+            result = rag.build_answer_result(answer, articles)
+            rag.store_answer(lookups[i][1], result)
+            return dict(result, cached=False, cache_type=None)
+
+        generated = await asyncio.gather(*(generate(i, articles) for i, articles in zip(pending, articles_list)))
+        for i, result in zip(pending, generated):
+            unique_results[i] = result
+
+        results = rag.assemble_batch_results(questions, slots, unique_results)
+        return JSONResponse({
+            'success': True,
+            'count': len(results),
+            'unique': len(unique_questions),
+            'model': rag.MODEL_NAME,
+            'results': results
+        })
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
+
+
+async def not_found(request, exc):
+    return JSONResponse({'success': False, 'error': 'Route not found'}, status_code=404)
+
+
+async def internal_error(request, exc):
+    return JSONResponse({'success': False, 'error': 'Internal server error'}, status_code=500)
+
+
+app = Starlette(
+    routes=[
+        Route('/', index, methods=['GET']),
+        Route('/health', health, methods=['GET']),
+        Route('/api/v1/question', ask_question, methods=['POST']),
+        Route('/api/v1/question/stream', ask_question_stream, methods=['POST']),
+        Route('/api/v1/questions', ask_questions_batch, methods=['POST']),
+    ],
+    # Giống CORS(app) của app.py: web client gọi từ origin khác (preflight cho JSON POST)
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+    ],
+    exception_handlers={
+        404: not_found,
+        500: internal_error,
+    },
+    lifespan=lifespan
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.getenv('PORT', 5001))
+    print(f"\n🚀 Starting RAG Service (ASGI) on port {port}...")
+    print(f"📡 Access at: http://localhost:{port}\n")
+    uvicorn.run(app, host='0.0.0.0', port=port)
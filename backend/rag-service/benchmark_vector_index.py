@@ -0,0 +1,153 @@
+"""
+Benchmark Vector Index - So sánh IVF (ANN) và quantization với exact search
+
+Đo recall@10 và latency của IVFVectorIndex theo từng giá trị nprobe, và
+RAM / recall@10 của QuantizedVectorIndex (int8, PQ; có / không re-rank),
+so với LocalVectorIndex (brute-force) trên cùng dữ liệu.
+
+Usage:
+    # Dữ liệu giả lập (vectors theo cụm, giống phân phối embeddings thật)
+    python benchmark_vector_index.py --size 200000 --dim 768
+
+    # Dùng index local đã tạo bằng vectorize.py / sync script
+    python benchmark_vector_index.py --index-path ./data/vector_index
+
+    # Chỉ đo quantization
+    python benchmark_vector_index.py --nprobe '' --quantization int8,pq --rerank 0,50
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from models.ivf_index import IVFVectorIndex
+from models.local_index import VECTORS_FILE, LocalVectorIndex
+from models.quantized_index import QuantizedVectorIndex
+
+
+def normalize(vectors):
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def synthetic_vectors(size, dim, clusters, seed=0):
+    """Vectors chuẩn hóa phân bố quanh `clusters` tâm ngẫu nhiên"""
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.standard_normal((clusters, dim)))
+    labels = rng.integers(0, clusters, size)
+    return normalize(centers[labels] + 2.0 * rng.standard_normal((size, dim)) / np.sqrt(dim))
+
+
+def make_queries(vectors, count, seed=1):
+    """Câu hỏi giả lập: vectors trong corpus cộng nhiễu"""
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.choice(len(vectors), count, replace=False)]
+    return normalize(picked + 0.05 * rng.standard_normal(picked.shape))
+
+
+def timed_search(index, queries, top_k):
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append([vid for vid, _, _ in index.search(query, top_k=top_k)])
+        latencies.append((time.perf_counter() - started) * 1000)
+    return results, np.array(latencies)
+
+
+def recall_at_k(results, truth):
+    return np.mean([
+        len(set(found) & set(expected)) / len(expected)
+        for found, expected in zip(results, truth)
+    ])
+
+
+def benchmark_ivf(vectors, ids, metadata, queries, truth, exact_ms, nprobes, args):
+    ivf = IVFVectorIndex(nlist=args.nlist, train_min=len(vectors) + 1)
+    ivf.upsert(ids, vectors, metadata)
+    started = time.perf_counter()
+    ivf.train()
+    print(f"🧭 IVF trained in {time.perf_counter() - started:.1f}s (nlist={ivf.nlist})")
+
+    print(f"\n{'nprobe':>8} {'recall@' + str(args.top_k):>10} {'avg ms':>9} {'p95 ms':>9} {'speedup':>8}")
+    for nprobe in nprobes:
+        ivf.nprobe = nprobe
+        results, ivf_ms = timed_search(ivf, queries, args.top_k)
+        print(f"{nprobe:>8} {recall_at_k(results, truth):>10.4f} {ivf_ms.mean():>9.2f} "
+              f"{np.percentile(ivf_ms, 95):>9.2f} {exact_ms.mean() / ivf_ms.mean():>7.1f}x")
+
+
+def benchmark_quantization(vectors, ids, metadata, queries, truth, exact, args):
+    """Nén toàn bộ vectors (quét hết mã nén, nlist=1), lưu rồi load lại để vectors float nằm trên đĩa"""
+    print(f"\n{'quant':>6} {'rerank':>7} {'recall@' + str(args.top_k):>10} {'avg ms':>9} "
+          f"{'bytes/vec':>10} {'saving':>7}")
+    float_bytes = exact.memory_bytes() / len(vectors)
+
+    for quantization in [value for value in args.quantization.split(',') if value]:
+        with tempfile.TemporaryDirectory() as path:
+            index = QuantizedVectorIndex(path, quantization=quantization, pq_m=args.pq_m,
+                                         nlist=1, nprobe=1, train_min=len(vectors) + 1)
+            index.upsert(ids, vectors, metadata)
+            index.train()
+            index.save()
+            index = QuantizedVectorIndex(path, quantization=quantization, pq_m=args.pq_m, nlist=1, nprobe=1)
+            bytes_per_vector = index.memory_bytes() / len(vectors)
+
+            for rerank in [int(value) for value in args.rerank.split(',')]:
+                index.rerank = rerank
+                results, latencies = timed_search(index, queries, args.top_k)
+                print(f"{quantization:>6} {rerank:>7} {recall_at_k(results, truth):>10.4f} "
+                      f"{latencies.mean():>9.2f} {bytes_per_vector:>10.0f} "
+                      f"{float_bytes / bytes_per_vector:>6.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark IVF vs exact vector search')
+    parser.add_argument('--index-path', help='Thư mục index local đã lưu (vectors.npy)')
+    parser.add_argument('--size', type=int, default=100000, help='Số vectors giả lập')
+    parser.add_argument('--dim', type=int, default=768, help='Số chiều vectors giả lập')
+    parser.add_argument('--clusters', type=int, default=200, help='Số cụm trong dữ liệu giả lập')
+    parser.add_argument('--queries', type=int, default=200, help='Số câu hỏi')
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--nlist', type=int, default=None, help='Số cụm IVF (mặc định 4*sqrt(n))')
+    parser.add_argument('--nprobe', default='1,4,8,16,32', help='Các giá trị nprobe, cách nhau bởi dấu phẩy')
+    parser.add_argument('--quantization', default='int8,pq', help="Các kiểu nén cần đo ('' = bỏ qua)")
+    parser.add_argument('--pq-m', type=int, default=None, help='Số đoạn con PQ (mặc định dim/4)')
+    parser.add_argument('--rerank', default='0,50', help='Các giá trị re-rank, cách nhau bởi dấu phẩy')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("📏 VECTOR INDEX BENCHMARK (recall@{} vs exact)".format(args.top_k))
+    print("=" * 70)
+
+    if args.index_path:
+        vectors = np.load(os.path.join(args.index_path, VECTORS_FILE))
+        print(f"\n📂 Loaded {len(vectors)} vectors from {args.index_path}")
+    else:
+        vectors = synthetic_vectors(args.size, args.dim, args.clusters)
+        print(f"\n🎲 Generated {len(vectors)} synthetic vectors (dim={args.dim})")
+
+    ids = list(range(len(vectors)))
+    metadata = [{}] * len(vectors)
+    queries = make_queries(vectors, min(args.queries, len(vectors)))
+
+    exact = LocalVectorIndex()
+    exact.upsert(ids, vectors, metadata)
+    truth, exact_ms = timed_search(exact, queries, args.top_k)
+    print(f"\n🎯 Exact: avg {exact_ms.mean():.2f}ms, p95 {np.percentile(exact_ms, 95):.2f}ms")
+
+    nprobes = [int(value) for value in args.nprobe.split(',') if value]
+    if nprobes:
+        benchmark_ivf(vectors, ids, metadata, queries, truth, exact_ms, nprobes, args)
+    if args.quantization:
+        benchmark_quantization(vectors, ids, metadata, queries, truth, exact, args)
+
+    print("\n✅ Done")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+BM25 Index - Tìm kiếm điều luật ngay trong process RAG service
+
+Load bảng articles (mapc, ten, noi_dung, document_id) một lần lúc khởi động
+vào inverted index (token hóa theo âm tiết tiếng Việt, xếp hạng BM25),
+sau đó refresh tăng dần theo updated_at. Mỗi câu hỏi chỉ tốn vài phép
+tra dict trong RAM thay vì một request tới Supabase.
+"""
+
+import heapq
+import itertools
+import math
+import re
+import threading
+import time
+import unicodedata
+from array import array
+
+ARTICLE_COLUMNS = 'id,mapc,ten,noi_dung,document_id,updated_at'
+
+# Tiếng Việt viết cách nhau theo âm tiết, nên \w+ (sau khi NFC) cho ra đúng từng âm tiết
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Tách text thành các âm tiết (NFC, lowercase)"""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(unicodedata.normalize('NFC', text).lower())
+
+
+class BM25Index:
+    """
+    Inverted index BM25 cho bảng articles
+
+    Args:
+        fetch_rows: Hàm nhận dict params PostgREST, trả về list rows của bảng articles
+        page_size: Số rows mỗi lần fetch
+        k1, b: Tham số BM25
+    """
+
+    def __init__(self, fetch_rows, page_size=1000, k1=1.5, b=0.75):
+        self.fetch_rows = fetch_rows
+        self.page_size = page_size
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.RLock()
+        self._refresh_thread = None
+        self._reset()
+
+        self.ready = False
+        self.version = 0
+        self.last_refresh = None
+        self.last_full_load = None
+
+    def _reset(self):
+        self._docs = []                 # slot -> article dict (None nếu đã bị thay thế)
+        self._doc_len = array('I')      # slot -> số token
+        self._postings = {}             # term -> (array slots, array tf), chỉ append
+        self._df = {}                   # term -> số articles còn sống chứa term (không tính tombstone)
+        self._slot_by_id = {}           # article id -> slot
+        self._total_len = 0
+        self._live = 0
+        self._watermark = None          # (updated_at, id) của row mới nhất đã index
+
+    # ------------------------------------------------------------------
+    # Build / refresh
+    # ------------------------------------------------------------------
+
+    def _add(self, row):
+        """Thêm (hoặc thay thế) 1 article vào index. Gọi khi đang giữ lock."""
+        old_slot = self._slot_by_id.get(row['id'])
+        if old_slot is not None:
+            # Tombstone: posting cũ vẫn còn nhưng bị bỏ qua khi chấm điểm (và không tính vào df)
+            old = self._docs[old_slot]
+            for term in set(tokenize(f"{old['ten'] or ''} {old['noi_dung'] or ''}")):
+                self._df[term] -= 1
+            self._docs[old_slot] = None
+            self._total_len -= self._doc_len[old_slot]
+            self._live -= 1
+
+        slot = len(self._docs)
+        tokens = tokenize(f"{row.get('ten') or ''} {row.get('noi_dung') or ''}")
+
+        tf = {}
+        for token in tokens:
+            tf[token] = tf.get(token, 0) + 1
+        for term, count in tf.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = (array('I'), array('I'))
+                self._postings[term] = posting
+            posting[0].append(slot)
+            posting[1].append(count)
+            self._df[term] = self._df.get(term, 0) + 1
+
+        self._docs.append({
+            'id': row['id'],
+            'mapc': row.get('mapc'),
+            'ten': row.get('ten'),
+            'noi_dung': row.get('noi_dung'),
+            'document_id': row.get('document_id'),
+        })
+        self._doc_len.append(len(tokens))
+        self._slot_by_id[row['id']] = slot
+        self._total_len += len(tokens)
+        self._live += 1
+
+        watermark = (row.get('updated_at') or '', row['id'])
+        if self._watermark is None or watermark > self._watermark:
+            self._watermark = watermark
+
+    def _iter_rows(self, params):
+        """Duyệt bảng articles theo từng trang (keyset pagination)"""
+        last = None
+        while True:
+            page_params = dict(params)
+            page_params['limit'] = self.page_size
+            if last is not None:
+                page_params.update(last)
+            rows = self.fetch_rows(page_params)
+            if not rows:
+                return
+            yield from rows
+            if len(rows) < self.page_size:
+                return
+            last = self._next_page_filter(rows[-1], params)
+
+    @staticmethod
+    def _next_page_filter(row, params):
+        if params.get('order', '').startswith('updated_at'):
+            updated_at = row.get('updated_at')
+            return {'or': f'(updated_at.gt."{updated_at}",and(updated_at.eq."{updated_at}",id.gt.{row["id"]}))'}
+        return {'id': f"gt.{row['id']}"}
+
+    def load(self):
+        """Load toàn bộ articles và build lại index từ đầu"""
+        started = time.time()
+        fresh = BM25Index(self.fetch_rows, self.page_size, self.k1, self.b)
+        for row in self._iter_rows({'select': ARTICLE_COLUMNS, 'order': 'id.asc'}):
+            fresh._add(row)
+
+        with self._lock:
+            self._docs = fresh._docs
+            self._doc_len = fresh._doc_len
+            self._postings = fresh._postings
+            self._df = fresh._df
+            self._slot_by_id = fresh._slot_by_id
+            self._total_len = fresh._total_len
+            self._live = fresh._live
+            self._watermark = fresh._watermark
+            self.ready = True
+            self.version += 1
+            self.last_refresh = self.last_full_load = time.time()
+
+        print(f"📚 BM25 index loaded: {self._live} articles, "
+              f"{len(self._postings)} terms ({time.time() - started:.2f}s)")
+        return self._live
+
+    def refresh(self):
+        """Index lại các articles có updated_at mới hơn watermark. Trả về số rows đã cập nhật."""
+        if not self.ready or self._watermark is None:
+            return self.load()
+
+        updated_at, last_id = self._watermark
+        params = {
+            'select': ARTICLE_COLUMNS,
+            'order': 'updated_at.asc,id.asc',
+            'or': f'(updated_at.gt."{updated_at}",and(updated_at.eq."{updated_at}",id.gt.{last_id}))'
+        }
+
+        count = 0
+        for row in self._iter_rows(params):
+            with self._lock:
+                self._add(row)
+            count += 1
+
+        with self._lock:
+            if count:
+                self.version += 1
+            self.last_refresh = time.time()
+            garbage = len(self._docs) - self._live
+
+        if count:
+            print(f"🔄 BM25 index refreshed: {count} articles updated")
+
+        # Quá nhiều tombstone -> build lại cho gọn
+        if garbage > max(1000, self._live // 4):
+            self.load()
+        return count
+
+    def start_auto_refresh(self, interval=300, full_reload_interval=3600):
+        """
+        Chạy thread nền refresh index định kỳ
+
+        Refresh tăng dần mỗi `interval` giây; load lại toàn bộ mỗi
+        `full_reload_interval` giây để loại các articles đã bị xóa.
+        """
+        if self._refresh_thread is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    if time.time() - (self.last_full_load or 0) >= full_reload_interval:
+                        self.load()
+                    else:
+                        self.refresh()
+                except Exception as e:
+                    print(f"❌ BM25 refresh error: {e}")
+
+        self._refresh_thread = threading.Thread(target=run, name='bm25-refresh', daemon=True)
+        self._refresh_thread.start()
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def search(self, query, limit=3):
+        """
+        Tìm kiếm BM25 - cùng interface với search_documents
+
+        Returns:
+            List article dicts (mapc, ten, noi_dung, document_id, rank).
+            Nếu không đủ `limit` kết quả thì bổ sung các articles mới nhất (rank = 0).
+        """
+        terms = set(tokenize(query))
+
+        # Refresh chỉ append (docs, doc_len, posting) hoặc đánh tombstone, load() thay cả
+        # list mới: trong lock chỉ lấy tham chiếu + độ dài hiện tại, chấm điểm ngoài lock
+        # trên phần đã có tới các mốc đó (không copy corpus mỗi câu hỏi)
+        with self._lock:
+            live = self._live
+            if not live:
+                return []
+
+            avg_len = self._total_len / live
+            docs = self._docs
+            doc_count = len(docs)
+            doc_len = self._doc_len
+            postings = []
+            for term in terms:
+                posting = self._postings.get(term)
+                if posting is not None and self._df.get(term):
+                    postings.append((posting[0], posting[1], len(posting[0]), self._df[term]))
+
+        k1, b = self.k1, self.b
+        scores = {}
+        for slots, tfs, count, df in postings:
+            idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+            for slot, tf in itertools.islice(zip(slots, tfs), count):
+                if docs[slot] is None:
+                    continue
+                norm = k1 * (1 - b + b * doc_len[slot] / avg_len)
+                scores[slot] = scores.get(slot, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        # Doc có thể vừa bị tombstone sau khi chấm điểm
+        results = [dict(doc, rank=score) for doc, score in ((docs[slot], score) for slot, score in top) if doc]
+
+        # Bổ sung articles mới nhất nếu chưa đủ (giống hàm search_articles)
+        slot = doc_count - 1
+        while len(results) < limit and slot >= 0:
+            doc = docs[slot]
+            if doc is not None and slot not in scores:
+                results.append(dict(doc, rank=0.0))
+            slot -= 1
+
+        return results
+
+    def stats(self):
+        """Thông tin index cho /health"""
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'version': self.version,
+                'articles': self._live,
+                'terms': len(self._postings),
+                'last_refresh': self.last_refresh,
+            }
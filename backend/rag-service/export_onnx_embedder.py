@@ -0,0 +1,164 @@
+"""
+Export Embedding Model sang ONNX int8
+
+Export transformer của EMBEDDING_MODEL (sentence-transformers) sang ONNX,
+quantize weights int8 (dynamic quantization), lưu tokenizer, rồi kiểm tra
+cosine similarity giữa output ONNX và output torch trên các câu mẫu.
+
+Chỉ bước export cần torch/sentence-transformers; lúc chạy RAG service /
+ingestion với EMBEDDING_BACKEND=onnx chỉ cần onnxruntime + tokenizers.
+
+Usage:
+    python export_onnx_embedder.py                       # export + parity check
+    python export_onnx_embedder.py --check-only          # chỉ parity check model đã export
+    python export_onnx_embedder.py --output ./data/onnx-embedder --threads 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from models.embedder import DEFAULT_EMBEDDING_MODEL
+from models.onnx_embedder import (CONFIG_FILE, DEFAULT_ONNX_MODEL_DIR, MODEL_FILE,
+                                  OnnxEmbedder)
+
+load_dotenv()
+
+PARITY_SENTENCES = [
+    "Phạm vi điều chỉnh của Bộ luật Dân sự là gì?",
+    "quyền sở hữu đất đai",
+    "thành lập doanh nghiệp",
+    "thuế thu nhập doanh nghiệp",
+    "điều kiện đầu tư",
+    "xử lý vi phạm",
+    "Mức hỗ trợ học nghề là bao nhiêu phần trăm?",
+    "Người lao động có quyền đơn phương chấm dứt hợp đồng lao động trong trường hợp nào?",
+    "Bộ luật này quy định về quan hệ nhân thân và quan hệ tài sản giữa cá nhân, pháp nhân, "
+    "chủ thể khác trong lĩnh vực dân sự.",
+    "Bộ luật Hình sự quy định về những hành vi phạm tội, hình phạt và trách nhiệm hình sự.",
+]
+
+
+def export(model_name, output_dir):
+    """Export transformer sang ONNX fp32 rồi quantize int8"""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    print(f"\n📦 Exporting {model_name} -> {output_dir}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    dummy = tokenizer(["xin chào"], return_tensors='pt')
+    fp32_path = os.path.join(output_dir, 'model-fp32.onnx')
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            (dummy['input_ids'], dummy['attention_mask']),
+            fp32_path,
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['last_hidden_state'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'last_hidden_state': {0: 'batch', 1: 'sequence'},
+            },
+            opset_version=14
+        )
+
+    print("   🗜️ Quantizing weights to int8...")
+    quantize_dynamic(fp32_path, os.path.join(output_dir, MODEL_FILE), weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            'model_name': model_name,
+            'max_seq_length': model.max_seq_length,
+            'dimension': model.get_sentence_embedding_dimension(),
+            'pad_token': tokenizer.pad_token,
+            'pad_token_id': tokenizer.pad_token_id,
+        }, f, ensure_ascii=False, indent=2)
+
+    size_mb = os.path.getsize(os.path.join(output_dir, MODEL_FILE)) / 1024 / 1024
+    print(f"   ✅ Saved {MODEL_FILE} ({size_mb:.0f} MB)")
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def parity_check(output_dir, threads, min_cosine, rounds):
+    """So sánh ONNX int8 với torch: cosine similarity, thời gian load và encode"""
+    onnx_embedder = OnnxEmbedder(output_dir, threads=threads)
+    model_name = onnx_embedder.config['model_name']
+    print(f"\n🔍 Parity check (ONNX int8 vs torch): {model_name}")
+
+    _, onnx_load = timed(lambda: onnx_embedder.encode(["khởi động"]))
+
+    def load_torch():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name, device='cpu')
+
+    torch_model, torch_load = timed(load_torch)
+
+    batch = PARITY_SENTENCES * 4
+    onnx_vectors = onnx_embedder.encode(batch)
+    torch_vectors = torch_model.encode(batch, convert_to_numpy=True, normalize_embeddings=True,
+                                       show_progress_bar=False)
+    cosine = (onnx_vectors * torch_vectors).sum(axis=1)
+
+    _, onnx_encode = timed(lambda: [onnx_embedder.encode(batch) for _ in range(rounds)])
+    _, torch_encode = timed(lambda: [torch_model.encode(batch, normalize_embeddings=True,
+                                                        show_progress_bar=False) for _ in range(rounds)])
+
+    print(f"   Cosine similarity: min {cosine.min():.4f}, mean {cosine.mean():.4f}")
+    print(f"   Load (+ first encode): torch {torch_load:.1f}s, onnx {onnx_load:.1f}s")
+    print(f"   Encode {len(batch)} texts: torch {torch_encode / rounds * 1000:.0f}ms, "
+          f"onnx {onnx_encode / rounds * 1000:.0f}ms ({torch_encode / onnx_encode:.1f}x)")
+
+    if cosine.min() < min_cosine:
+        print(f"\n❌ Parity check failed: min cosine {cosine.min():.4f} < {min_cosine}")
+        return False
+    print("\n✅ Parity check passed")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export embedding model to int8 ONNX')
+    parser.add_argument('--model', default=os.getenv('EMBEDDING_MODEL', DEFAULT_EMBEDDING_MODEL))
+    parser.add_argument('--output', default=os.getenv('ONNX_MODEL_DIR', DEFAULT_ONNX_MODEL_DIR))
+    parser.add_argument('--threads', type=int, default=int(os.getenv('ONNX_THREADS', 0)),
+                        help='Số thread ONNX Runtime (0 = tự chọn)')
+    parser.add_argument('--check-only', action='store_true', help='Chỉ chạy parity check')
+    parser.add_argument('--min-cosine', type=float, default=0.98,
+                        help='Cosine similarity tối thiểu với output torch')
+    parser.add_argument('--rounds', type=int, default=5, help='Số lần encode khi đo thời gian')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("🧠 ONNX EMBEDDING EXPORT")
+    print("=" * 70)
+
+    if not args.check_only:
+        export(args.model, args.output)
+
+    if not parity_check(args.output, args.threads, args.min_cosine, args.rounds):
+        sys.exit(1)
+
+    print(f"\nSet EMBEDDING_BACKEND=onnx and ONNX_MODEL_DIR={args.output} to use it.")
+
+
+if __name__ == "__main__":
+    main()
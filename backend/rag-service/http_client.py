@@ -0,0 +1,57 @@
+"""
+HTTP Client - Connection pool dùng chung cho các API bên ngoài
+
+Mỗi PooledClient giữ 1 requests.Session với HTTPAdapter riêng:
+connection pool theo host, keep-alive, headers cố định build 1 lần.
+Nhờ vậy các request nhỏ (Supabase REST, Gemini) không phải bắt tay
+TCP + TLS lại mỗi lần gọi.
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PooledClient:
+    """
+    HTTP client có connection pool cho 1 base URL
+
+    Args:
+        base_url: URL gốc, path của từng request được nối vào sau
+        headers: Headers gửi kèm mọi request
+        timeout: Read timeout mặc định (giây), có thể override theo từng call
+        connect_timeout: Connect timeout (giây)
+        pool_connections: Số host pool được giữ
+        pool_maxsize: Số connection keep-alive tối đa mỗi host
+    """
+
+    def __init__(self, base_url, headers=None, timeout=10, connect_timeout=5,
+                 pool_connections=10, pool_maxsize=20):
+        self.base_url = (base_url or '').rstrip('/')
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method, path, timeout=None, **kwargs):
+        """Gửi request tới base_url + path qua connection pool"""
+        read_timeout = self.timeout if timeout is None else timeout
+        return self.session.request(
+            method,
+            f"{self.base_url}{path}",
+            timeout=(self.connect_timeout, read_timeout),
+            **kwargs
+        )
+
+    def get(self, path, params=None, timeout=None, **kwargs):
+        return self.request('GET', path, params=params, timeout=timeout, **kwargs)
+
+    def post(self, path, json=None, timeout=None, **kwargs):
+        return self.request('POST', path, json=json, timeout=timeout, **kwargs)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,112 @@
+"""
+Hybrid Retrieval - Gộp kết quả tìm kiếm từ khóa và tìm kiếm vector
+
+Hai nhánh (lexical: search_articles / BM25, vector: VectorStore) chạy song
+song, mỗi nhánh có timeout riêng (truyền xuống hàm search để request mạng
+của nhánh tự dừng, thread được trả lại). Kết quả được gộp bằng reciprocal-rank
+fusion (RRF): score = sum(1 / (k + rank)) qua các nhánh, nên không cần
+chuẩn hóa thang điểm ts_rank / BM25 / cosine với nhau. Nhánh nào chậm hoặc
+lỗi thì bị bỏ qua, câu hỏi vẫn được trả lời bằng nhánh còn lại.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def article_key(item):
+    """Khóa để nhận ra cùng 1 điều luật giữa các nhánh (chunk -> điều luật gốc)"""
+    return item.get('article_mapc') or item.get('mapc')
+
+
+def reciprocal_rank_fusion(result_lists, k=60, limit=None):
+    """
+    Gộp nhiều danh sách kết quả đã xếp hạng
+
+    Args:
+        result_lists: Dict tên nhánh -> list items (đã sắp xếp, tốt nhất trước)
+        k: Hằng số RRF (lớn hơn -> các hạng thấp được coi trọng hơn)
+        limit: Số kết quả tối đa
+
+    Returns:
+        List items (item đầu tiên gặp cho mỗi khóa) kèm 'rank' = điểm RRF
+        và 'sources' = các nhánh đã trả về item đó
+    """
+    fused = {}
+    for source, items in result_lists.items():
+        seen = set()
+        for position, item in enumerate(items, 1):
+            key = article_key(item)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {'item': item, 'score': 0.0, 'sources': []}
+            entry['score'] += 1.0 / (k + position)
+            entry['sources'].append(source)
+
+    ranked = sorted(fused.items(), key=lambda kv: (-kv[1]['score'], kv[0]))
+    if limit is not None:
+        ranked = ranked[:limit]
+    return [dict(entry['item'], rank=entry['score'], sources=entry['sources']) for _, entry in ranked]
+
+
+class HybridRetriever:
+    """
+    Chạy song song các nhánh retrieval rồi gộp bằng RRF
+
+    Args:
+        legs: Dict tên nhánh -> (hàm search(query, top_k, timeout) -> list items, timeout giây)
+        candidates: Số kết quả lấy từ mỗi nhánh trước khi gộp
+        rrf_k: Hằng số RRF
+        max_in_flight: Số lần gọi tối đa đang chạy của mỗi nhánh; đầy thì bỏ qua nhánh
+            đó cho câu hỏi mới (nhánh đang chậm không chiếm hết thread pool)
+    """
+
+    def __init__(self, legs, candidates=10, rrf_k=60, max_in_flight=8):
+        self.legs = legs
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self._slots = {name: threading.BoundedSemaphore(max_in_flight) for name in legs}
+        # Đủ thread cho mọi lần gọi được nhận: không có việc nào phải xếp hàng trong pool
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_in_flight * len(legs),
+            thread_name_prefix='hybrid-retrieval'
+        )
+        self.skipped = {name: 0 for name in legs}
+
+    def _run_leg(self, name, search, query, timeout):
+        try:
+            return search(query, self.candidates, timeout)
+        finally:
+            self._slots[name].release()
+
+    def search(self, query, limit=3):
+        started = time.time()
+        futures = {}
+        for name, (search, timeout) in self.legs.items():
+            if not self._slots[name].acquire(blocking=False):
+                self.skipped[name] += 1
+                print(f"  ⏱️ {name} retrieval skipped: too many calls in flight")
+                continue
+            try:
+                futures[name] = self._executor.submit(self._run_leg, name, search, query, timeout)
+            except Exception:
+                self._slots[name].release()
+                raise
+
+        result_lists = {}
+        for name, future in futures.items():
+            timeout = self.legs[name][1]
+            try:
+                result_lists[name] = future.result(timeout=max(0.0, started + timeout - time.time()))
+            except Exception as e:
+                # Nhánh tự dừng theo timeout của nó (và trả slot) - ở đây chỉ không chờ nữa
+                print(f"  ⏱️ {name} retrieval skipped: {type(e).__name__} {e}")
+
+        results = reciprocal_rank_fusion(result_lists, k=self.rrf_k, limit=limit)
+        print(f"  🔀 Hybrid: {', '.join(f'{n}={len(r)}' for n, r in result_lists.items()) or 'no legs'} "
+              f"-> {len(results)} ({(time.time() - started) * 1000:.0f}ms)")
+        return results
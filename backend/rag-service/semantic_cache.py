@@ -0,0 +1,139 @@
+"""
+Semantic Cache - Cache câu trả lời theo độ tương đồng ngữ nghĩa
+
+Answer cache chỉ khớp khi câu hỏi giống hệt (sau chuẩn hóa), trong khi
+phần lớn câu hỏi là diễn đạt lại. Semantic cache lưu embedding của các
+câu hỏi đã trả lời trong 1 ma trận cố định kích thước; câu hỏi mới được
+so với toàn bộ ma trận bằng 1 phép nhân, nếu cosine similarity vượt
+ngưỡng thì trả lại câu trả lời + citations đã lưu.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Cache nearest-neighbour trong RAM, thread-safe
+
+    Args:
+        embed_fn: Hàm text -> vector float32 đã chuẩn hóa L2
+        max_entries: Số câu hỏi tối đa (số dòng của ma trận)
+        threshold: Cosine similarity tối thiểu để coi là trùng
+        ttl: Thời gian sống của mỗi entry (giây)
+    """
+
+    def __init__(self, embed_fn, max_entries=2000, threshold=0.92, ttl=3600):
+        self.embed_fn = embed_fn
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+
+        self._matrix = None                     # (max_entries, dim), cấp phát khi add lần đầu
+        self._entries = [None] * max_entries    # slot -> dict(question, value, namespace, expires_at, last_used)
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def embed(self, question):
+        return np.asarray(self.embed_fn(question), dtype=np.float32)
+
+    def lookup(self, vector, namespace):
+        """
+        Tìm câu hỏi đã cache gần nhất với `vector`
+
+        Returns:
+            (value, similarity, question gốc) hoặc None nếu không có entry nào vượt ngưỡng
+        """
+        with self._lock:
+            if self._size == 0:
+                self.misses += 1
+                return None
+
+            scores = self._matrix[:self._size] @ vector
+            now = time.time()
+
+            # Thử lần lượt từ điểm cao xuống, bỏ entry hết hạn / khác namespace
+            for slot in np.argsort(-scores):
+                score = float(scores[slot])
+                if score < self.threshold:
+                    break
+                entry = self._entries[slot]
+                if entry is None or entry['namespace'] != namespace:
+                    continue
+                if entry['expires_at'] < now:
+                    self._free(slot)
+                    continue
+
+                entry['last_used'] = now
+                self.hits += 1
+                return entry['value'], score, entry['question']
+
+            self.misses += 1
+            return None
+
+    def add(self, vector, value, namespace, question=''):
+        """Lưu câu trả lời cho câu hỏi có embedding `vector`"""
+        vector = np.asarray(vector, dtype=np.float32)
+        now = time.time()
+
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+            slot = self._find_slot(now)
+            self._matrix[slot] = vector
+            self._entries[slot] = {
+                'question': question,
+                'value': value,
+                'namespace': namespace,
+                'expires_at': now + self.ttl,
+                'last_used': now,
+            }
+
+    def _find_slot(self, now):
+        """Slot trống, hoặc slot hết hạn, hoặc slot ít dùng gần đây nhất (LRU)"""
+        if self._size < self.max_entries:
+            self._size += 1
+            return self._size - 1
+
+        lru_slot, lru_time = 0, None
+        for slot, entry in enumerate(self._entries):
+            if entry is None or entry['expires_at'] < now:
+                return slot
+            if lru_time is None or entry['last_used'] < lru_time:
+                lru_slot, lru_time = slot, entry['last_used']
+
+        self.evictions += 1
+        return lru_slot
+
+    def _free(self, slot):
+        self._entries[slot] = None
+        self._matrix[slot] = 0.0
+
+    def clear(self):
+        with self._lock:
+            self._entries = [None] * self.max_entries
+            self._size = 0
+            if self._matrix is not None:
+                self._matrix[:] = 0.0
+
+    def stats(self):
+        """Thông tin cache cho /health"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': sum(1 for entry in self._entries[:self._size] if entry is not None),
+                'max_entries': self.max_entries,
+                'threshold': self.threshold,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
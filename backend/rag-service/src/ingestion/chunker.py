@@ -0,0 +1,180 @@
+"""
+Chunker - Chia văn bản luật thành chunks vừa cửa sổ token của embedding model
+
+Embedding model chỉ đọc tối đa max_seq_length tokens (128-512 tùy model),
+phần dư bị cắt bỏ mà không báo lỗi. Chunker đếm token bằng chính tokenizer
+của model và chia theo cấu trúc văn bản luật, từ thô đến mịn:
+
+    Chương / Mục / Điều  ->  Khoản (1. 2. ...)  ->  Điểm (a) b) ...)
+    ->  đoạn / dòng  ->  câu  ->  từ
+
+Các đơn vị liền nhau được gộp lại tới gần đủ ngân sách token; chunk sau
+lặp lại vài đơn vị cuối của chunk trước (overlap). Tiêu đề (tên văn bản,
+tên điều) được lặp ở đầu mỗi chunk để chunk tự đủ ngữ cảnh.
+
+Chunk id ổn định: article ngắn giữ nguyên mapc, article dài thành
+"{mapc}-p1", "{mapc}-p2", ... (cùng nội dung thì cùng id).
+"""
+
+import math
+import os
+import re
+
+# (pattern tách, ký tự nối lại) theo thứ tự từ thô đến mịn
+LEVELS = [
+    (re.compile(r'^(?=(?:Chương|Mục|Điều)\s+[0-9IVXLC]+\b)', re.MULTILINE), '\n'),
+    (re.compile(r'^(?=\d+\.\s)', re.MULTILINE), '\n'),
+    (re.compile(r'^(?=[a-zđ]\)\s)', re.MULTILINE), '\n'),
+    (re.compile(r'\n+'), '\n'),
+    (re.compile(r'(?<=[.;:!?])\s+'), ' '),
+]
+
+DEFAULT_MAX_TOKENS = 256
+DEFAULT_OVERLAP_TOKENS = 32
+
+
+def approx_tokens(text):
+    """Ước lượng số token khi không có tokenizer (~1.5 token / âm tiết tiếng Việt + token đặc biệt)"""
+    return math.ceil(len(text.split()) * 1.5) + 2
+
+
+class Chunker:
+    """
+    Args:
+        max_tokens: Số token tối đa mỗi chunk (gồm tiêu đề và token đặc biệt)
+        overlap_tokens: Số token tối đa lặp lại từ cuối chunk trước (0 = không overlap)
+        count_tokens: Hàm text -> số token (mặc định approx_tokens)
+    """
+
+    def __init__(self, max_tokens=DEFAULT_MAX_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS, count_tokens=None):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.count_tokens = count_tokens or approx_tokens
+
+    def split_text(self, text, header=''):
+        """
+        Chia text thành các đoạn, mỗi đoạn (kèm header) <= max_tokens
+
+        Returns:
+            List text của các chunk (đã gắn header)
+        """
+        text = text.strip()
+        header = header.strip()
+        # Tiêu đề quá dài thì bỏ, tránh chiếm hết ngân sách của nội dung
+        if header and self.count_tokens(header) > self.max_tokens // 2:
+            header = ''
+
+        def with_header(piece):
+            return f'{header}\n{piece}' if header else piece
+
+        def fits(piece):
+            return self.count_tokens(with_header(piece)) <= self.max_tokens
+
+        return [with_header(piece) for piece in self._pieces(text, fits, 0)]
+
+    def _pieces(self, text, fits, level):
+        if fits(text):
+            return [text]
+        if level == len(LEVELS):
+            return self._split_words(text, fits)
+
+        pattern, sep = LEVELS[level]
+        units = [unit.strip() for unit in pattern.split(text) if unit.strip()]
+        if len(units) <= 1:
+            return self._pieces(text, fits, level + 1)
+
+        # Đơn vị quá dài thì chia tiếp ở mức mịn hơn
+        atoms = []
+        for unit in units:
+            atoms += [unit] if fits(unit) else self._pieces(unit, fits, level + 1)
+        return self._pack(atoms, sep, fits)
+
+    def _pack(self, atoms, sep, fits):
+        """Gộp các đơn vị liền nhau tới gần đủ ngân sách, có overlap giữa các chunk"""
+        chunks = []
+        current = []
+        for atom in atoms:
+            if current and fits(sep.join(current + [atom])):
+                current.append(atom)
+                continue
+
+            if current:
+                chunks.append(sep.join(current))
+            current = self._overlap(current, atom, sep, fits) + [atom]
+        if current:
+            chunks.append(sep.join(current))
+        return chunks
+
+    def _overlap(self, previous, atom, sep, fits):
+        """Các đơn vị cuối của chunk trước (tổng <= overlap_tokens) để lặp lại ở chunk mới"""
+        if self.overlap_tokens <= 0:
+            return []
+        tail = []
+        for unit in reversed(previous):
+            candidate = [unit] + tail
+            if self.count_tokens(sep.join(candidate)) > self.overlap_tokens:
+                break
+            if not fits(sep.join(candidate + [atom])):
+                break
+            tail = candidate
+        # Không lặp lại toàn bộ chunk trước
+        return tail if len(tail) < len(previous) else []
+
+    def _split_words(self, text, fits):
+        """Mức cuối: chia theo từ; 1 "từ" quá dài (URL, bảng biểu dính liền) thì chia đôi theo ký tự"""
+        words = text.split()
+        if len(words) > 1:
+            atoms = []
+            for word in words:
+                atoms += [word] if fits(word) else self._split_words(word, fits)
+            return self._pack(atoms, ' ', fits)
+
+        if fits(text) or len(text) <= 1:
+            return [text]
+        middle = len(text) // 2
+        return self._split_words(text[:middle], fits) + self._split_words(text[middle:], fits)
+
+    def chunk(self, article, header='', body=None):
+        """
+        Chia 1 article/văn bản thành các chunk dict
+
+        Args:
+            article: Dict có 'mapc', 'ten', 'noidung'
+            header: Tiêu đề lặp ở đầu mỗi chunk
+            body: Nội dung cần chia (mặc định article['noidung'])
+
+        Returns:
+            [article] nếu vừa 1 chunk, ngược lại các bản sao với mapc "{mapc}-p{n}",
+            ten "(Phần n)" và 'article_mapc' = mapc gốc
+        """
+        body = article['noidung'] if body is None else body
+        pieces = self.split_text(body, header=header)
+        if len(pieces) <= 1:
+            return [article]
+
+        chunks = []
+        for idx, piece in enumerate(pieces, 1):
+            chunk = dict(article, article_mapc=article['mapc'])
+            chunk['mapc'] = f"{article['mapc']}-p{idx}"
+            chunk['ten'] = f"{article['ten']} (Phần {idx})"
+            chunk['noidung'] = piece
+            chunks.append(chunk)
+        return chunks
+
+
+def chunker_from_env(embedder=None):
+    """
+    Chunker theo CHUNK_MAX_TOKENS / CHUNK_OVERLAP_TOKENS, đếm token bằng tokenizer của embedder
+
+    CHUNK_MAX_TOKENS mặc định = max_seq_length của embedding model.
+    """
+    max_tokens = os.getenv('CHUNK_MAX_TOKENS')
+    if max_tokens:
+        max_tokens = int(max_tokens)
+    else:
+        max_tokens = getattr(embedder, 'max_seq_length', None) or DEFAULT_MAX_TOKENS
+    return Chunker(
+        max_tokens=max_tokens,
+        overlap_tokens=int(os.getenv('CHUNK_OVERLAP_TOKENS', DEFAULT_OVERLAP_TOKENS)),
+        count_tokens=getattr(embedder, 'count_tokens', None)
+    )
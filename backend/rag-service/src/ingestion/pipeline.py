@@ -0,0 +1,181 @@
+"""
+Pipeline - Chạy các bước ingestion song song, nối bằng hàng đợi có giới hạn
+
+    source (generator) -> [stage 1: N workers] -> [stage 2: M workers] -> kết quả
+
+Source chạy trong 1 thread riêng, mỗi stage có pool thread riêng; giữa các
+bước là queue.Queue(maxsize=queue_size) nên các bước chạy chồng lên nhau
+(fetch trang tiếp theo trong lúc đang embed / upsert) mà số item đang xử lý
+luôn bị chặn trên, RAM không tăng theo kích thước corpus.
+
+Lỗi không bắt trong stage sẽ dừng toàn bộ pipeline và được raise lại ở
+thread đang đọc kết quả.
+"""
+
+import queue
+import threading
+import time
+
+_END = object()
+
+
+def batched(iterable, size):
+    """Gom iterable thành các list tối đa `size` phần tử (lazy)"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Stage:
+    """
+    1 bước của pipeline
+
+    Args:
+        name: Tên (dùng trong stats / log)
+        fn: Hàm item -> item kết quả (trả về None để bỏ item)
+        workers: Số thread chạy fn song song
+    """
+
+    def __init__(self, name, fn, workers=1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self._remaining = self.workers
+        self._lock = threading.Lock()
+
+
+class Pipeline:
+    """
+    Args:
+        source: Iterable các item đầu vào (đọc lazy trong thread riêng)
+        stages: List Stage, chạy theo thứ tự
+        queue_size: Số item tối đa chờ giữa 2 bước
+    """
+
+    def __init__(self, source, stages, queue_size=4):
+        self.source = source
+        self.stages = stages
+        self.queue_size = queue_size
+
+        self.produced = 0
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+        self._stop = threading.Event()
+        self._error = None
+        self._threads = []
+
+    def _put(self, q, item):
+        """Put có kiểm tra dừng (tránh kẹt khi pipeline bị hủy giữa chừng)"""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _fail(self, error):
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    def _end(self, index):
+        """Báo hết dữ liệu cho bước thứ `index` (1 sentinel cho mỗi worker)"""
+        consumers = self.stages[index].workers if index < len(self.stages) else 1
+        for _ in range(consumers):
+            self._put(self._queues[index], _END)
+
+    def _run_source(self):
+        try:
+            for item in self.source:
+                if not self._put(self._queues[0], item):
+                    return
+                self.produced += 1
+            self._end(0)
+        except Exception as e:
+            self._fail(e)
+
+    def _run_worker(self, index):
+        stage = self.stages[index]
+        inbox, outbox = self._queues[index], self._queues[index + 1]
+
+        try:
+            while True:
+                item = self._get(inbox)
+                if item is _END:
+                    break
+
+                started = time.perf_counter()
+                result = stage.fn(item)
+                elapsed = time.perf_counter() - started
+
+                with stage._lock:
+                    stage.processed += 1
+                    stage.busy_seconds += elapsed
+                if result is not None and not self._put(outbox, result):
+                    return
+        except Exception as e:
+            self._fail(e)
+            return
+
+        with stage._lock:
+            stage._remaining -= 1
+            last = stage._remaining == 0
+        if last:
+            self._end(index + 1)
+
+    def __iter__(self):
+        """Chạy pipeline, trả về kết quả của bước cuối theo thứ tự hoàn thành"""
+        self._threads = [threading.Thread(target=self._run_source, name='pipeline-source', daemon=True)]
+        for index, stage in enumerate(self.stages):
+            self._threads += [
+                threading.Thread(target=self._run_worker, args=(index,),
+                                 name=f'pipeline-{stage.name}-{worker}', daemon=True)
+                for worker in range(stage.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+
+        try:
+            while True:
+                item = self._get(self._queues[-1])
+                if item is _END:
+                    break
+                yield item
+        finally:
+            # Hết dữ liệu thì các thread đã xong; nếu consumer dừng sớm / có lỗi thì dừng chúng
+            self._stop.set()
+            for thread in self._threads:
+                thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+    def stats(self):
+        """Số item và thời gian bận của từng bước"""
+        return {
+            'produced': self.produced,
+            'stages': {
+                stage.name: {
+                    'workers': stage.workers,
+                    'processed': stage.processed,
+                    'busy_seconds': round(stage.busy_seconds, 2),
+                }
+                for stage in self.stages
+            },
+        }
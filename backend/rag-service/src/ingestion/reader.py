@@ -0,0 +1,53 @@
+"""
+Supabase Reader - Đọc cả bảng theo từng trang (keyset pagination)
+
+`.select(...).execute()` không phân trang bị PostgREST cắt ở giới hạn số
+dòng (max-rows) mà không báo lỗi, và phải giữ cả payload trong RAM.
+iter_table đọc theo khóa tăng dần:
+
+    SELECT <columns> FROM <table> WHERE id > <id cuối trang trước> ORDER BY id LIMIT <page_size>
+
+nên mỗi trang dùng index của khóa (không chậm dần như OFFSET) và không
+bỏ sót / lặp dòng khi bảng bị xóa bớt trong lúc đọc.
+"""
+
+DEFAULT_PAGE_SIZE = 1000
+
+
+def iter_table_pages(client, table, columns='*', page_size=DEFAULT_PAGE_SIZE, key='id',
+                     filters=None, start_after=None):
+    """
+    Đọc bảng theo từng trang (generator các list rows)
+
+    Args:
+        client: Supabase client
+        table: Tên bảng
+        columns: Cột cần lấy (cú pháp select của PostgREST, phải gồm cột key)
+        page_size: Số dòng mỗi trang (nên <= max-rows của PostgREST)
+        key: Cột khóa duy nhất, tăng dần để phân trang
+        filters: Hàm query -> query để thêm điều kiện (vd. lambda q: q.eq('loai', 'Luật'))
+        start_after: Chỉ đọc các dòng có key > giá trị này
+    """
+    last = start_after
+    while True:
+        query = client.table(table).select(columns)
+        if filters is not None:
+            query = filters(query)
+        if last is not None:
+            query = query.gt(key, last)
+
+        rows = query.order(key).limit(page_size).execute().data or []
+        if rows:
+            yield rows
+
+        if len(rows) < page_size:
+            return
+        last = rows[-1][key]
+
+
+def iter_table(client, table, columns='*', page_size=DEFAULT_PAGE_SIZE, key='id',
+               filters=None, start_after=None):
+    """Đọc bảng theo từng dòng (generator), cùng tham số với iter_table_pages"""
+    for rows in iter_table_pages(client, table, columns=columns, page_size=page_size, key=key,
+                                 filters=filters, start_after=start_after):
+        yield from rows
@@ -0,0 +1,176 @@
+"""
+Sync State - Trạng thái của lần sync thành công gần nhất (cho sync incremental)
+
+Lưu trong 1 file SQLite (tra theo từng article, không load hết vào RAM),
+mỗi vector index (provider:index_name) 1 khóa:
+
+    watermark   - updated_at lớn nhất của các articles đã sync
+                  (lần sau đọc lại từ watermark - overlap, xem since())
+    chunks      - article id -> list mapc các chunk đã upsert (để xóa chunk
+                  thừa khi article ngắn đi, hoặc khi article bị xóa)
+    run         - lần sync gần nhất chạm tới article (full sync: article không
+                  được chạm tới trong lần chạy là article đã bị xóa)
+
+Mọi thay đổi nằm trong 1 transaction, chỉ ghi xuống khi save() (sync lỗi
+giữa chừng thì state giữ nguyên như lần thành công trước).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+# updated_at = NOW() là thời điểm bắt đầu transaction: row commit muộn (hoặc commit
+# trong lúc sync đang đọc) có thể mang updated_at nhỏ hơn watermark. Đọc lại 1 khoảng
+# trước watermark để không bỏ sót (upsert idempotent, đọc lại vài row không sao).
+DEFAULT_WATERMARK_OVERLAP_SECONDS = 300
+
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'data'
+)
+DEFAULT_SYNC_STATE_PATH = os.path.join(DATA_DIR, 'sync_state.sqlite')
+
+# File JSON của phiên bản cũ, được import 1 lần nếu SQLite chưa có khóa tương ứng
+LEGACY_SYNC_STATE_PATH = os.path.join(DATA_DIR, 'sync_state.json')
+
+
+class SyncState:
+    """
+    Args:
+        key: Khóa của vector index (vd. 'pinecone:vn-law')
+        path: File SQLite (mặc định SYNC_STATE_PATH)
+    """
+
+    def __init__(self, key, path=None):
+        self.key = key
+        self.path = path or os.getenv('SYNC_STATE_PATH', DEFAULT_SYNC_STATE_PATH)
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS sync_meta ('
+            ' key TEXT PRIMARY KEY, watermark TEXT, run INTEGER NOT NULL DEFAULT 0)'
+        )
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS sync_chunks ('
+            ' key TEXT NOT NULL, article_id TEXT NOT NULL, mapcs TEXT NOT NULL, run INTEGER NOT NULL,'
+            ' PRIMARY KEY (key, article_id))'
+        )
+        self._db.commit()
+
+        row = self._db.execute('SELECT watermark, run FROM sync_meta WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self._import_legacy()
+            row = self._db.execute('SELECT watermark, run FROM sync_meta WHERE key = ?', (key,)).fetchone()
+
+        self.watermark = row[0] if row else None
+        # Lần chạy hiện tại: các article được chạm tới được đánh dấu run này
+        self.run = (row[1] if row else 0) + 1
+
+    def _import_legacy(self):
+        """Import mục của khóa này từ sync_state.json (phiên bản cũ) nếu có"""
+        if not os.path.exists(LEGACY_SYNC_STATE_PATH):
+            return
+        with open(LEGACY_SYNC_STATE_PATH, encoding='utf-8') as f:
+            entry = json.load(f).get(self.key)
+        if not entry:
+            return
+
+        self._db.executemany(
+            'INSERT OR REPLACE INTO sync_chunks (key, article_id, mapcs, run) VALUES (?, ?, ?, 0)',
+            ((self.key, article_id, json.dumps(mapcs)) for article_id, mapcs in entry.get('chunks', {}).items())
+        )
+        self._db.execute('INSERT INTO sync_meta (key, watermark, run) VALUES (?, ?, 0)',
+                         (self.key, entry.get('watermark')))
+        self._db.commit()
+
+    def article_chunks(self, article_id):
+        """mapc các chunk đã sync của 1 article"""
+        with self._lock:
+            row = self._db.execute('SELECT mapcs FROM sync_chunks WHERE key = ? AND article_id = ?',
+                                   (self.key, str(article_id))).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def set_article_chunks(self, article_id, mapcs):
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO sync_chunks (key, article_id, mapcs, run) VALUES (?, ?, ?, ?)',
+                (self.key, str(article_id), json.dumps(list(mapcs)), self.run)
+            )
+
+    def remove_article(self, article_id):
+        """Bỏ article khỏi state, trả về mapc các chunk cũ của nó"""
+        mapcs = self.article_chunks(article_id)
+        with self._lock:
+            self._db.execute('DELETE FROM sync_chunks WHERE key = ? AND article_id = ?',
+                             (self.key, str(article_id)))
+        return mapcs
+
+    def unseen_articles(self, article_ids=None):
+        """
+        Article ids có trong state nhưng không được chạm tới trong lần chạy này
+
+        article_ids=None: xét mọi article (full sync: đó là các article đã bị xóa khỏi
+        Supabase). Ngược lại chỉ xét các id cho trước.
+        """
+        with self._lock:
+            if article_ids is None:
+                rows = self._db.execute('SELECT article_id FROM sync_chunks WHERE key = ? AND run <> ?',
+                                        (self.key, self.run)).fetchall()
+                return [row[0] for row in rows]
+
+            unseen = []
+            for article_id in article_ids:
+                row = self._db.execute('SELECT run FROM sync_chunks WHERE key = ? AND article_id = ?',
+                                       (self.key, str(article_id))).fetchone()
+                if row is not None and row[0] != self.run:
+                    unseen.append(str(article_id))
+            return unseen
+
+    def advance(self, updated_at):
+        """Nâng watermark lên updated_at nếu lớn hơn"""
+        if updated_at and (self.watermark is None or parse_timestamp(updated_at) > parse_timestamp(self.watermark)):
+            self.watermark = updated_at
+
+    def since(self, overlap_seconds=None):
+        """
+        Mốc updated_at (so sánh >=) cho lần sync incremental tiếp theo
+
+        = watermark - overlap (SYNC_WATERMARK_OVERLAP_SECONDS, mặc định 300s),
+        None nếu chưa sync lần nào.
+        """
+        if self.watermark is None:
+            return None
+        if overlap_seconds is None:
+            overlap_seconds = float(os.getenv('SYNC_WATERMARK_OVERLAP_SECONDS', DEFAULT_WATERMARK_OVERLAP_SECONDS))
+        return (parse_timestamp(self.watermark) - timedelta(seconds=overlap_seconds)).isoformat()
+
+    def save(self):
+        """Ghi watermark + mọi thay đổi chunks trong 1 transaction"""
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO sync_meta (key, watermark, run) VALUES (?, ?, ?)',
+                (self.key, self.watermark, self.run)
+            )
+            self._db.commit()
+
+    def close(self):
+        """Đóng file (thay đổi chưa save() bị bỏ)"""
+        with self._lock:
+            self._db.rollback()
+            self._db.close()
+
+
+def parse_timestamp(value):
+    """Timestamp ISO của PostgREST ('2024-05-01T10:00:00.12345+00:00') -> datetime"""
+    value = value.replace('Z', '+00:00')
+    # fromisoformat (Python < 3.11) cần đúng 0, 3 hoặc 6 chữ số thập phân
+    main, dot, rest = value.partition('.')
+    if dot:
+        digits = len(rest) - len(rest.lstrip('0123456789'))
+        value = f"{main}.{rest[:digits][:6].ljust(6, '0')}{rest[digits:]}"
+    return datetime.fromisoformat(value)
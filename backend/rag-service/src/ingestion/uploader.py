@@ -0,0 +1,182 @@
+"""
+Uploader - Upsert vectors với giới hạn kích thước request, retry và dead-letter
+
+    - Chia batch theo cả số vectors lẫn số bytes payload (Pinecone giới hạn
+      ~2MB / request upsert; metadata chứa nội dung điều luật nên vài chục
+      vectors đã có thể vượt).
+    - Lỗi tạm thời (mạng, 429, 5xx) được retry với exponential backoff có
+      jitter; request quá lớn (413) hoặc dữ liệu lỗi (400) thì chia đôi
+      batch rồi gửi lại, để chỉ vectors lỗi bị loại.
+    - Batch vẫn lỗi sau khi retry hết được ghi vào file dead-letter (JSONL,
+      mỗi dòng 1 article) để chạy lại bằng --replay-dead-letter.
+
+Thread-safe: nhiều worker của pipeline dùng chung 1 Uploader.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+
+from models.vector_store import build_metadata
+
+DEFAULT_DEAD_LETTER_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'data', 'upsert_dead_letter.jsonl'
+)
+
+# Lỗi dữ liệu: retry không giúp gì
+PERMANENT_ERRORS = (ValueError, TypeError, KeyError)
+
+
+def error_status(error):
+    """HTTP status của lỗi (Pinecone / requests), None nếu không có"""
+    for attr in ('status', 'status_code'):
+        status = getattr(error, attr, None)
+        if isinstance(status, int):
+            return status
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def is_too_large(error):
+    return error_status(error) == 413 or 'too large' in str(error).lower()
+
+
+def is_bad_request(error):
+    """Lỗi do dữ liệu của 1 vài vectors (chia nhỏ batch để tách riêng chúng)"""
+    return error_status(error) in (400, 422) or isinstance(error, PERMANENT_ERRORS)
+
+
+def is_transient(error):
+    status = error_status(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return not isinstance(error, PERMANENT_ERRORS)
+
+
+def payload_bytes(article, dimension):
+    """Ước lượng số bytes của 1 vector trong request upsert (JSON)"""
+    metadata = json.dumps(build_metadata(article), ensure_ascii=False).encode('utf-8')
+    # ~20 ký tự / số float khi serialize JSON, cộng id và phần khung
+    return len(metadata) + dimension * 20 + len(str(article.get('mapc', ''))) + 64
+
+
+class Uploader:
+    """
+    Args:
+        vector_store: VectorStore (dùng upsert_embeddings)
+        max_batch_vectors: Số vectors tối đa mỗi request
+        max_batch_bytes: Số bytes payload tối đa mỗi request
+        max_retries: Số lần retry lỗi tạm thời cho mỗi request
+        backoff: Thời gian chờ cơ sở (giây), nhân đôi mỗi lần retry, có jitter
+        dead_letter_path: File JSONL ghi các articles upsert thất bại
+    """
+
+    def __init__(self, vector_store, max_batch_vectors=100, max_batch_bytes=2 * 1024 * 1024,
+                 max_retries=5, backoff=0.5, dead_letter_path=None):
+        self.vector_store = vector_store
+        self.max_batch_vectors = max_batch_vectors
+        self.max_batch_bytes = max_batch_bytes
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.dead_letter_path = dead_letter_path or os.getenv('UPSERT_DEAD_LETTER_PATH', DEFAULT_DEAD_LETTER_PATH)
+
+        self._lock = threading.Lock()
+        self.uploaded = 0
+        self.failed = 0
+        self.requests = 0
+        self.retries = 0
+        self.started = time.time()
+
+    def split(self, articles, embeddings):
+        """Chia (articles, embeddings) thành các request theo số vectors và bytes"""
+        dimension = len(embeddings[0]) if len(embeddings) else 0
+        start, size = 0, 0
+        for i, article in enumerate(articles):
+            item_bytes = payload_bytes(article, dimension)
+            if i > start and (i - start >= self.max_batch_vectors or size + item_bytes > self.max_batch_bytes):
+                yield articles[start:i], embeddings[start:i]
+                start, size = i, 0
+            size += item_bytes
+        if start < len(articles):
+            yield articles[start:], embeddings[start:]
+
+    def upload(self, articles, embeddings):
+        """
+        Upsert 1 batch (chia nhỏ nếu cần)
+
+        Returns:
+            {'uploaded': n, 'failed': m} (m articles đã ghi vào dead-letter)
+        """
+        result = {'uploaded': 0, 'failed': 0}
+        for part_articles, part_embeddings in self.split(articles, embeddings):
+            self._upload_part(part_articles, part_embeddings, result)
+        return result
+
+    def _upload_part(self, articles, embeddings, result):
+        attempt = 0
+        while True:
+            try:
+                with self._lock:
+                    self.requests += 1
+                count = self.vector_store.upsert_embeddings(articles, embeddings, batch_size=len(articles))
+                with self._lock:
+                    self.uploaded += count
+                result['uploaded'] += count
+                return
+            except Exception as e:
+                if (is_too_large(e) or is_bad_request(e)) and len(articles) > 1:
+                    # Ước lượng payload sai / có vector lỗi: chia đôi và gửi lại từng nửa
+                    middle = len(articles) // 2
+                    self._upload_part(articles[:middle], embeddings[:middle], result)
+                    self._upload_part(articles[middle:], embeddings[middle:], result)
+                    return
+
+                if not is_transient(e) or attempt >= self.max_retries:
+                    print(f"      ❌ Upsert failed ({len(articles)} vectors): {e}")
+                    self._dead_letter(articles, e)
+                    result['failed'] += len(articles)
+                    return
+
+                delay = self.backoff * (2 ** attempt)
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                print(f"      ⚠️  Upsert error ({e}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(random.uniform(delay / 2, delay))
+
+    def _dead_letter(self, articles, error):
+        directory = os.path.dirname(self.dead_letter_path)
+        with self._lock:
+            self.failed += len(articles)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                for article in articles:
+                    f.write(json.dumps({'article': article, 'error': str(error)}, ensure_ascii=False, default=str))
+                    f.write('\n')
+
+    def vectors_per_second(self):
+        elapsed = time.time() - self.started
+        return self.uploaded / elapsed if elapsed > 0 else 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'uploaded': self.uploaded,
+                'failed': self.failed,
+                'requests': self.requests,
+                'retries': self.retries,
+                'vectors_per_second': round(self.vectors_per_second(), 1),
+                'dead_letter_path': self.dead_letter_path if self.failed else None,
+            }
+
+
+def read_dead_letter(path):
+    """Articles trong file dead-letter (để upsert lại)"""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line)['article'] for line in f if line.strip()]
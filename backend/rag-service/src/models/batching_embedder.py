@@ -0,0 +1,144 @@
+"""
+Batching Embedder - Gộp các câu hỏi đồng thời thành 1 batch encode
+
+Khi nhiều request đến cùng lúc, mỗi request tự encode 1 câu hỏi nên model
+không tận dụng được batch trên CPU. BatchingEmbedder có 1 thread worker:
+gom các câu hỏi đến trong `max_wait_ms` (tối đa `max_batch_size` câu),
+encode 1 lần rồi trả kết quả về future của từng caller.
+
+Cùng interface với Embedder (encode, encode_one, model_name, dimension);
+encode(list) (ingestion) đi thẳng vào model, không qua hàng đợi.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from .embedder import get_embedder
+
+
+class BatchingEmbedder:
+    """
+    Args:
+        embedder: Embedder thật (mặc định models.embedder.get_embedder())
+        max_batch_size: Số câu tối đa mỗi lần encode
+        max_wait_ms: Thời gian tối đa chờ gom thêm câu sau câu đầu tiên
+    """
+
+    def __init__(self, embedder=None, max_batch_size=32, max_wait_ms=5):
+        self.embedder = embedder or get_embedder()
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.encoded = 0
+        self.histogram = {}         # batch size (làm tròn lên lũy thừa 2) -> số batch
+
+        self._worker = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+        self._worker.start()
+
+    @property
+    def model_name(self):
+        return self.embedder.model_name
+
+    @property
+    def dimension(self):
+        return self.embedder.dimension
+
+    @property
+    def max_seq_length(self):
+        return self.embedder.max_seq_length
+
+    def count_tokens(self, text):
+        return self.embedder.count_tokens(text)
+
+    def encode(self, texts, batch_size=32):
+        return self.embedder.encode(texts, batch_size=batch_size)
+
+    def encode_one(self, text, timeout=None):
+        """Encode 1 câu qua hàng đợi (chờ tới khi batch chứa câu này xong)"""
+        future = Future()
+        self._queue.put((text, future))
+        return future.result(timeout=timeout)
+
+    def _collect(self):
+        """Chờ câu đầu tiên, rồi gom thêm tới max_batch_size hoặc hết max_wait"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for text, _ in batch]
+
+            try:
+                vectors = self.embedder.encode(texts, batch_size=len(texts))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+            self._record(len(batch))
+
+    def _record(self, size):
+        bucket = 1
+        while bucket < size:
+            bucket *= 2
+        with self._stats_lock:
+            self.batches += 1
+            self.encoded += size
+            self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def stats(self):
+        """Thông tin batching cho /health"""
+        with self._stats_lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches': self.batches,
+                'encoded': self.encoded,
+                'avg_batch_size': round(self.encoded / self.batches, 2) if self.batches else 0.0,
+                'batch_size_histogram': {f'<={size}': count for size, count in sorted(self.histogram.items())},
+                'queued': self._queue.qsize(),
+            }
+
+
+_query_embedder = None
+_query_lock = threading.Lock()
+
+
+def get_query_embedder():
+    """
+    Embedder dùng cho câu hỏi trong RAG service
+
+    BatchingEmbedder quanh get_embedder() (EMBEDDING_BATCH_MAX_SIZE,
+    EMBEDDING_BATCH_MAX_WAIT_MS); EMBEDDING_BATCH_MAX_WAIT_MS=0 thì dùng
+    thẳng get_embedder().
+    """
+    global _query_embedder
+    if _query_embedder is None:
+        with _query_lock:
+            if _query_embedder is None:
+                max_wait_ms = float(os.getenv('EMBEDDING_BATCH_MAX_WAIT_MS', 5))
+                if max_wait_ms <= 0:
+                    _query_embedder = get_embedder()
+                else:
+                    _query_embedder = BatchingEmbedder(
+                        max_batch_size=int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', 32)),
+                        max_wait_ms=max_wait_ms
+                    )
+    return _query_embedder
@@ -0,0 +1,139 @@
+"""
+Embedder - Tạo embeddings cho câu hỏi và điều luật
+
+Bọc sentence-transformers, load model lazy (lần encode đầu tiên) và trả
+về vector float32 đã chuẩn hóa L2, nên cosine similarity = dot product.
+
+EMBEDDING_BACKEND=onnx dùng OnnxEmbedder (cùng model, int8, không cần torch).
+"""
+
+import copy
+import json
+import os
+import threading
+
+import numpy as np
+
+DEFAULT_EMBEDDING_MODEL = 'sentence-transformers/paraphrase-multilingual-mpnet-base-v2'
+
+
+class Embedder:
+    """
+    Embedding model dùng chung
+
+    Args:
+        model_name: Tên model sentence-transformers (mặc định lấy từ EMBEDDING_MODEL)
+    """
+
+    def __init__(self, model_name=None):
+        self.model_name = model_name or os.getenv('EMBEDDING_MODEL', DEFAULT_EMBEDDING_MODEL)
+        self._model = None
+        self._counter = None
+        self._max_seq_length = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    print(f"🧠 Loading embedding model: {self.model_name}")
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    @property
+    def dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    @property
+    def max_seq_length(self):
+        """Số token tối đa model đọc (phần dư bị cắt)"""
+        if self._model is not None:
+            return self._model.max_seq_length
+        self._load_counter()
+        return self._max_seq_length
+
+    def count_tokens(self, text):
+        """Số token của text (gồm token đặc biệt, không cắt) theo tokenizer của model"""
+        self._load_counter()
+        return len(self._counter(text, add_special_tokens=True, truncation=False, verbose=False)['input_ids'])
+
+    def _load_counter(self):
+        """Tokenizer để đếm token; chưa load model thì chỉ load tokenizer (không load weights)"""
+        if self._counter is not None:
+            return
+        with self._lock:
+            if self._counter is not None:
+                return
+            if self._model is not None:
+                # Bản sao riêng: không dùng chung tokenizer với encode đang chạy ở thread khác
+                self._max_seq_length = self._model.max_seq_length
+                self._counter = copy.deepcopy(self._model.tokenizer)
+                return
+
+            from transformers import AutoTokenizer
+
+            print(f"🔤 Loading tokenizer: {self.model_name}")
+            counter = AutoTokenizer.from_pretrained(model_path(self.model_name))
+            self._max_seq_length = read_max_seq_length(self.model_name) or counter.model_max_length
+            self._counter = counter
+
+    def encode(self, texts, batch_size=32):
+        """Encode list texts -> ma trận (n, dim) float32 đã chuẩn hóa"""
+        vectors = self.model.encode(
+            list(texts),
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def encode_one(self, text):
+        """Encode 1 text -> vector (dim,)"""
+        return self.encode([text])[0]
+
+
+def model_path(model_name):
+    """Thư mục local hoặc repo id trên Hugging Face Hub (tên ngắn -> sentence-transformers/...)"""
+    if os.path.isdir(model_name) or '/' in model_name:
+        return model_name
+    return f'sentence-transformers/{model_name}'
+
+
+def read_max_seq_length(model_name):
+    """max_seq_length trong sentence_bert_config.json của model, None nếu không đọc được"""
+    path = model_path(model_name)
+    try:
+        if os.path.isdir(path):
+            config_path = os.path.join(path, 'sentence_bert_config.json')
+        else:
+            from huggingface_hub import hf_hub_download
+            config_path = hf_hub_download(path, 'sentence_bert_config.json')
+        with open(config_path, encoding='utf-8') as f:
+            return json.load(f).get('max_seq_length')
+    except Exception:
+        return None
+
+
+_default_embedder = None
+_default_lock = threading.Lock()
+
+
+def get_embedder():
+    """Embedder dùng chung trong process (model chỉ load 1 lần), theo EMBEDDING_BACKEND"""
+    global _default_embedder
+    if _default_embedder is None:
+        with _default_lock:
+            if _default_embedder is None:
+                backend = os.getenv('EMBEDDING_BACKEND', 'torch').lower()
+                if backend == 'onnx':
+                    from .onnx_embedder import OnnxEmbedder
+                    _default_embedder = OnnxEmbedder()
+                elif backend == 'torch':
+                    _default_embedder = Embedder()
+                else:
+                    raise ValueError(f"Unsupported EMBEDDING_BACKEND: {backend}")
+    return _default_embedder
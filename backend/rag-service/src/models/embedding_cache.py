@@ -0,0 +1,264 @@
+"""
+Embedding Cache - Cache embeddings của câu hỏi
+
+Mỗi lần search phải encode câu hỏi bằng sentence-transformers (vài chục ms
+CPU). Câu hỏi lặp lại (câu test của các script, câu hỏi phổ biến) được lấy
+từ cache LRU trong RAM, và tùy chọn từ 1 file SQLite để giữ qua các lần
+khởi động lại.
+
+Khóa = tên model + câu hỏi đã chuẩn hóa (Unicode NFC, gộp khoảng trắng).
+Không đổi chữ hoa/thường vì model phân biệt hoa thường.
+
+ChunkEmbeddingCache dùng cho ingestion: khóa = SHA-256 của tên model +
+nội dung chunk, lưu trong SQLite, nên chạy lại vectorize / import / sync
+trên corpus không đổi không phải chạy lại model.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    return WHITESPACE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+class EmbeddingCache:
+    """
+    Cache LRU (RAM) + tùy chọn SQLite (đĩa), thread-safe
+
+    Args:
+        encode_fn: Hàm text -> vector float32
+        model_name: Tên model (1 phần của khóa, đổi model thì không dùng lại vector cũ)
+        max_entries: Số vectors tối đa trong RAM
+        disk_path: File SQLite (None = chỉ RAM)
+    """
+
+    def __init__(self, encode_fn, model_name, max_entries=1024, disk_path=None):
+        self.encode_fn = encode_fn
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if disk_path:
+            self._open_disk(disk_path)
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _open_disk(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings ('
+            ' model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL,'
+            ' PRIMARY KEY (model, text))'
+        )
+        self._db.commit()
+
+    def _remember(self, text, vector):
+        self._entries[text] = vector
+        self._entries.move_to_end(text)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, text):
+        row = self._db.execute(
+            'SELECT vector FROM embeddings WHERE model = ? AND text = ?',
+            (self.model_name, text)
+        ).fetchone()
+        return None if row is None else np.frombuffer(row[0], dtype=np.float32)
+
+    def _disk_set(self, text, vector):
+        self._db.execute(
+            'INSERT OR REPLACE INTO embeddings (model, text, vector) VALUES (?, ?, ?)',
+            (self.model_name, text, np.asarray(vector, dtype=np.float32).tobytes())
+        )
+        self._db.commit()
+
+    def encode_one(self, text):
+        """Embedding của 1 câu (từ cache nếu có)"""
+        key = normalize_text(text)
+
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+            if self._db is not None:
+                vector = self._disk_get(key)
+                if vector is not None:
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+
+            self.misses += 1
+
+        # Encode ngoài lock: các câu hỏi khác vẫn lấy được từ cache trong lúc chờ model
+        vector = np.array(self.encode_fn(key), dtype=np.float32)
+        vector.setflags(write=False)
+
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is not None:
+                self._disk_set(key, vector)
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM embeddings WHERE model = ?', (self.model_name,))
+                self._db.commit()
+
+    def stats(self):
+        """Thông tin cache cho /health"""
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'disk_path': self.disk_path,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.disk_hits) / total, 4) if total else 0.0,
+            }
+
+
+DEFAULT_CHUNK_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'data', 'chunk_embeddings.sqlite'
+)
+
+
+class ChunkEmbeddingCache:
+    """
+    Cache embeddings của chunks (SQLite, theo hash nội dung), thread-safe
+
+    Args:
+        embedder: Embedder thật (encode list texts, model_name)
+        path: File SQLite
+    """
+
+    # Số khóa mỗi câu SELECT ... IN (giới hạn biến của SQLite)
+    LOOKUP_BATCH = 500
+
+    def __init__(self, embedder, path):
+        self.embedder = embedder
+        self.model_name = getattr(embedder, 'model_name', type(embedder).__name__)
+        self.path = path
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS chunk_embeddings ('
+            ' key TEXT PRIMARY KEY, vector BLOB NOT NULL)'
+        )
+        self._db.commit()
+
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text):
+        return hashlib.sha256(f'{self.model_name}\0{text}'.encode('utf-8')).hexdigest()
+
+    def _lookup(self, keys):
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), self.LOOKUP_BATCH):
+                chunk = keys[start:start + self.LOOKUP_BATCH]
+                rows = self._db.execute(
+                    f'SELECT key, vector FROM chunk_embeddings WHERE key IN ({",".join("?" * len(chunk))})',
+                    chunk
+                ).fetchall()
+                found.update((key, np.frombuffer(blob, dtype=np.float32)) for key, blob in rows)
+        return found
+
+    def encode(self, texts):
+        """Embeddings (n, dim) float32: lấy từ cache, chỉ encode các text chưa có"""
+        texts = list(texts)
+        if not texts:
+            return self.embedder.encode(texts)
+
+        keys = [self.key(text) for text in texts]
+        found = self._lookup(list(set(keys)))
+
+        missing = list({key: text for key, text in zip(keys, texts) if key not in found}.items())
+        if missing:
+            vectors = np.asarray(self.embedder.encode([text for _, text in missing]), dtype=np.float32)
+            with self._lock:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO chunk_embeddings (key, vector) VALUES (?, ?)',
+                    [(key, vector.tobytes()) for (key, _), vector in zip(missing, vectors)]
+                )
+                self._db.commit()
+            found.update((key, vector) for (key, _), vector in zip(missing, vectors))
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        return np.stack([found[key] for key in keys])
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'path': self.path,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+def chunk_cache_from_env(embedder):
+    """
+    ChunkEmbeddingCache theo CHUNK_EMBEDDING_CACHE_PATH
+
+    Returns:
+        ChunkEmbeddingCache, hoặc None nếu CHUNK_EMBEDDING_CACHE_PATH=off
+    """
+    path = os.getenv('CHUNK_EMBEDDING_CACHE_PATH', DEFAULT_CHUNK_CACHE_PATH)
+    if not path or path.lower() == 'off':
+        return None
+    return ChunkEmbeddingCache(embedder, path)
+
+
+def embedding_cache_from_env(embedder):
+    """
+    EmbeddingCache cho embedder theo EMBEDDING_CACHE_SIZE / EMBEDDING_CACHE_PATH
+
+    Returns:
+        EmbeddingCache, hoặc None nếu EMBEDDING_CACHE_SIZE=0
+    """
+    max_entries = int(os.getenv('EMBEDDING_CACHE_SIZE', 1024))
+    if max_entries <= 0:
+        return None
+    return EmbeddingCache(
+        embedder.encode_one,
+        getattr(embedder, 'model_name', type(embedder).__name__),
+        max_entries=max_entries,
+        disk_path=os.getenv('EMBEDDING_CACHE_PATH') or None
+    )
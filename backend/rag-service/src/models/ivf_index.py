@@ -0,0 +1,336 @@
+"""
+IVF Vector Index - Approximate nearest-neighbour cho corpus lớn
+
+Brute-force phải chấm điểm toàn bộ ma trận cho mỗi câu hỏi; với hàng
+triệu chunk thì quá chậm. IVF (inverted file) chia vectors thành `nlist`
+cụm bằng spherical k-means; mỗi câu hỏi chỉ chấm điểm các vectors trong
+`nprobe` cụm có centroid gần nhất. nprobe lớn -> recall cao hơn, chậm hơn.
+
+- Insert tăng dần: vector mới được gán vào cụm gần nhất, không cần train lại
+- Delete bằng tombstone: dòng bị đánh dấu và bỏ qua khi search, được dọn
+  (compact) khi số tombstone vượt ngưỡng hoặc khi lưu ra đĩa
+- Chưa đủ `train_min` vectors thì search exact như LocalVectorIndex
+
+Lưu thêm centroids.npy (nlist, dim) và assignments.npy (cụm của từng dòng).
+"""
+
+import os
+from array import array
+
+import numpy as np
+
+from .local_index import LocalVectorIndex
+
+CENTROIDS_FILE = 'centroids.npy'
+ASSIGNMENTS_FILE = 'assignments.npy'
+
+# Số dòng mỗi lần nhân với ma trận centroids (giới hạn RAM khi gán cụm)
+ASSIGN_CHUNK = 16384
+
+
+def default_nlist(size):
+    """Số cụm mặc định ~ 4 * sqrt(n)"""
+    return max(1, min(size, int(4 * np.sqrt(size))))
+
+
+def spherical_kmeans(vectors, nlist, iterations=10, seed=0):
+    """
+    K-means trên vectors đã chuẩn hóa (khoảng cách = cosine)
+
+    Returns:
+        Ma trận centroids (nlist, dim) đã chuẩn hóa
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = assign_clusters(vectors, centroids)
+        counts = np.bincount(assignments, minlength=nlist)
+
+        # Tổng vectors theo cụm: sắp xếp theo cụm rồi cộng dồn từng đoạn
+        order = np.argsort(assignments, kind='stable')
+        non_empty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts[non_empty])[:-1]])
+        sums = np.zeros_like(centroids)
+        sums[non_empty] = np.add.reduceat(vectors[order], starts, axis=0)
+
+        # Cụm rỗng: lấy 1 vector ngẫu nhiên làm centroid mới
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.maximum(norms, 1e-12)
+
+    return np.ascontiguousarray(centroids, dtype=np.float32)
+
+
+def assign_clusters(vectors, centroids):
+    """Cụm gần nhất (cosine) của mỗi vector"""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_CHUNK):
+        block = vectors[start:start + ASSIGN_CHUNK]
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+class IVFVectorIndex(LocalVectorIndex):
+    """
+    Index IVF, cùng interface với LocalVectorIndex
+
+    Args:
+        path: Thư mục lưu index (None = chỉ trong RAM)
+        dimension: Số chiều vector
+        nlist: Số cụm (None = 4 * sqrt(n) lúc train)
+        nprobe: Số cụm được quét mỗi câu hỏi
+        train_min: Số vectors tối thiểu trước khi train (ít hơn thì search exact)
+        max_tombstone_ratio: Tỷ lệ tombstone tối đa trước khi compact
+    """
+
+    index_type = 'ivf'
+
+    def __init__(self, path=None, dimension=None, nlist=None, nprobe=8,
+                 train_min=10000, max_tombstone_ratio=0.2):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_min = train_min
+        self.max_tombstone_ratio = max_tombstone_ratio
+
+        self._centroids = None
+        self._lists = []                                # cụm -> array('I') số dòng
+        self._assign = np.zeros(0, dtype=np.int32)      # dòng -> cụm (-1 = chưa gán)
+        self._deleted = np.zeros(0, dtype=bool)         # dòng -> tombstone
+        self._tombstones = 0
+
+        super().__init__(path=path, dimension=dimension)
+
+    @property
+    def trained(self):
+        return self._centroids is not None
+
+    def _ensure_capacity(self, size):
+        super()._ensure_capacity(size)
+        self._grow_row_arrays(self._capacity())
+
+    def _capacity(self):
+        return 0 if self._matrix is None else self._matrix.shape[0]
+
+    def _grow_row_arrays(self, capacity):
+        if len(self._deleted) < capacity:
+            self._deleted = np.concatenate([self._deleted, np.zeros(capacity - len(self._deleted), dtype=bool)])
+            self._assign = np.concatenate([self._assign, np.full(capacity - len(self._assign), -1, dtype=np.int32)])
+
+    def upsert(self, ids, vectors, metadata):
+        """Thêm vectors; id đã tồn tại thì dòng cũ thành tombstone, vector mới được thêm vào cuối"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(ids):
+            raise ValueError("vectors must be a (len(ids), dim) matrix")
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} != index dimension {self.dimension}")
+
+            start = len(self._ids)
+            self._ensure_capacity(start + len(ids))
+            rows = np.arange(start, start + len(ids))
+            self._deleted[rows] = False
+
+            for vid, meta in zip(ids, metadata):
+                old_row = self._rows.get(vid)
+                if old_row is not None:
+                    self._tombstone(old_row)
+                self._rows[vid] = len(self._ids)
+                self._ids.append(vid)
+                self._metadata.append(meta)
+
+            self._store_vectors(rows, vectors)
+
+            if self.trained:
+                self._add_to_lists(rows, assign_clusters(vectors, self._centroids))
+            elif len(self._rows) >= self.train_min:
+                self.train()
+
+            self._maybe_compact()
+            self.dirty = True
+        return len(ids)
+
+    def delete(self, ids):
+        """Đánh dấu tombstone theo id. Trả về số id đã xóa"""
+        deleted = 0
+        with self._lock:
+            for vid in ids:
+                row = self._rows.pop(vid, None)
+                if row is None:
+                    continue
+                self._tombstone(row)
+                deleted += 1
+
+            if deleted:
+                self._maybe_compact()
+                self.dirty = True
+        return deleted
+
+    def _tombstone(self, row):
+        self._deleted[row] = True
+        self._metadata[row] = None
+        self._tombstones += 1
+
+    def _add_to_lists(self, rows, clusters):
+        self._assign[rows] = clusters
+        for row, cluster in zip(rows.tolist(), clusters.tolist()):
+            self._lists[cluster].append(row)
+
+    def _rebuild_lists(self):
+        self._lists = [array('I') for _ in range(len(self._centroids))]
+        size = len(self._ids)
+        live = np.flatnonzero(~self._deleted[:size])
+        for row, cluster in zip(live.tolist(), self._assign[live].tolist()):
+            self._lists[cluster].append(row)
+
+    def train(self, nlist=None, iterations=10, sample_size=100000):
+        """
+        Học centroids bằng k-means trên (mẫu) các vectors hiện có rồi gán lại toàn bộ
+
+        Gọi lại khi phân phối dữ liệu thay đổi nhiều (VD sau khi import lại corpus).
+        """
+        with self._lock:
+            size = len(self._ids)
+            live = np.flatnonzero(~self._deleted[:size])
+            if len(live) == 0:
+                return
+
+            nlist = min(nlist or self.nlist or default_nlist(len(live)), len(live))
+            sample = live
+            if len(sample) > sample_size:
+                sample = np.random.default_rng(0).choice(live, sample_size, replace=False)
+
+            print(f"🧭 Training IVF index: {len(live)} vectors, nlist={nlist}")
+            self._centroids = spherical_kmeans(self._vectors(np.sort(sample)), nlist, iterations=iterations)
+            self.nlist = nlist
+            self._assign[:size] = -1
+            for start in range(0, len(live), ASSIGN_CHUNK):
+                chunk = live[start:start + ASSIGN_CHUNK]
+                self._assign[chunk] = assign_clusters(self._vectors(chunk), self._centroids)
+            self._rebuild_lists()
+            self.dirty = True
+
+    def _maybe_compact(self):
+        if self._tombstones and self._tombstones > self.max_tombstone_ratio * len(self._ids):
+            self.compact()
+
+    def compact(self):
+        """Dọn tombstone: dồn các dòng còn sống lên đầu ma trận"""
+        with self._lock:
+            if not self._tombstones:
+                return
+
+            size = len(self._ids)
+            live = np.flatnonzero(~self._deleted[:size])
+            count = len(live)
+
+            self._compact_vectors(live)
+            self._assign[:count] = self._assign[live]
+            self._assign[count:] = -1
+            self._deleted[:] = False
+            self._ids = [self._ids[row] for row in live.tolist()]
+            self._metadata = [self._metadata[row] for row in live.tolist()]
+            self._rows = {vid: row for row, vid in enumerate(self._ids)}
+            self._tombstones = 0
+
+            if self.trained:
+                self._rebuild_lists()
+
+    def search(self, vector, top_k=3):
+        """
+        Top-k gần đúng: chỉ chấm điểm vectors trong `nprobe` cụm gần nhất
+
+        Returns:
+            List (id, score, metadata), score giảm dần
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            if not self._rows or top_k <= 0:
+                return []
+
+            size = len(self._ids)
+            if self.trained:
+                centroid_scores = self._centroids @ vector
+                nprobe = min(self.nprobe, len(self._centroids))
+                probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+                lists = [np.frombuffer(self._lists[c], dtype=np.uint32) for c in probe if len(self._lists[c])]
+                if not lists:
+                    return []
+                rows = np.concatenate(lists).astype(np.int64)
+            else:
+                rows = np.arange(size)
+
+            if self._tombstones:
+                rows = rows[~self._deleted[rows]]
+            rows, scores = self._score_candidates(rows, vector, top_k)
+            return self._top_k(rows, scores, top_k)
+
+    # Lưu trữ vectors float32 theo dòng; QuantizedVectorIndex override để giữ
+    # mã nén trong RAM và vectors float trên đĩa
+
+    def _store_vectors(self, rows, vectors):
+        self._matrix[rows] = vectors
+
+    def _vectors(self, rows):
+        return self._matrix[rows]
+
+    def _compact_vectors(self, live):
+        self._matrix[:len(live)] = self._matrix[live]
+
+    def _score_candidates(self, rows, vector, top_k):
+        """Điểm của các dòng ứng viên, trả về (rows, scores)"""
+        return rows, self._matrix[rows] @ vector
+
+    def save(self, path=None):
+        self.compact()
+        super().save(path)
+
+    def _meta(self):
+        return dict(super()._meta(), nlist=self.nlist, nprobe=self.nprobe)
+
+    def _save_arrays(self, path):
+        if not self.trained:
+            for name in (CENTROIDS_FILE, ASSIGNMENTS_FILE):
+                if os.path.exists(os.path.join(path, name)):
+                    os.remove(os.path.join(path, name))
+            return []
+
+        with open(os.path.join(path, CENTROIDS_FILE + '.tmp'), 'wb') as f:
+            np.save(f, self._centroids)
+        with open(os.path.join(path, ASSIGNMENTS_FILE + '.tmp'), 'wb') as f:
+            np.save(f, self._assign[:len(self._ids)])
+        return [CENTROIDS_FILE, ASSIGNMENTS_FILE]
+
+    def _load_arrays(self, path, meta):
+        size = len(self._ids)
+        self._deleted = np.zeros(0, dtype=bool)
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._grow_row_arrays(max(size, self._capacity()))
+        self._tombstones = 0
+        self.nlist = self.nlist or meta.get('nlist')
+
+        centroids_path = os.path.join(path, CENTROIDS_FILE)
+        assignments_path = os.path.join(path, ASSIGNMENTS_FILE)
+        if meta.get('index_type', '').startswith('ivf') and os.path.exists(centroids_path):
+            self._centroids = np.load(centroids_path)
+            self._assign[:size] = np.load(assignments_path)
+            self._rebuild_lists()
+        elif size >= self.train_min:
+            # Index flat đã lưu trước đó: train lần đầu
+            self.train()
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                super().stats(),
+                trained=self.trained,
+                nlist=len(self._centroids) if self.trained else self.nlist,
+                nprobe=self.nprobe,
+                tombstones=self._tombstones,
+            )
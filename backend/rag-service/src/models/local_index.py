@@ -0,0 +1,234 @@
+"""
+Local Vector Index - Vector index trong RAM bằng NumPy
+
+Embeddings (float32 đã chuẩn hóa L2) nằm trong 1 ma trận liền khối,
+id và metadata nằm trong 2 list song song theo số dòng. Top-k = 1 phép
+nhân ma trận-vector + argpartition, không cần gọi mạng.
+
+Lưu ra thư mục:
+    vectors.npy  - ma trận (n, dim) float32
+    meta.json    - {"index_type", "dimension", "ids", "metadata"}
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+
+VECTORS_FILE = 'vectors.npy'
+META_FILE = 'meta.json'
+
+
+class LocalVectorIndex:
+    """
+    Index exact (brute-force) cosine similarity, thread-safe
+
+    Args:
+        path: Thư mục lưu index (None = chỉ trong RAM)
+        dimension: Số chiều vector (None = lấy theo vector đầu tiên / file đã lưu)
+    """
+
+    index_type = 'flat'
+
+    def __init__(self, path=None, dimension=None):
+        self.path = path
+        self.dimension = dimension
+
+        self._matrix = None         # (capacity, dim), chỉ [:len(ids)] là dữ liệu
+        self._ids = []
+        self._metadata = []
+        self._rows = {}             # id -> số dòng
+        self._lock = threading.RLock()
+        self.dirty = False
+
+        if path and os.path.exists(os.path.join(path, META_FILE)):
+            self.load()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _ensure_capacity(self, size):
+        """Cấp phát thêm dòng (gấp đôi) để upsert không copy lại cả ma trận mỗi lần"""
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if size <= capacity:
+            return
+
+        new_capacity = max(size, capacity * 2, 1024)
+        matrix = np.zeros((new_capacity, self.dimension), dtype=np.float32)
+        if self._matrix is not None:
+            matrix[:len(self._ids)] = self._matrix[:len(self._ids)]
+        self._matrix = matrix
+
+    def upsert(self, ids, vectors, metadata):
+        """
+        Thêm mới hoặc ghi đè vectors theo id
+
+        Args:
+            ids: List id
+            vectors: Ma trận (n, dim) float32 đã chuẩn hóa
+            metadata: List dict, song song với ids
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(ids):
+            raise ValueError("vectors must be a (len(ids), dim) matrix")
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} != index dimension {self.dimension}")
+
+            self._ensure_capacity(len(self._ids) + len(ids))
+
+            for vid, vector, meta in zip(ids, vectors, metadata):
+                row = self._rows.get(vid)
+                if row is None:
+                    row = len(self._ids)
+                    self._rows[vid] = row
+                    self._ids.append(vid)
+                    self._metadata.append(meta)
+                else:
+                    self._metadata[row] = meta
+                self._matrix[row] = vector
+
+            self.dirty = True
+        return len(ids)
+
+    def delete(self, ids):
+        """Xóa theo id (dòng cuối được chuyển vào chỗ trống). Trả về số id đã xóa"""
+        deleted = 0
+        with self._lock:
+            for vid in ids:
+                row = self._rows.pop(vid, None)
+                if row is None:
+                    continue
+
+                last = len(self._ids) - 1
+                if row != last:
+                    self._matrix[row] = self._matrix[last]
+                    self._ids[row] = self._ids[last]
+                    self._metadata[row] = self._metadata[last]
+                    self._rows[self._ids[row]] = row
+                self._ids.pop()
+                self._metadata.pop()
+                deleted += 1
+
+            if deleted:
+                self.dirty = True
+        return deleted
+
+    def search(self, vector, top_k=3):
+        """
+        Top-k theo cosine similarity
+
+        Returns:
+            List (id, score, metadata), score giảm dần
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            size = len(self._ids)
+            if size == 0 or top_k <= 0:
+                return []
+
+            return self._top_k(np.arange(size), self._matrix[:size] @ vector, top_k)
+
+    def _top_k(self, rows, scores, top_k):
+        """Chọn top_k trong các dòng ứng viên `rows` (scores song song với rows)"""
+        if top_k < len(rows):
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-scores[top], kind='stable')]
+
+        return [(self._ids[rows[i]], float(scores[i]), self._metadata[rows[i]]) for i in top]
+
+    def get(self, vid):
+        """Metadata của 1 id (None nếu không có)"""
+        with self._lock:
+            row = self._rows.get(vid)
+            return None if row is None else self._metadata[row]
+
+    def ids(self):
+        with self._lock:
+            return list(self._rows)
+
+    def save(self, path=None):
+        """Ghi index ra thư mục (ghi file tạm rồi rename để không hỏng file khi bị ngắt giữa chừng)"""
+        path = path or self.path
+        if not path:
+            raise ValueError("No path to save local vector index")
+        os.makedirs(path, exist_ok=True)
+
+        with self._lock:
+            vectors_tmp = os.path.join(path, VECTORS_FILE + '.tmp')
+            self._write_vectors(vectors_tmp, len(self._ids))
+
+            meta_tmp = os.path.join(path, META_FILE + '.tmp')
+            with open(meta_tmp, 'w', encoding='utf-8') as f:
+                json.dump(dict(self._meta(), ids=self._ids, metadata=self._metadata), f, ensure_ascii=False)
+
+            extra_files = self._save_arrays(path)
+
+            os.replace(vectors_tmp, os.path.join(path, VECTORS_FILE))
+            for name in extra_files:
+                os.replace(os.path.join(path, name + '.tmp'), os.path.join(path, name))
+            os.replace(meta_tmp, os.path.join(path, META_FILE))
+            self.dirty = False
+
+    def _write_vectors(self, filename, size):
+        """Ghi ma trận float32 (size dòng đầu) ra file .npy"""
+        if self._matrix is None:
+            matrix = np.zeros((0, self.dimension or 0), dtype=np.float32)
+        else:
+            matrix = self._matrix[:size]
+        with open(filename, 'wb') as f:
+            np.save(f, matrix)
+
+    def _load_vectors(self, path):
+        """Đọc ma trận float32 vào RAM, trả về số dòng"""
+        self._matrix = np.ascontiguousarray(np.load(os.path.join(path, VECTORS_FILE)), dtype=np.float32)
+        return self._matrix.shape[0]
+
+    def _meta(self):
+        return {'index_type': self.index_type, 'dimension': self.dimension}
+
+    def _save_arrays(self, path):
+        """Ghi thêm các mảng phụ (file .tmp), trả về list tên file. Lớp con override"""
+        return []
+
+    def _load_arrays(self, path, meta):
+        """Đọc các mảng phụ sau khi đã load ma trận + ids. Lớp con override"""
+
+    def load(self, path=None):
+        """Đọc index đã lưu bằng save()"""
+        path = path or self.path
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+
+        with self._lock:
+            self.dimension = meta['dimension']
+            count = self._load_vectors(path)
+            if count != len(meta['ids']):
+                raise ValueError(f"Corrupted local vector index at {path}: "
+                                 f"{count} vectors for {len(meta['ids'])} ids")
+
+            self._ids = meta['ids']
+            self._metadata = meta['metadata']
+            self._rows = {vid: row for row, vid in enumerate(self._ids)}
+            self._load_arrays(path, meta)
+            self.dirty = False
+
+    def memory_bytes(self):
+        """Số bytes RAM của phần vectors (không tính metadata)"""
+        return 0 if self._matrix is None else self._matrix.nbytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                'index_type': self.index_type,
+                'vectors': len(self._rows),
+                'dimension': self.dimension,
+                'memory_bytes': self.memory_bytes(),
+                'path': self.path,
+            }
@@ -0,0 +1,135 @@
+"""
+ONNX Embedder - Chạy embedding model bằng ONNX Runtime (int8, CPU)
+
+Thay cho sentence-transformers/torch trên máy không có GPU: import nhẹ hơn
+nhiều và encode nhanh hơn nhờ weights int8. Model được export bằng
+export_onnx_embedder.py (cùng model, mean pooling + chuẩn hóa L2 làm bằng
+NumPy), thư mục model gồm:
+
+    model.onnx          - transformer đã quantize int8
+    tokenizer.json      - tokenizer (thư viện `tokenizers`)
+    embedder.json       - model_name, max_seq_length, dimension, pad token
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+
+MODEL_FILE = 'model.onnx'
+TOKENIZER_FILE = 'tokenizer.json'
+CONFIG_FILE = 'embedder.json'
+
+DEFAULT_ONNX_MODEL_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'data', 'onnx-embedder'
+)
+
+
+class OnnxEmbedder:
+    """
+    Cùng interface với Embedder (encode, encode_one, model_name, dimension)
+
+    Args:
+        model_dir: Thư mục model đã export (mặc định ONNX_MODEL_DIR)
+        threads: Số thread ONNX Runtime cho 1 lần encode (mặc định ONNX_THREADS, 0 = tự chọn)
+    """
+
+    def __init__(self, model_dir=None, threads=None):
+        self.model_dir = model_dir or os.getenv('ONNX_MODEL_DIR', DEFAULT_ONNX_MODEL_DIR)
+        self.threads = int(os.getenv('ONNX_THREADS', 0)) if threads is None else threads
+
+        config_path = os.path.join(self.model_dir, CONFIG_FILE)
+        if not os.path.exists(config_path):
+            raise ValueError(f"ONNX embedder not found in {self.model_dir} "
+                             f"(run export_onnx_embedder.py first)")
+        with open(config_path, encoding='utf-8') as f:
+            self.config = json.load(f)
+
+        # Khóa cache embeddings khác với bản torch (kết quả lệch nhẹ do int8)
+        self.model_name = f"{self.config['model_name']}:onnx-int8"
+        self.dimension = self.config['dimension']
+
+        self._session = None
+        self._tokenizer = None
+        self._counter = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._session is not None:
+            return
+        with self._lock:
+            if self._session is not None:
+                return
+
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+
+            print(f"🧠 Loading ONNX embedding model: {self.model_dir}")
+            tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, TOKENIZER_FILE))
+            tokenizer.enable_truncation(max_length=self.config['max_seq_length'])
+            tokenizer.enable_padding(pad_id=self.config['pad_token_id'], pad_token=self.config['pad_token'])
+
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if self.threads > 0:
+                options.intra_op_num_threads = self.threads
+                options.inter_op_num_threads = 1
+
+            self._tokenizer = tokenizer
+            self._session = ort.InferenceSession(
+                os.path.join(self.model_dir, MODEL_FILE),
+                sess_options=options,
+                providers=['CPUExecutionProvider']
+            )
+
+    def _encode_batch(self, texts):
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+
+        hidden = self._session.run(None, {'input_ids': input_ids, 'attention_mask': attention_mask})[0]
+
+        # Mean pooling theo attention mask (giống sentence-transformers), rồi chuẩn hóa L2
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    @property
+    def max_seq_length(self):
+        """Số token tối đa model đọc (phần dư bị cắt)"""
+        return self.config['max_seq_length']
+
+    def count_tokens(self, text):
+        """Số token của text (gồm token đặc biệt, không cắt)"""
+        if self._counter is None:
+            with self._lock:
+                if self._counter is None:
+                    from tokenizers import Tokenizer
+
+                    # Chỉ load tokenizer (không cần session), không cắt / không padding
+                    counter = Tokenizer.from_file(os.path.join(self.model_dir, TOKENIZER_FILE))
+                    counter.no_truncation()
+                    counter.no_padding()
+                    self._counter = counter
+        return len(self._counter.encode(text).ids)
+
+    def encode(self, texts, batch_size=32):
+        """Encode list texts -> ma trận (n, dim) float32 đã chuẩn hóa"""
+        self._load()
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        # Sắp theo độ dài để mỗi batch padding ít nhất, rồi trả lại đúng thứ tự
+        order = np.argsort([len(text) for text in texts], kind='stable')
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            vectors[rows] = self._encode_batch([texts[row] for row in rows])
+        return vectors
+
+    def encode_one(self, text):
+        """Encode 1 text -> vector (dim,)"""
+        return self.encode([text])[0]
@@ -0,0 +1,185 @@
+"""
+Process Pool Embedder - Encode song song trên nhiều process (ingestion)
+
+1 process Python chỉ dùng được vài core cho 1 lần forward (torch/ONNX chia
+thread trong từng phép nhân ma trận, hiệu quả giảm nhanh khi tăng thread).
+ProcessPoolEmbedder chạy N process, mỗi process 1 bản model với số thread
+cố định (OMP/MKL, torch.set_num_threads, ONNX_THREADS), và chia texts thành
+các shard đã sắp theo độ dài (ít padding) để các process encode cùng lúc.
+
+Biến OMP/MKL/OPENBLAS_NUM_THREADS chỉ có tác dụng trước khi numpy / torch được
+import (thread pool BLAS tạo lúc import), mà process spawn import lại module
+chính trước khi chạy initializer. Vì vậy các biến được đặt trong process cha
+lúc tạo các worker (worker kế thừa environment), không phải trong initializer.
+
+Cùng interface với Embedder (encode, encode_one, model_name, dimension);
+chỉ dùng cho các script ingestion (EMBEDDING_PROCESSES / --embed-processes).
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+from .embedder import get_embedder
+
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'ONNX_THREADS')
+
+# Embedder của process worker (tạo trong _init_worker)
+_worker_embedder = None
+
+
+@contextmanager
+def _thread_env(threads):
+    """Đặt tạm các biến giới hạn thread (process con spawn trong khối này kế thừa)"""
+    previous = {var: os.environ.get(var) for var in THREAD_ENV_VARS}
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    try:
+        yield
+    finally:
+        for var, value in previous.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def _init_worker(threads):
+    """Chạy 1 lần trong mỗi process worker: ghim số thread của torch rồi load model"""
+    global _worker_embedder
+    if os.getenv('EMBEDDING_BACKEND', 'torch').lower() == 'torch':
+        import torch
+        torch.set_num_threads(threads)
+
+    _worker_embedder = get_embedder()
+    # Load model ngay để lần encode đầu không bị tính cả thời gian load
+    _worker_embedder.encode(['khởi động'])
+
+
+def _encode_shard(texts, batch_size):
+    return _worker_embedder.encode(texts, batch_size=batch_size)
+
+
+def _worker_dimension():
+    return _worker_embedder.dimension
+
+
+class ProcessPoolEmbedder:
+    """
+    Args:
+        processes: Số process worker (mặc định số core / threads_per_process)
+        threads_per_process: Số thread mỗi process dùng cho 1 lần forward
+        shard_size: Số texts mỗi shard gửi cho 1 process
+    """
+
+    def __init__(self, processes=None, threads_per_process=1, shard_size=64):
+        self.threads_per_process = max(1, threads_per_process)
+        self.processes = processes or max(1, (os.cpu_count() or 1) // self.threads_per_process)
+        self.shard_size = shard_size
+
+        # Embedder trong process chính chỉ dùng model_name và tokenizer (đếm token khi chia chunk),
+        # không encode nên không load weights
+        self._local = get_embedder()
+        self.model_name = self._local.model_name
+
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.threads_per_process,)
+        )
+        atexit.register(self.close)
+
+        # Mỗi submit spawn thêm 1 worker (tới max_workers) khi chưa có worker rảnh: tạo đủ
+        # N worker ngay trong _thread_env để chúng kế thừa giới hạn thread
+        with _thread_env(self.threads_per_process):
+            self._warmup = [self._pool.submit(_worker_dimension) for _ in range(self.processes)]
+
+        self._stats_lock = threading.Lock()
+        self.encoded = 0
+        # Tổng thời gian các lần encode (submit -> shard cuối xong), không tính lúc rảnh
+        self.busy = 0.0
+
+    @property
+    def dimension(self):
+        return self._warmup[0].result()
+
+    @property
+    def max_seq_length(self):
+        return self._local.max_seq_length
+
+    def count_tokens(self, text):
+        return self._local.count_tokens(text)
+
+    def encode(self, texts, batch_size=32):
+        """Encode list texts -> ma trận (n, dim) float32 đã chuẩn hóa"""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        # Chờ các worker load xong model: thông lượng không gồm thời gian load model
+        for warmup in self._warmup:
+            warmup.result()
+        started = time.time()
+
+        # Sắp theo độ dài để mỗi shard có độ dài gần nhau (ít padding), rồi trả lại đúng thứ tự
+        order = np.argsort([len(text) for text in texts], kind='stable')
+        shards = [order[start:start + self.shard_size] for start in range(0, len(texts), self.shard_size)]
+        futures = [
+            self._pool.submit(_encode_shard, [texts[row] for row in rows], batch_size)
+            for rows in shards
+        ]
+
+        vectors = None
+        for rows, future in zip(shards, futures):
+            shard_vectors = future.result()
+            if vectors is None:
+                vectors = np.empty((len(texts), shard_vectors.shape[1]), dtype=np.float32)
+            vectors[rows] = shard_vectors
+
+        with self._stats_lock:
+            self.encoded += len(texts)
+            self.busy += time.time() - started
+        return vectors
+
+    def encode_one(self, text):
+        """Encode 1 text -> vector (dim,)"""
+        return self.encode([text])[0]
+
+    def texts_per_second(self):
+        with self._stats_lock:
+            return self.encoded / self.busy if self.busy > 0 else 0.0
+
+    def stats(self):
+        return {
+            'processes': self.processes,
+            'threads_per_process': self.threads_per_process,
+            'encoded': self.encoded,
+            'busy_seconds': round(self.busy, 1),
+            'texts_per_second': round(self.texts_per_second(), 1),
+        }
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def ingest_embedder_from_env():
+    """
+    Embedder cho các script ingestion
+
+    ProcessPoolEmbedder nếu EMBEDDING_PROCESSES > 1 (EMBEDDING_THREADS_PER_PROCESS,
+    mặc định 1), ngược lại None (VectorStore dùng get_embedder()).
+    """
+    processes = int(os.getenv('EMBEDDING_PROCESSES', 0))
+    if processes <= 1:
+        return None
+    return ProcessPoolEmbedder(
+        processes=processes,
+        threads_per_process=int(os.getenv('EMBEDDING_THREADS_PER_PROCESS', 1))
+    )
@@ -0,0 +1,164 @@
+"""
+Quantization - Nén embeddings cho vector index
+
+- ScalarQuantizer (int8): mỗi chiều 1 byte, min/max học theo từng chiều (4x)
+- ProductQuantizer (PQ): chia vector thành m đoạn con, mỗi đoạn lưu mã
+  (1 byte) của centroid gần nhất trong 256 centroids (dim*4/m lần)
+
+Cả hai chấm điểm kiểu asymmetric: câu hỏi giữ nguyên float32, chỉ
+vectors trong index bị nén, nên không mất thêm độ chính xác phía câu hỏi.
+"""
+
+import numpy as np
+
+# Số dòng mỗi lần giải nén / tra bảng khi chấm điểm (giới hạn RAM tạm)
+SCORE_CHUNK = 16384
+
+
+def kmeans(vectors, k, iterations=10, seed=0):
+    """K-means khoảng cách Euclid, trả về centroids (k, dim)"""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        # argmin ||x - c||^2 = argmax (x.c - ||c||^2 / 2)
+        assignments = np.argmax(vectors @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1), axis=1)
+        counts = np.bincount(assignments, minlength=k)
+        sums = np.zeros_like(centroids)
+        for dim in range(vectors.shape[1]):
+            sums[:, dim] = np.bincount(assignments, weights=vectors[:, dim], minlength=k)
+
+        non_empty = counts > 0
+        centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+        empty = np.flatnonzero(~non_empty)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+
+    return centroids.astype(np.float32)
+
+
+class ScalarQuantizer:
+    """Lượng tử hóa 8-bit từng chiều: code = round((x - min) / scale)"""
+
+    kind = 'int8'
+
+    def __init__(self):
+        self.offset = None
+        self.scale = None
+
+    @property
+    def trained(self):
+        return self.scale is not None
+
+    def code_size(self, dimension):
+        return dimension
+
+    def train(self, vectors):
+        low = vectors.min(axis=0)
+        high = vectors.max(axis=0)
+        self.offset = low.astype(np.float32)
+        self.scale = np.maximum((high - low) / 255.0, 1e-12).astype(np.float32)
+
+    def encode(self, vectors):
+        codes = np.rint((vectors - self.offset) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def decode(self, codes):
+        return codes.astype(np.float32) * self.scale + self.offset
+
+    def scores(self, codes, query):
+        """Dot product xấp xỉ giữa câu hỏi (float) và các vectors đã nén"""
+        scaled_query = query * self.scale
+        bias = float(self.offset @ query)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_CHUNK):
+            block = codes[start:start + SCORE_CHUNK]
+            out[start:start + len(block)] = block.astype(np.float32) @ scaled_query + bias
+        return out
+
+    def state(self):
+        return {'offset': self.offset, 'scale': self.scale}
+
+    def load_state(self, state):
+        self.offset = state['offset']
+        self.scale = state['scale']
+
+
+class ProductQuantizer:
+    """
+    Product quantization với 256 centroids / đoạn con
+
+    Args:
+        m: Số đoạn con (None = dim / 4, tức 16x nhỏ hơn float32)
+    """
+
+    kind = 'pq'
+    ksub = 256
+
+    def __init__(self, m=None):
+        self.m = m
+        self.codebooks = None       # (m, ksub, dsub)
+
+    @property
+    def trained(self):
+        return self.codebooks is not None
+
+    def code_size(self, dimension):
+        return self.m or max(1, dimension // 4)
+
+    def _split(self, vectors):
+        """(n, dim) -> (n, m, dsub)"""
+        return vectors.reshape(len(vectors), self.m, -1)
+
+    def train(self, vectors, iterations=10):
+        dimension = vectors.shape[1]
+        self.m = self.code_size(dimension)
+        if dimension % self.m:
+            raise ValueError(f"PQ: dimension {dimension} is not divisible by m={self.m}")
+
+        subvectors = self._split(vectors)
+        codebooks = np.zeros((self.m, self.ksub, dimension // self.m), dtype=np.float32)
+        for sub in range(self.m):
+            centroids = kmeans(np.ascontiguousarray(subvectors[:, sub]), self.ksub, iterations=iterations, seed=sub)
+            codebooks[sub, :len(centroids)] = centroids
+        self.codebooks = codebooks
+
+    def encode(self, vectors):
+        subvectors = self._split(np.asarray(vectors, dtype=np.float32))
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        norms = 0.5 * (self.codebooks ** 2).sum(axis=2)    # (m, ksub)
+        for sub in range(self.m):
+            codes[:, sub] = np.argmax(subvectors[:, sub] @ self.codebooks[sub].T - norms[sub], axis=1)
+        return codes
+
+    def decode(self, codes):
+        return self.codebooks[np.arange(self.m), codes].reshape(len(codes), -1)
+
+    def scores(self, codes, query):
+        """Asymmetric distance: bảng tra (m, 256) từ câu hỏi, điểm = tổng m giá trị tra được"""
+        table = np.einsum('skd,sd->sk', self.codebooks, query.reshape(self.m, -1))
+        flat_table = table.ravel()
+        offsets = (np.arange(self.m) * self.ksub).astype(np.int64)
+
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_CHUNK):
+            block = codes[start:start + SCORE_CHUNK]
+            out[start:start + len(block)] = flat_table[block + offsets].sum(axis=1)
+        return out
+
+    def state(self):
+        return {'m': np.array(self.m), 'codebooks': self.codebooks}
+
+    def load_state(self, state):
+        self.m = int(state['m'])
+        self.codebooks = state['codebooks']
+
+
+def make_quantizer(kind, pq_m=None):
+    """Tạo quantizer theo tên ('int8' / 'pq')"""
+    if kind == ProductQuantizer.kind:
+        return ProductQuantizer(m=pq_m)
+    if kind == ScalarQuantizer.kind:
+        return ScalarQuantizer()
+    raise ValueError(f"Unsupported quantization: {kind}")
@@ -0,0 +1,227 @@
+"""
+Quantized Vector Index - Index IVF lưu mã nén trong RAM, vectors float trên đĩa
+
+768 chiều float32 = 3KB / chunk; với cả corpus thì phần vectors chiếm gần
+hết RAM. Index này chỉ giữ mã nén (int8: 768B, PQ: dim/4 = 192B) trong RAM
+để chấm điểm; vectors float32 nằm trong vectors.npy (memory-map), chỉ được
+đọc để re-rank exact `rerank` ứng viên tốt nhất.
+
+Vectors thêm mới sau lần lưu cuối nằm tạm trong RAM cho tới khi save().
+Với nlist=1 index quét toàn bộ mã nén (tương đương flat).
+
+Lưu thêm codes.npy (n, code_size) uint8 và quantizer.npz.
+"""
+
+import os
+
+import numpy as np
+
+from .ivf_index import ASSIGN_CHUNK, IVFVectorIndex
+from .local_index import VECTORS_FILE
+from .quantization import make_quantizer
+
+CODES_FILE = 'codes.npy'
+QUANTIZER_FILE = 'quantizer.npz'
+
+# Số vectors tối đa dùng để train quantizer (PQ train k-means cho từng đoạn con)
+QUANTIZER_SAMPLE = 20000
+
+
+class QuantizedVectorIndex(IVFVectorIndex):
+    """
+    Index IVF + quantization, cùng interface với LocalVectorIndex
+
+    Args:
+        path: Thư mục lưu index
+        quantization: 'int8' hoặc 'pq'
+        pq_m: Số đoạn con của PQ (None = dim / 4)
+        rerank: Số ứng viên được chấm lại bằng vectors float (0 = không re-rank)
+        **kwargs: Tham số của IVFVectorIndex (nlist, nprobe, train_min, ...)
+    """
+
+    def __init__(self, path=None, quantization='int8', pq_m=None, rerank=50, **kwargs):
+        self.quantizer = make_quantizer(quantization, pq_m=pq_m)
+        self.rerank = rerank
+        self.index_type = f'ivf-{quantization}'
+
+        self._codes = None                              # (capacity, code_size) uint8
+        self._float_pos = np.zeros(0, dtype=np.int64)   # dòng -> vị trí vector float
+        self._disk = None                               # memmap vectors.npy
+        self._disk_rows = 0
+        self._tail = None                               # vectors float chưa lưu (RAM)
+        self._tail_size = 0
+
+        super().__init__(path=path, **kwargs)
+
+    def _capacity(self):
+        return len(self._float_pos)
+
+    def _ensure_capacity(self, size):
+        capacity = len(self._float_pos)
+        if size <= capacity:
+            return
+
+        new_capacity = max(size, capacity * 2, 1024)
+        float_pos = np.zeros(new_capacity, dtype=np.int64)
+        float_pos[:capacity] = self._float_pos
+        self._float_pos = float_pos
+        if self._codes is not None:
+            codes = np.zeros((new_capacity, self._codes.shape[1]), dtype=np.uint8)
+            codes[:capacity] = self._codes
+            self._codes = codes
+        self._grow_row_arrays(new_capacity)
+
+    def _store_vectors(self, rows, vectors):
+        """Vectors mới được nối vào tail (RAM); mã nén được tính ngay nếu quantizer đã train"""
+        needed = self._tail_size + len(rows)
+        if self._tail is None or needed > len(self._tail):
+            tail = np.zeros((max(needed, 2 * (0 if self._tail is None else len(self._tail)), 1024), self.dimension),
+                            dtype=np.float32)
+            if self._tail is not None:
+                tail[:self._tail_size] = self._tail[:self._tail_size]
+            self._tail = tail
+
+        self._tail[self._tail_size:needed] = vectors
+        self._float_pos[rows] = self._disk_rows + np.arange(self._tail_size, needed)
+        self._tail_size = needed
+
+        if self.quantizer.trained:
+            self._codes[rows] = self.quantizer.encode(vectors)
+
+    def _vectors(self, rows):
+        """Vectors float32 của các dòng (đọc từ memmap hoặc tail)"""
+        rows = np.asarray(rows)
+        positions = self._float_pos[rows]
+        out = np.empty((len(rows), self.dimension), dtype=np.float32)
+
+        on_disk = positions < self._disk_rows
+        if on_disk.any():
+            disk_positions = positions[on_disk]
+            order = np.argsort(disk_positions, kind='stable')     # đọc memmap theo thứ tự trên đĩa
+            block = np.empty((len(disk_positions), self.dimension), dtype=np.float32)
+            block[order] = self._disk[disk_positions[order]]
+            out[on_disk] = block
+        if not on_disk.all():
+            out[~on_disk] = self._tail[positions[~on_disk] - self._disk_rows]
+        return out
+
+    def _compact_vectors(self, live):
+        count = len(live)
+        self._float_pos[:count] = self._float_pos[live]
+        if self._codes is not None:
+            self._codes[:count] = self._codes[live]
+
+    def _score_candidates(self, rows, vector, top_k):
+        if not self.quantizer.trained:
+            return rows, self._vectors(rows) @ vector
+
+        scores = self.quantizer.scores(self._codes[rows], vector)
+        if not self.rerank or len(rows) == 0:
+            return rows, scores
+
+        # Re-rank: chấm lại exact các ứng viên tốt nhất bằng vectors float
+        count = min(max(self.rerank, top_k), len(rows))
+        best = np.argpartition(-scores, count - 1)[:count]
+        rows = rows[best]
+        return rows, self._vectors(rows) @ vector
+
+    def train(self, nlist=None, iterations=10, sample_size=100000):
+        with self._lock:
+            super().train(nlist=nlist, iterations=iterations, sample_size=sample_size)
+            self.train_quantizer()
+
+    def train_quantizer(self):
+        """Train quantizer trên mẫu vectors hiện có rồi nén toàn bộ"""
+        with self._lock:
+            size = len(self._ids)
+            live = np.flatnonzero(~self._deleted[:size])
+            if len(live) == 0:
+                return
+
+            sample = live
+            if len(sample) > QUANTIZER_SAMPLE:
+                sample = np.sort(np.random.default_rng(0).choice(live, QUANTIZER_SAMPLE, replace=False))
+
+            print(f"🗜️ Training {self.quantizer.kind} quantizer on {len(sample)} vectors")
+            self.quantizer.train(self._vectors(sample))
+
+            self._codes = np.zeros((len(self._float_pos), self.quantizer.code_size(self.dimension)), dtype=np.uint8)
+            for start in range(0, len(live), ASSIGN_CHUNK):
+                chunk = live[start:start + ASSIGN_CHUNK]
+                self._codes[chunk] = self.quantizer.encode(self._vectors(chunk))
+            self.dirty = True
+
+    def save(self, path=None):
+        path = path or self.path
+        with self._lock:
+            super().save(path)
+            # vectors.npy vừa được ghi lại: map lại file mới, bỏ tail trong RAM
+            self._map_vectors(path)
+
+    def _write_vectors(self, filename, size):
+        """Ghi vectors float theo thứ tự dòng, từng khối (không load cả ma trận vào RAM)"""
+        matrix = np.lib.format.open_memmap(filename, mode='w+', dtype=np.float32,
+                                           shape=(size, self.dimension or 0))
+        for start in range(0, size, ASSIGN_CHUNK):
+            end = min(size, start + ASSIGN_CHUNK)
+            matrix[start:end] = self._vectors(np.arange(start, end))
+        matrix.flush()
+        del matrix
+
+    def _map_vectors(self, path):
+        self._disk = np.load(os.path.join(path, VECTORS_FILE), mmap_mode='r')
+        self._disk_rows = self._disk.shape[0]
+        self._tail = None
+        self._tail_size = 0
+        self._ensure_capacity(self._disk_rows)
+        self._float_pos[:self._disk_rows] = np.arange(self._disk_rows)
+        return self._disk_rows
+
+    def _load_vectors(self, path):
+        return self._map_vectors(path)
+
+    def _meta(self):
+        return dict(super()._meta(), quantization=self.quantizer.kind)
+
+    def _save_arrays(self, path):
+        files = super()._save_arrays(path)
+        if not self.quantizer.trained:
+            for name in (CODES_FILE, QUANTIZER_FILE):
+                if os.path.exists(os.path.join(path, name)):
+                    os.remove(os.path.join(path, name))
+            return files
+
+        with open(os.path.join(path, CODES_FILE + '.tmp'), 'wb') as f:
+            np.save(f, self._codes[:len(self._ids)])
+        with open(os.path.join(path, QUANTIZER_FILE + '.tmp'), 'wb') as f:
+            np.savez(f, **self.quantizer.state())
+        return files + [CODES_FILE, QUANTIZER_FILE]
+
+    def _load_arrays(self, path, meta):
+        super()._load_arrays(path, meta)
+        if self.quantizer.trained:
+            return      # vừa train lúc load (index chưa có centroids)
+
+        codes_path = os.path.join(path, CODES_FILE)
+        if meta.get('quantization') == self.quantizer.kind and os.path.exists(codes_path):
+            with np.load(os.path.join(path, QUANTIZER_FILE)) as state:
+                self.quantizer.load_state({key: state[key] for key in state.files})
+            codes = np.load(codes_path)
+            self._codes = np.zeros((len(self._float_pos), codes.shape[1]), dtype=np.uint8)
+            self._codes[:len(codes)] = codes
+        elif self.trained:
+            self.train_quantizer()
+
+    def memory_bytes(self):
+        codes = 0 if self._codes is None else self._codes[:len(self._ids)].nbytes
+        tail = 0 if self._tail is None else self._tail.nbytes
+        return codes + tail + self._float_pos.nbytes
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                super().stats(),
+                quantization=self.quantizer.kind,
+                quantizer_trained=self.quantizer.trained,
+                rerank=self.rerank,
+            )
@@ -0,0 +1,285 @@
+"""
+Vector Store - Abstraction cho Vector DB
+
+Dùng chung cho RAG service (search) và các script ingestion
+(vectorize.py, crawler/*_pinecone.py): embed articles/chunks rồi upsert,
+search theo câu hỏi và trả về metadata + score.
+
+Providers:
+    - pinecone: Pinecone index (PINECONE_API_KEY, PINECONE_INDEX_NAME)
+    - local: index NumPy trong RAM, lưu ra đĩa (LOCAL_VECTOR_INDEX_PATH)
+      LOCAL_INDEX_TYPE=flat (exact) hoặc ivf (ANN cho corpus lớn, IVF_NPROBE)
+      VECTOR_QUANTIZATION=int8 / pq: giữ mã nén trong RAM, vectors float trên đĩa
+"""
+
+import atexit
+import os
+import re
+import threading
+import unicodedata
+
+from .embedder import get_embedder
+from .embedding_cache import chunk_cache_from_env, embedding_cache_from_env
+from .ivf_index import IVFVectorIndex
+from .local_index import LocalVectorIndex
+from .quantized_index import QuantizedVectorIndex
+
+# Pinecone giới hạn metadata 40KB / vector
+MAX_METADATA_TEXT = 8000
+
+NON_ID_CHARS = re.compile(r'[^A-Za-z0-9._:/-]+')
+
+DEFAULT_LOCAL_INDEX_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'data', 'vector_index'
+)
+
+
+def vector_id(mapc):
+    """
+    ID của vector trong Vector DB (Pinecone chỉ nhận ID ASCII)
+
+    VD: "91/2015/QH13-Điều-1-p2" -> "91/2015/QH13-Dieu-1-p2"
+    mapc gốc vẫn được lưu trong metadata.
+    """
+    text = str(mapc).replace('Đ', 'D').replace('đ', 'd')
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return NON_ID_CHARS.sub('-', text).strip('-')
+
+
+def build_metadata(article):
+    """Metadata lưu kèm vector: giữ các field kiểu str/number/bool, bỏ None"""
+    metadata = {}
+    for key, value in article.items():
+        if value is None:
+            continue
+        if isinstance(value, str):
+            metadata[key] = value[:MAX_METADATA_TEXT] if key == 'noidung' else value
+        elif isinstance(value, (int, float, bool)):
+            metadata[key] = value
+    return metadata
+
+
+class VectorStore:
+    """
+    Vector DB abstraction
+
+    Args:
+        provider: Tên provider (mặc định lấy từ VECTOR_DB_PROVIDER)
+        embedder: Embedder dùng để encode (mặc định models.embedder.get_embedder())
+    """
+
+    def __init__(self, provider=None, embedder=None):
+        self.provider = (provider or os.getenv('VECTOR_DB_PROVIDER', 'pinecone')).lower()
+        self.embedder = embedder or get_embedder()
+        # Cache embeddings câu hỏi (EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_PATH)
+        self.query_cache = embedding_cache_from_env(self.embedder)
+        # Cache embeddings chunks cho ingestion (CHUNK_EMBEDDING_CACHE_PATH), mở khi cần
+        self._chunk_cache = None
+        self._chunk_cache_lock = threading.Lock()
+
+        if self.provider == 'pinecone':
+            self._init_pinecone()
+        elif self.provider == 'local':
+            self._init_local()
+        else:
+            raise ValueError(f"Unsupported vector DB provider: {self.provider}")
+
+    def _init_pinecone(self):
+        from pinecone import Pinecone
+
+        api_key = os.getenv('PINECONE_API_KEY')
+        index_name = os.getenv('PINECONE_INDEX_NAME')
+        if not api_key or not index_name:
+            raise ValueError("PINECONE_API_KEY and PINECONE_INDEX_NAME are required")
+
+        self.index_name = index_name
+        self.index = Pinecone(api_key=api_key).Index(index_name)
+
+    def _init_local(self):
+        path = os.getenv('LOCAL_VECTOR_INDEX_PATH', DEFAULT_LOCAL_INDEX_PATH)
+        index_type = os.getenv('LOCAL_INDEX_TYPE', 'flat').lower()
+        quantization = os.getenv('VECTOR_QUANTIZATION', 'none').lower()
+        self.index_name = path
+
+        if index_type not in ('flat', 'ivf'):
+            raise ValueError(f"Unsupported LOCAL_INDEX_TYPE: {index_type}")
+
+        nlist = os.getenv('IVF_NLIST')
+        ivf_params = {
+            'nlist': int(nlist) if nlist else None,
+            'nprobe': int(os.getenv('IVF_NPROBE', 8)),
+            'train_min': int(os.getenv('IVF_TRAIN_MIN', 10000)),
+        }
+
+        if quantization != 'none':
+            # flat + quantization = IVF 1 cụm (quét toàn bộ mã nén)
+            if index_type == 'flat':
+                ivf_params.update(nlist=1, nprobe=1)
+            pq_m = os.getenv('PQ_M')
+            self.index = QuantizedVectorIndex(
+                path,
+                quantization=quantization,
+                pq_m=int(pq_m) if pq_m else None,
+                rerank=int(os.getenv('QUANTIZATION_RERANK', 50)),
+                **ivf_params
+            )
+        elif index_type == 'ivf':
+            self.index = IVFVectorIndex(path, **ivf_params)
+        else:
+            self.index = LocalVectorIndex(path)
+        print(f"📂 Local vector index ({self.index.index_type}): {path} ({len(self.index)} vectors)")
+
+        # Các script ingestion upsert nhiều batch; chỉ ghi đĩa 1 lần khi kết thúc
+        atexit.register(self.flush)
+
+    def upsert_batch(self, articles, batch_size=100):
+        """
+        Embed và upsert articles
+
+        Args:
+            articles: List dict có ít nhất 'mapc', 'ten', 'noidung'
+            batch_size: Số vectors mỗi request upsert
+
+        Returns:
+            Số vectors đã upsert
+        """
+        if not articles:
+            return 0
+        return self.upsert_embeddings(articles, self.embed_articles(articles), batch_size=batch_size)
+
+    @property
+    def chunk_cache(self):
+        """ChunkEmbeddingCache (None nếu tắt); chỉ tạo file khi ingestion cần"""
+        if self._chunk_cache is None:
+            with self._chunk_cache_lock:
+                if self._chunk_cache is None:
+                    self._chunk_cache = chunk_cache_from_env(self.embedder) or False
+        return self._chunk_cache or None
+
+    def embed_articles(self, articles):
+        """Embeddings (n, dim) của nội dung articles (qua cache theo hash nội dung nếu bật)"""
+        texts = [article['noidung'] for article in articles]
+        if self.chunk_cache is not None:
+            return self.chunk_cache.encode(texts)
+        return self.embedder.encode(texts)
+
+    def upsert_embeddings(self, articles, embeddings, batch_size=100):
+        """
+        Upsert articles với embeddings đã tính sẵn (tách embed / upsert để chạy pipeline)
+
+        Returns:
+            Số vectors đã upsert
+        """
+        if not articles:
+            return 0
+
+        if self.provider == 'local':
+            return self.index.upsert(
+                [vector_id(article['mapc']) for article in articles],
+                embeddings,
+                [build_metadata(article) for article in articles]
+            )
+
+        vectors = [
+            {
+                'id': vector_id(article['mapc']),
+                'values': embedding.tolist(),
+                'metadata': build_metadata(article)
+            }
+            for article, embedding in zip(articles, embeddings)
+        ]
+
+        for i in range(0, len(vectors), batch_size):
+            self.index.upsert(vectors=vectors[i:i + batch_size])
+
+        return len(vectors)
+
+    def search(self, query, top_k=3, timeout=None):
+        """
+        Tìm các vectors gần nhất với câu hỏi
+
+        timeout: Timeout (giây) của request query tới Pinecone (None = mặc định của client)
+
+        Returns:
+            List dict metadata (mapc, ten, noidung, ...) kèm 'score', sắp xếp giảm dần
+        """
+        embedding = self.embed_query(query)
+
+        if self.provider == 'local':
+            results = []
+            for vid, score, metadata in self.index.search(embedding, top_k=top_k):
+                result = dict(metadata)
+                result.setdefault('mapc', vid)
+                result['score'] = score
+                results.append(result)
+            return results
+
+        options = {'_request_timeout': timeout} if timeout is not None else {}
+        response = self.index.query(vector=embedding.tolist(), top_k=top_k, include_metadata=True, **options)
+
+        results = []
+        for match in response['matches']:
+            result = dict(match.get('metadata') or {})
+            result.setdefault('mapc', match['id'])
+            result['score'] = match['score']
+            results.append(result)
+        return results
+
+    def embed_query(self, query):
+        """Embedding của câu hỏi, qua cache nếu bật"""
+        if self.query_cache is not None:
+            return self.query_cache.encode_one(query)
+        return self.embedder.encode_one(query)
+
+    def delete(self, mapcs, batch_size=1000):
+        """Xóa vectors theo mapc"""
+        return self.delete_ids([vector_id(mapc) for mapc in mapcs], batch_size=batch_size)
+
+    def list_ids(self, page_size=100):
+        """
+        Liệt kê id của mọi vectors trong index theo từng trang (generator các list id)
+
+        Pinecone: Index.list_paginated (serverless index, pinecone-client >= 3.1),
+        không phải query vector giả với top_k lớn (bị giới hạn 10000 và quét toàn bộ).
+        """
+        if self.provider == 'local':
+            ids = self.index.ids()
+            for i in range(0, len(ids), page_size):
+                yield ids[i:i + page_size]
+            return
+
+        token = None
+        while True:
+            page = self.index.list_paginated(limit=page_size, pagination_token=token)
+            ids = [vector.id for vector in page.vectors]
+            if ids:
+                yield ids
+            token = page.pagination.next if page.pagination else None
+            if not token:
+                return
+
+    def delete_ids(self, ids, batch_size=1000):
+        """Xóa vectors theo id (id trong index, không phải mapc)"""
+        ids = list(ids)
+        if self.provider == 'local':
+            self.index.delete(ids)
+            return len(ids)
+
+        for i in range(0, len(ids), batch_size):
+            self.index.delete(ids=ids[i:i + batch_size])
+        return len(ids)
+
+    def flush(self):
+        """Ghi index local ra đĩa nếu có thay đổi (Pinecone: không cần)"""
+        if self.provider == 'local' and self.index.dirty:
+            self.index.save()
+            print(f"💾 Saved local vector index: {self.index_name} ({len(self.index)} vectors)")
+
+    def stats(self):
+        """Thông tin vector store cho /health"""
+        return {
+            'provider': self.provider,
+            'index': self.index.stats() if self.provider == 'local' else self.index_name,
+            'query_cache': self.query_cache.stats() if self.query_cache is not None else None,
+        }
@@ -36,4 +36,22 @@ if result.get('success'):
 else:
     print(f"\n❌ ERROR: {result.get('error')}")
 
+# Test 3: CORS preflight (web client gọi từ origin khác)
+print("\n3️⃣ Testing CORS preflight...")
+response = requests.options(
+    "http://localhost:5001/api/v1/question",
+    headers={
+        "Origin": "http://localhost:3000",
+        "Access-Control-Request-Method": "POST",
+        "Access-Control-Request-Headers": "content-type"
+    }
+)
+allow_origin = response.headers.get('Access-Control-Allow-Origin')
+print(f"Status: {response.status_code}")
+print(f"Access-Control-Allow-Origin: {allow_origin}")
+if response.status_code == 200 and allow_origin:
+    print("✅ Preflight OK")
+else:
+    print("❌ Preflight rejected")
+
 print("\n" + "="*60 + "\n")
@@ -17,6 +17,9 @@ from supabase import create_client, Client
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
+from ingestion.chunker import chunker_from_env
+from ingestion.reader import iter_table
+from models.process_embedder import ingest_embedder_from_env
 from models.vector_store import VectorStore
 
 load_dotenv()
@@ -34,15 +37,12 @@ def fetch_articles_from_supabase():
 
     print("Fetching articles from Supabase...")
 
-    # Fetch all articles
-    response = supabase.table('articles').select('mapc, ten, noi_dung, document_id').execute()
-
-    articles = response.data
-    
-    # Normalize field names (noi_dung -> noidung for compatibility)
-    for article in articles:
-        if 'noi_dung' in article:
-            article['noidung'] = article['noi_dung']
+    # Fetch all articles (theo từng trang, tránh bị PostgREST cắt bớt)
+    articles = []
+    for article in iter_table(supabase, 'articles', columns='id, mapc, ten, noi_dung, document_id'):
+        # Normalize field names (noi_dung -> noidung for compatibility)
+        article['noidung'] = article.get('noi_dung')
+        articles.append(article)
     
     print(f"Fetched {len(articles)} articles")
 
@@ -76,7 +76,8 @@ def main():
     # Initialize vector store
     try:
         print(f"\nInitializing {provider} vector store...")
-        vector_store = VectorStore(provider=provider)
+        # EMBEDDING_PROCESSES > 1: encode trên nhiều process
+        vector_store = VectorStore(provider=provider, embedder=ingest_embedder_from_env())
     except Exception as e:
         print(f"Error initializing vector store: {e}")
         print("\nMake sure:")
@@ -84,12 +85,19 @@ def main():
             print("  1. PINECONE_API_KEY is set")
             print("  2. PINECONE_INDEX_NAME is set")
             print("  3. Index exists in Pinecone dashboard")
+        elif provider == 'local':
+            print("  1. LOCAL_VECTOR_INDEX_PATH is writable")
         else:
             print("  1. ChromaDB is configured")
         sys.exit(1)
 
+    # Chia articles dài thành chunks vừa cửa sổ token của embedding model
+    chunker = chunker_from_env(vector_store.embedder)
+    chunks = [chunk for article in articles for chunk in chunker.chunk(article, header=article['ten'])]
+    print(f"Split {len(articles)} articles into {len(chunks)} chunks (<= {chunker.max_tokens} tokens)")
+
     # Confirm before proceeding
-    print(f"\nAbout to create embeddings for {len(articles)} articles")
+    print(f"\nAbout to create embeddings for {len(chunks)} chunks")
     print("This may take a while (few minutes)...")
     confirm = input("\nContinue? (y/n): ")
 
@@ -100,8 +108,12 @@ def main():
     # Create and upsert embeddings
     try:
         print("\nCreating embeddings and uploading...")
-        count = vector_store.upsert_batch(articles)
+        count = vector_store.upsert_batch(chunks)
         print(f"\nSuccess! Uploaded {count} embeddings to {provider}")
+        if hasattr(vector_store.embedder, 'stats'):
+            print(f"Embedding: {vector_store.embedder.stats()}")
+        if vector_store.chunk_cache is not None:
+            print(f"Embedding cache: {vector_store.chunk_cache.stats()}")
     except Exception as e:
         print(f"\nError: {e}")
         sys.exit(1)
@@ -18,6 +18,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'rag
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'rag-service'))
 import patch_torch
 
+from ingestion.reader import iter_table_pages
 from models.vector_store import VectorStore
 
 # Load .env từ rag-service
@@ -26,6 +27,38 @@ load_dotenv(env_path)
 print(f"✓ Loaded .env from: {env_path}")
 
 
+def cleanup_table(supabase: Client, table, label, keep=3, page_size=1000):
+    """
+    Giữ `keep` dòng đầu tiên (theo id), xóa phần còn lại
+    
+    Đọc id theo từng trang (keyset) và xóa ngay từng trang, nên không bị
+    PostgREST cắt bớt và không phải giữ toàn bộ id trong RAM.
+    """
+    kept = []
+    deleted = 0
+    
+    for rows in iter_table_pages(supabase, table, columns='id', page_size=page_size):
+        ids = [row['id'] for row in rows]
+        
+        if len(kept) < keep:
+            take = keep - len(kept)
+            kept += ids[:take]
+            ids = ids[take:]
+        
+        if ids:
+            supabase.table(table).delete().in_('id', ids).execute()
+            deleted += len(ids)
+            print(f"   🗑️  Deleted {deleted} {label}...")
+    
+    print(f"   Total {label}: {len(kept) + deleted}")
+    if deleted:
+        print(f"   ✓ Kept first {len(kept)} {label}: {kept}")
+        print(f"   ✅ Deleted {deleted} {label}")
+    else:
+        print(f"   ℹ️  Only {len(kept)} {label} found, nothing to delete")
+    return deleted
+
+
 def cleanup_supabase():
     """Clean up Supabase data, keep only first 3 rows"""
     print("\n" + "="*60)
@@ -45,49 +78,11 @@ def cleanup_supabase():
         
         # Clean up documents table
         print("\n📋 Documents table:")
-        response = supabase.table('documents').select('id').order('id').execute()
-        all_docs = response.data
-        
-        print(f"   Total documents: {len(all_docs)}")
-        
-        if len(all_docs) > 3:
-            # Keep first 3, delete the rest
-            docs_to_keep = all_docs[:3]
-            docs_to_delete = all_docs[3:]
-            
-            print(f"   ✓ Keeping first 3 documents: {[d['id'] for d in docs_to_keep]}")
-            print(f"   🗑️  Deleting {len(docs_to_delete)} documents...")
-            
-            # Delete documents
-            delete_ids = [d['id'] for d in docs_to_delete]
-            result = supabase.table('documents').delete().in_('id', delete_ids).execute()
-            
-            print(f"   ✅ Deleted {len(docs_to_delete)} documents")
-        else:
-            print(f"   ℹ️  Only {len(all_docs)} documents found, nothing to delete")
+        cleanup_table(supabase, 'documents', 'documents')
         
         # Clean up articles table
         print("\n📰 Articles table:")
-        response = supabase.table('articles').select('id').order('id').execute()
-        all_articles = response.data
-        
-        print(f"   Total articles: {len(all_articles)}")
-        
-        if len(all_articles) > 3:
-            # Keep first 3, delete the rest
-            articles_to_keep = all_articles[:3]
-            articles_to_delete = all_articles[3:]
-            
-            print(f"   ✓ Keeping first 3 articles: {[a['id'] for a in articles_to_keep]}")
-            print(f"   🗑️  Deleting {len(articles_to_delete)} articles...")
-            
-            # Delete articles
-            delete_ids = [a['id'] for a in articles_to_delete]
-            result = supabase.table('articles').delete().in_('id', delete_ids).execute()
-            
-            print(f"   ✅ Deleted {len(articles_to_delete)} articles")
-        else:
-            print(f"   ℹ️  Only {len(all_articles)} articles found, nothing to delete")
+        cleanup_table(supabase, 'articles', 'articles')
         
         print("\n✅ Supabase cleanup completed!")
         return True
@@ -113,9 +108,6 @@ def cleanup_pinecone():
         # Get all vector IDs
         print("\n📊 Fetching all vectors from Pinecone...")
         
-        # Query to get all IDs (fetch in batches)
-        all_ids = []
-        
         # Use describe_index_stats to get total count
         stats = vector_store.index.describe_index_stats()
         total_vectors = stats.total_vector_count
@@ -125,31 +117,13 @@ def cleanup_pinecone():
             print(f"   ℹ️  Only {total_vectors} vectors found, nothing to delete")
             return True
         
-        # Fetch all IDs by querying
-        # We'll query with a dummy vector to get all matches
-        print("\n🔍 Fetching vector IDs...")
-        
-        # Get first 3 IDs to keep
-        query_result = vector_store.index.query(
-            vector=[0.0] * 768,  # Dummy vector
-            top_k=3,
-            include_metadata=False
-        )
+        # Liệt kê id theo từng trang (không giới hạn 10000 như query top_k)
+        print("\n🔍 Listing vector IDs...")
+        all_ids = [vid for page in vector_store.list_ids() for vid in page]
         
-        ids_to_keep = [match['id'] for match in query_result['matches']]
+        ids_to_keep = all_ids[:3]
+        ids_to_delete = all_ids[3:]
         print(f"   ✓ Keeping first 3 vectors: {ids_to_keep}")
-        
-        # Get all other IDs to delete
-        # Query with larger top_k to get all vectors
-        query_result = vector_store.index.query(
-            vector=[0.0] * 768,
-            top_k=10000,  # Large number to get all
-            include_metadata=False
-        )
-        
-        all_ids = [match['id'] for match in query_result['matches']]
-        ids_to_delete = [id for id in all_ids if id not in ids_to_keep]
-        
         print(f"   🗑️  Deleting {len(ids_to_delete)} vectors...")
         
         if ids_to_delete:
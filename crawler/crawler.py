@@ -6,6 +6,9 @@ Copyright (C) 2024 - Based on VN-Law-Advisor
 Licensed under GNU GPL v3.0
 """
 
+import argparse
+import asyncio
+import random
 import requests
 from bs4 import BeautifulSoup
 import json
@@ -14,6 +17,11 @@ import os
 from datetime import datetime
 import re
 
+from rate_limiter import HostRateLimiter
+
+# Status code nên thử lại (server quá tải / giới hạn tốc độ)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
 class LawCrawler:
     """
     Simple crawler để crawl văn bản pháp luật từ vbpl.vn
@@ -90,71 +98,85 @@ class LawCrawler:
         """
         print(f"  Crawling document ID: {doc_id}")
 
-        url = f"{self.base_url}/TW/Pages/vbpq-toanvan.aspx?ItemID={doc_id}"
-
         try:
-            response = self.session.get(url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-
-            # Parse metadata
-            document = {
-                'id': doc_id,
-                'ten': '',
-                'so_hieu': '',
-                'loai': '',
-                'ngay_ban_hanh': None,
-                'ngay_hieu_luc': None,
-                'trang_thai': 'Còn hiệu lực',
-                'co_quan_ban_hanh': '',
-                'nguoi_ky': '',
-                'noi_dung': '',
-                'crawled_at': datetime.now().isoformat()
-            }
-
-            # Lấy tiêu đề
-            title_elem = soup.find('h1', class_='title')
-            if title_elem:
-                document['ten'] = title_elem.text.strip()
-
-            # Lấy thông tin từ các div.row
-            info_rows = soup.select('div.row div.col-md-6, div.row div.col-md-12')
-            for row in info_rows:
-                label = row.find('label')
-                if not label:
-                    continue
-
-                label_text = label.text.strip().lower()
-                value_elem = row.find('span') or row.find('p')
-                value = value_elem.text.strip() if value_elem else ''
-
-                if 'số hiệu' in label_text:
-                    document['so_hieu'] = value
-                elif 'loại văn bản' in label_text:
-                    document['loai'] = value
-                elif 'ngày ban hành' in label_text:
-                    document['ngay_ban_hanh'] = self._parse_date(value)
-                elif 'ngày hiệu lực' in label_text:
-                    document['ngay_hieu_luc'] = self._parse_date(value)
-                elif 'tình trạng' in label_text or 'trạng thái' in label_text:
-                    document['trang_thai'] = value
-                elif 'cơ quan ban hành' in label_text:
-                    document['co_quan_ban_hanh'] = value
-                elif 'người ký' in label_text:
-                    document['nguoi_ky'] = value
-
-            # Lấy nội dung toàn văn
-            fulltext_div = soup.find('div', class_='fulltext')
-            if fulltext_div:
-                content_div = fulltext_div.find('div', recursive=False)
-                if content_div:
-                    document['noi_dung'] = content_div.get_text(separator='\n', strip=True)
-
-            return document
+            response = self.session.get(self._document_url(doc_id), timeout=10)
+            return self.parse_document_detail(doc_id, response.content)
 
         except Exception as e:
             print(f"  Error crawling document {doc_id}: {e}")
             return None
 
+    def _document_url(self, doc_id):
+        return f"{self.base_url}/TW/Pages/vbpq-toanvan.aspx?ItemID={doc_id}"
+
+    def parse_document_detail(self, doc_id, html):
+        """
+        Parse trang toàn văn của 1 văn bản (dùng chung cho crawl tuần tự và async)
+
+        Args:
+            doc_id: ID của văn bản
+            html: Nội dung trang (bytes hoặc str)
+
+        Returns:
+            Dict chứa thông tin văn bản
+        """
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # Parse metadata
+        document = {
+            'id': doc_id,
+            'ten': '',
+            'so_hieu': '',
+            'loai': '',
+            'ngay_ban_hanh': None,
+            'ngay_hieu_luc': None,
+            'trang_thai': 'Còn hiệu lực',
+            'co_quan_ban_hanh': '',
+            'nguoi_ky': '',
+            'noi_dung': '',
+            'crawled_at': datetime.now().isoformat()
+        }
+
+        # Lấy tiêu đề
+        title_elem = soup.find('h1', class_='title')
+        if title_elem:
+            document['ten'] = title_elem.text.strip()
+
+        # Lấy thông tin từ các div.row
+        info_rows = soup.select('div.row div.col-md-6, div.row div.col-md-12')
+        for row in info_rows:
+            label = row.find('label')
+            if not label:
+                continue
+
+            label_text = label.text.strip().lower()
+            value_elem = row.find('span') or row.find('p')
+            value = value_elem.text.strip() if value_elem else ''
+
+            if 'số hiệu' in label_text:
+                document['so_hieu'] = value
+            elif 'loại văn bản' in label_text:
+                document['loai'] = value
+            elif 'ngày ban hành' in label_text:
+                document['ngay_ban_hanh'] = self._parse_date(value)
+            elif 'ngày hiệu lực' in label_text:
+                document['ngay_hieu_luc'] = self._parse_date(value)
+            elif 'tình trạng' in label_text or 'trạng thái' in label_text:
+                document['trang_thai'] = value
+            elif 'cơ quan ban hành' in label_text:
+                document['co_quan_ban_hanh'] = value
+            elif 'người ký' in label_text:
+                document['nguoi_ky'] = value
+
+        # Lấy nội dung toàn văn
+        fulltext_div = soup.find('div', class_='fulltext')
+        if fulltext_div:
+            content_div = fulltext_div.find('div', recursive=False)
+            if content_div:
+                document['noi_dung'] = content_div.get_text(separator='\n', strip=True)
+
+        return document
+
     def parse_articles(self, document):
         """
         Parse các điều luật từ nội dung văn bản
@@ -212,16 +234,25 @@ class LawCrawler:
             json.dump(data, f, ensure_ascii=False, indent=2)
         print(f"Saved to {filepath}")
 
-    def crawl_batch(self, doc_ids):
+    def crawl_batch(self, doc_ids, concurrency=1, rate=1.0, burst=1):
         """
         Crawl một batch văn bản
 
         Args:
             doc_ids: List of document IDs
+            concurrency: Số request đồng thời (> 1 = crawl async, xem crawl_batch_async)
+            rate: Số request / giây mỗi host (chế độ async)
+            burst: Số request liền nhau tối đa mỗi host (chế độ async)
 
         Returns:
             Tuple (documents, articles)
+
+        Chế độ async chạy bằng asyncio.run(), nên không gọi được từ code đang có
+        event loop chạy (RuntimeError): khi đó await crawl_batch_async trực tiếp.
         """
+        if concurrency > 1:
+            return asyncio.run(self.crawl_batch_async(doc_ids, concurrency=concurrency, rate=rate, burst=burst))
+
         documents = []
         all_articles = []
 
@@ -246,6 +277,103 @@ class LawCrawler:
 
         return documents, all_articles
 
+    async def crawl_batch_async(self, doc_ids, concurrency=8, rate=1.0, burst=1, max_retries=5, backoff=2.0):
+        """
+        Crawl một batch văn bản song song (asyncio + aiohttp)
+
+        Tối đa `concurrency` request cùng lúc, mỗi host không quá `rate` request / giây
+        (token bucket). 429 / 5xx / lỗi mạng: tạm dừng cả host theo Retry-After hoặc
+        exponential backoff rồi thử lại. Kết quả giống crawl_batch (cùng thứ tự doc_ids).
+        Là entry point cho code đã chạy trong event loop (crawl_batch dùng asyncio.run).
+
+        Args:
+            doc_ids: List of document IDs
+            concurrency: Số request đồng thời tối đa
+            rate: Số request / giây mỗi host
+            burst: Số request liền nhau tối đa mỗi host
+            max_retries: Số lần thử lại mỗi văn bản
+            backoff: Thời gian chờ cơ sở (giây), nhân đôi mỗi lần thử lại
+
+        Returns:
+            Tuple (documents, articles)
+        """
+        import aiohttp
+
+        limiter = HostRateLimiter(rate=rate, burst=burst)
+        semaphore = asyncio.Semaphore(concurrency)
+        loop = asyncio.get_running_loop()
+        started = time.time()
+        done = 0
+
+        async def crawl_one(session, doc_id):
+            nonlocal done
+            async with semaphore:
+                html = await self._fetch_async(session, limiter, self._document_url(doc_id), max_retries, backoff)
+            if html is None:
+                print(f"  Error crawling document {doc_id}: giving up after {max_retries} retries")
+                return None
+
+            # Parse HTML trong thread pool, không chặn event loop
+            try:
+                document = await loop.run_in_executor(None, self.parse_document_detail, doc_id, html)
+            except Exception as e:
+                print(f"  Error crawling document {doc_id}: {e}")
+                return None
+            articles = self.parse_articles(document)
+
+            done += 1
+            print(f"  [{done}/{len(doc_ids)}] Document {doc_id}: {len(articles)} articles "
+                  f"({done / (time.time() - started):.2f} docs/s)")
+            return document, articles
+
+        timeout = aiohttp.ClientTimeout(total=30)
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(headers=dict(self.session.headers), timeout=timeout,
+                                         connector=connector) as session:
+            results = await asyncio.gather(*(crawl_one(session, doc_id) for doc_id in doc_ids))
+
+        documents = []
+        all_articles = []
+        for result in results:
+            if result is None:
+                continue
+            document, articles = result
+            documents.append(document)
+            all_articles.extend(articles)
+        return documents, all_articles
+
+    async def _fetch_async(self, session, limiter, url, max_retries, backoff):
+        """GET url theo rate limit của host, thử lại khi 429 / 5xx / lỗi mạng; None nếu hết lượt"""
+        import aiohttp
+
+        for attempt in range(max_retries + 1):
+            await limiter.acquire(url)
+            retry_after = None
+            try:
+                async with session.get(url) as response:
+                    if response.status not in RETRY_STATUSES:
+                        return await response.read()
+                    error = f"HTTP {response.status}"
+                    retry_after = self._retry_after(response.headers.get('Retry-After'))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+
+            if attempt == max_retries:
+                break
+            delay = retry_after if retry_after is not None else backoff * (2 ** attempt) * random.uniform(0.5, 1)
+            # Lùi lại cả host: các request khác tới host này cũng chờ
+            limiter.pause(url, delay)
+            print(f"  ⚠️  {error} for {url}, retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+
+        return None
+
+    def _retry_after(self, value):
+        """Retry-After (số giây) -> float, None nếu không có / không đọc được"""
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            return None
+
     def _parse_date(self, date_str):
         """Parse date string to ISO format"""
         if not date_str:
@@ -267,21 +395,33 @@ def main():
     """
     Main function để test crawler
     """
+    parser = argparse.ArgumentParser(description='Crawl văn bản pháp luật từ vbpl.vn')
+    parser.add_argument('--page', type=int, default=1, help='Search result page (default: 1)')
+    parser.add_argument('--limit', type=int, default=5, help='Documents to crawl (default: 5)')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Concurrent requests; 1 = sequential with 1s delay (default: 1)')
+    parser.add_argument('--rate', type=float, default=2.0,
+                        help='Max requests per second per host (default: 2)')
+    parser.add_argument('--burst', type=int, default=2,
+                        help='Max back-to-back requests per host (default: 2)')
+    args = parser.parse_args()
+
     print("VN-Law-Mini Crawler")
     print("=" * 50)
 
     crawler = LawCrawler(output_dir="./data")
 
-    # Test: Crawl 5 văn bản đầu tiên
+    # Test: Crawl các văn bản đầu tiên
     print("\nStep 1: Get document list...")
-    doc_ids = crawler.crawl_document_list(page=1, limit=5, keyword="")
+    doc_ids = crawler.crawl_document_list(page=args.page, limit=args.limit, keyword="")
 
     if not doc_ids:
         print("No documents found!")
         return
 
     print(f"\nStep 2: Crawl {len(doc_ids)} documents...")
-    documents, articles = crawler.crawl_batch(doc_ids)
+    documents, articles = crawler.crawl_batch(doc_ids, concurrency=args.concurrency,
+                                              rate=args.rate, burst=args.burst)
 
     print(f"\nStep 3: Save to JSON...")
     crawler.save_to_json(documents, 'documents.json')
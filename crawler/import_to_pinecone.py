@@ -17,6 +17,11 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'rag
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'rag-service'))
 import patch_torch
 
+from ingestion.chunker import chunker_from_env
+from ingestion.pipeline import Pipeline, Stage, batched
+from ingestion.reader import iter_table
+from ingestion.uploader import Uploader
+from models.process_embedder import ingest_embedder_from_env
 from models.vector_store import VectorStore
 
 # Load .env từ rag-service
@@ -39,9 +44,8 @@ def fetch_documents_from_supabase():
     try:
         supabase: Client = create_client(supabase_url, supabase_key)
         
-        # Fetch all documents
-        response = supabase.table('documents').select('*').execute()
-        docs = response.data
+        # Fetch all documents (theo từng trang, tránh bị PostgREST cắt bớt)
+        docs = iter_table(supabase, 'documents', columns='*')
         
         # Convert to format compatible with vectorize
         documents = []
@@ -78,50 +82,9 @@ def fetch_documents_from_supabase():
         return []
 
 
-def split_into_chunks(documents, chunk_size=1000):
-    """Chia văn bản dài thành các chunks nhỏ hơn"""
-    chunks = []
-    
-    for doc in documents:
-        content = doc['noidung']
-        
-        # Nếu văn bản ngắn, giữ nguyên
-        if len(content) <= chunk_size:
-            chunks.append(doc)
-            continue
-        
-        # Chia thành các chunks
-        words = content.split()
-        current_chunk = []
-        current_length = 0
-        chunk_idx = 1
-        
-        for word in words:
-            current_chunk.append(word)
-            current_length += len(word) + 1
-            
-            if current_length >= chunk_size:
-                # Tạo chunk mới
-                chunk = doc.copy()
-                chunk['mapc'] = f"{doc['mapc']}-chunk{chunk_idx}"
-                chunk['ten'] = f"{doc['ten']} (Phần {chunk_idx})"
-                chunk['noidung'] = ' '.join(current_chunk)
-                chunks.append(chunk)
-                
-                # Reset
-                current_chunk = []
-                current_length = 0
-                chunk_idx += 1
-        
-        # Thêm phần còn lại
-        if current_chunk:
-            chunk = doc.copy()
-            chunk['mapc'] = f"{doc['mapc']}-chunk{chunk_idx}"
-            chunk['ten'] = f"{doc['ten']} (Phần {chunk_idx})"
-            chunk['noidung'] = ' '.join(current_chunk)
-            chunks.append(chunk)
-    
-    return chunks
+def split_into_chunks(documents, chunker):
+    """Chia văn bản dài thành các chunks theo Chương / Điều / Khoản và ngân sách token (ingestion.chunker)"""
+    return [chunk for doc in documents for chunk in chunker.chunk(doc, header=doc['ten'])]
 
 
 def main():
@@ -153,20 +116,22 @@ def main():
         print("\n❌ No documents found!")
         sys.exit(1)
     
-    # Split into chunks
-    print(f"\n✂️  Splitting documents into chunks...")
-    chunks = split_into_chunks(documents, chunk_size=1500)
-    print(f"   Created {len(chunks)} chunks from {len(documents)} documents")
-    
     # Initialize vector store
     print(f"\n🔌 Initializing {provider} vector store...")
     try:
-        vector_store = VectorStore(provider=provider)
+        # EMBEDDING_PROCESSES > 1: encode trên nhiều process
+        vector_store = VectorStore(provider=provider, embedder=ingest_embedder_from_env())
         print("✅ Vector store initialized")
     except Exception as e:
         print(f"❌ Error: {e}")
         sys.exit(1)
     
+    # Split into chunks (đếm token bằng tokenizer của embedding model)
+    print(f"\n✂️  Splitting documents into chunks...")
+    chunker = chunker_from_env(vector_store.embedder)
+    chunks = split_into_chunks(documents, chunker)
+    print(f"   Created {len(chunks)} chunks (<= {chunker.max_tokens} tokens) from {len(documents)} documents")
+    
     # Confirm
     print(f"\n⚠️  About to create embeddings for {len(chunks)} text chunks")
     print(f"   This may take 5-10 minutes...")
@@ -182,17 +147,37 @@ def main():
     print("   This will take a while, please wait...")
     
     try:
-        # Batch processing
+        # Embed và upsert chồng lên nhau; upsert song song, retry, lỗi hẳn thì ghi dead-letter
         batch_size = 50
         total_uploaded = 0
+        failed_count = 0
+        uploader = Uploader(vector_store, max_batch_vectors=batch_size)
         
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i:i+batch_size]
-            count = vector_store.upsert_batch(batch)
-            total_uploaded += count
-            print(f"   Progress: {total_uploaded}/{len(chunks)} chunks uploaded")
+        pipeline = Pipeline(
+            batched(chunks, batch_size),
+            [
+                Stage('embed', lambda batch: (batch, vector_store.embed_articles(batch)),
+                      workers=getattr(vector_store.embedder, 'processes', 1)),
+                Stage('upsert', lambda item: uploader.upload(*item), workers=4),
+            ]
+        )
+        for result in pipeline:
+            total_uploaded += result['uploaded']
+            failed_count += result['failed']
+            print(f"   Progress: {total_uploaded}/{len(chunks)} chunks uploaded "
+                  f"({uploader.vectors_per_second():.1f} vectors/s)")
         
+        vector_store.flush()
         print(f"\n✅ SUCCESS! Uploaded {total_uploaded} embeddings to {provider}")
+        if hasattr(vector_store.embedder, 'stats'):
+            embedding = vector_store.embedder.stats()
+            print(f"   Embedding: {embedding['texts_per_second']} chunks/s ({embedding['processes']} processes)")
+        if failed_count:
+            print(f"   ⚠️  {failed_count} chunks failed, written to {uploader.dead_letter_path}")
+            print("      Replay: python crawler/sync_supabase_to_pinecone.py --replay-dead-letter")
+        if vector_store.chunk_cache is not None:
+            cache = vector_store.chunk_cache.stats()
+            print(f"   Embedding cache: {cache['hits']} hits, {cache['misses']} encoded")
         
     except Exception as e:
         print(f"\n❌ Error during upload: {e}")
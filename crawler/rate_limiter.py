@@ -0,0 +1,82 @@
+"""
+Rate Limiter - Giới hạn tốc độ request theo từng host (token bucket, asyncio)
+
+Mỗi host có 1 bucket: tối đa `burst` request liền nhau, sau đó `rate`
+request / giây. Khi server trả 429/5xx, cả host bị tạm dừng (pause) theo
+Retry-After hoặc exponential backoff, để mọi request đang chờ cùng lùi lại
+thay vì tiếp tục dồn vào server đang quá tải.
+"""
+
+import asyncio
+import time
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """
+    Args:
+        rate: Số request / giây (trung bình)
+        burst: Số request tối đa được gửi liền nhau
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Chờ tới khi lấy được 1 token"""
+        # Lock giữ thứ tự FIFO: request chờ trước được gửi trước
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Tạm dừng bucket `seconds` giây (429 / 5xx), token tích lũy bị bỏ"""
+        now = time.monotonic()
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = self.paused_until
+
+
+class HostRateLimiter:
+    """
+    1 TokenBucket cho mỗi host
+
+    Args:
+        rate: Số request / giây mỗi host
+        burst: Số request liền nhau tối đa mỗi host
+    """
+
+    def __init__(self, rate=1.0, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+
+    def bucket(self, url):
+        host = urlparse(url).netloc
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return self._buckets[host]
+
+    async def acquire(self, url):
+        await self.bucket(url).acquire()
+
+    def pause(self, url, seconds):
+        self.bucket(url).pause(seconds)
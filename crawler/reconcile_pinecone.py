@@ -0,0 +1,188 @@
+"""
+Reconcile Pinecone with Supabase
+
+So sánh id các vectors trong vector index với tập chunk id sinh ra từ
+articles trên Supabase (cùng cách chia chunk với sync_supabase_to_pinecone.py):
+
+    - orphan: vector không còn chunk tương ứng -> xóa
+    - missing: chunk chưa có vector -> embed và upsert lại
+
+Id của index được liệt kê theo từng trang (không dùng query vector giả
+với top_k=10000), articles được đọc theo keyset, nên chạy được với index
+và bảng lớn. Chạy với --dry-run để chỉ xem kích thước chênh lệch.
+
+Usage:
+    python crawler/reconcile_pinecone.py --dry-run
+    python crawler/reconcile_pinecone.py -y
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Dùng chung .env, sys.path (rag-service/src) và cách chia chunk với sync script
+from sync_supabase_to_pinecone import (ARTICLE_COLUMNS, create_supabase_client, format_article,
+                                       make_uploader, split_article, upload_stages)
+
+from ingestion.chunker import chunker_from_env
+from ingestion.pipeline import Pipeline, batched
+from ingestion.reader import iter_table
+from models.vector_store import VectorStore, vector_id
+
+# Số id mỗi câu query articles theo id (giữ URL PostgREST ngắn)
+FETCH_IDS_BATCH = 100
+
+
+def expected_chunk_ids(supabase, chunker, page_size):
+    """vector id -> article id của mọi chunk sinh ra từ Supabase"""
+    expected = {}
+    for row in iter_table(supabase, 'articles', columns=ARTICLE_COLUMNS, page_size=page_size):
+        article = format_article(row)
+        if article is None:
+            continue
+        for chunk in split_article(article, chunker):
+            expected[vector_id(chunk['mapc'])] = row['id']
+    return expected
+
+
+def indexed_ids(vector_store, page_size):
+    """Tập id đang có trong vector index (liệt kê theo từng trang)"""
+    ids = set()
+    for page in vector_store.list_ids(page_size=page_size):
+        ids.update(page)
+    return ids
+
+
+def iter_missing_chunks(supabase, chunker, missing, expected, page_size):
+    """Chunks thiếu vector (đọc lại articles của chúng theo id, chỉ giữ chunk thiếu)"""
+    article_ids = sorted({expected[vid] for vid in missing})
+    for start in range(0, len(article_ids), FETCH_IDS_BATCH):
+        ids = article_ids[start:start + FETCH_IDS_BATCH]
+        rows = iter_table(supabase, 'articles', columns=ARTICLE_COLUMNS, page_size=page_size,
+                          filters=lambda query: query.in_('id', ids))
+        for row in rows:
+            article = format_article(row)
+            if article is None:
+                continue
+            for chunk in split_article(article, chunker):
+                if vector_id(chunk['mapc']) in missing:
+                    yield chunk
+
+
+def delete_orphans(vector_store, orphans, batch_size, workers):
+    """Xóa orphans theo batch, nhiều request song song"""
+    batches = [orphans[i:i + batch_size] for i in range(0, len(orphans), batch_size)]
+    deleted = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for count in executor.map(vector_store.delete_ids, batches):
+            deleted += count
+            print(f"   🗑️  Deleted {deleted}/{len(orphans)} orphan vectors")
+    return deleted
+
+
+def print_sample(label, ids, limit=5):
+    sample = sorted(ids)[:limit]
+    if sample:
+        print(f"   {label} (sample): {', '.join(sample)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconcile vector index with Supabase articles')
+    parser.add_argument('--dry-run', action='store_true', help='Only report the diff, change nothing')
+    parser.add_argument('--auto-confirm', '-y', action='store_true', help='Auto-confirm without prompting')
+    parser.add_argument('--page-size', type=int, default=500,
+                        help='Articles per Supabase page (default: 500)')
+    parser.add_argument('--list-page-size', type=int, default=100,
+                        help='Ids per index listing page (default: 100, Pinecone max)')
+    parser.add_argument('--batch-size', type=int, default=50,
+                        help='Chunks per embed/upsert batch (default: 50)')
+    parser.add_argument('--delete-batch-size', type=int, default=1000,
+                        help='Ids per delete request (default: 1000)')
+    parser.add_argument('--embed-workers', type=int, default=2,
+                        help='Parallel embedding workers (default: 2)')
+    parser.add_argument('--upsert-workers', type=int, default=4,
+                        help='Parallel upsert / delete workers (default: 4)')
+    parser.add_argument('--queue-size', type=int, default=4,
+                        help='Max batches waiting between stages (default: 4)')
+    parser.add_argument('--max-request-bytes', type=int, default=2 * 1024 * 1024,
+                        help='Max upsert request payload in bytes (default: 2MB)')
+    parser.add_argument('--max-retries', type=int, default=5,
+                        help='Retries for transient upsert errors (default: 5)')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("🔁 RECONCILE VECTOR INDEX WITH SUPABASE")
+    print("=" * 70)
+
+    provider = os.getenv('VECTOR_DB_PROVIDER', 'pinecone')
+    print(f"\n🔧 Vector DB Provider: {provider}")
+
+    supabase = create_supabase_client()
+    if supabase is None:
+        sys.exit(1)
+
+    try:
+        vector_store = VectorStore(provider=provider)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    started = time.time()
+    print("\n📥 Building expected chunk ids from Supabase...")
+    chunker = chunker_from_env(vector_store.embedder)
+    expected = expected_chunk_ids(supabase, chunker, args.page_size)
+    print(f"   Expected chunks: {len(expected)}")
+
+    print("\n📊 Listing vector ids from the index...")
+    indexed = indexed_ids(vector_store, args.list_page_size)
+    print(f"   Indexed vectors: {len(indexed)}")
+
+    orphans = sorted(indexed - expected.keys())
+    missing = expected.keys() - indexed
+
+    print(f"\n📋 Diff ({time.time() - started:.0f}s):")
+    print(f"   - In sync: {len(indexed) - len(orphans)}")
+    print(f"   - Orphans (to delete): {len(orphans)}")
+    print(f"   - Missing (to upsert): {len(missing)}")
+    print_sample('Orphans', orphans)
+    print_sample('Missing', missing)
+
+    if args.dry_run:
+        print("\nℹ️  Dry run, nothing changed")
+        return
+    if not orphans and not missing:
+        print("\n✅ Index is already in sync")
+        return
+
+    if not args.auto_confirm:
+        confirm = input(f"\n   Delete {len(orphans)} and upsert {len(missing)} vectors? (y/n): ")
+        if confirm.lower() != 'y':
+            print("❌ Cancelled")
+            sys.exit(0)
+
+    if orphans:
+        print(f"\n🗑️  Deleting {len(orphans)} orphan vectors...")
+        delete_orphans(vector_store, orphans, args.delete_batch_size, args.upsert_workers)
+
+    failed_count = 0
+    if missing:
+        print(f"\n🚀 Upserting {len(missing)} missing chunks...")
+        uploader = make_uploader(vector_store, args)
+        chunks = iter_missing_chunks(supabase, chunker, missing, expected, args.page_size)
+        pipeline = Pipeline(batched(chunks, args.batch_size), upload_stages(vector_store, uploader, args),
+                            queue_size=args.queue_size)
+        for result in pipeline:
+            failed_count += result['failed']
+            print(f"   📦 +{result['uploaded']} vectors ({uploader.uploaded}/{len(missing)}, "
+                  f"{uploader.vectors_per_second():.1f} vectors/s)")
+        if failed_count:
+            print(f"   ⚠️  {failed_count} chunks failed, written to {uploader.dead_letter_path}")
+
+    vector_store.flush()
+    print(f"\n✅ Reconcile done in {time.time() - started:.0f}s")
+
+
+if __name__ == '__main__':
+    main()
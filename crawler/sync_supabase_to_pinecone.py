@@ -7,6 +7,7 @@ Script này đọc articles từ Supabase và import vào Pinecone
 
 import os
 import sys
+import time
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
@@ -17,6 +18,12 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'rag
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'rag-service'))
 import patch_torch
 
+from ingestion.chunker import chunker_from_env
+from ingestion.pipeline import Pipeline, Stage, batched
+from ingestion.reader import iter_table
+from ingestion.sync_state import SyncState
+from ingestion.uploader import Uploader, read_dead_letter
+from models.process_embedder import ProcessPoolEmbedder
 from models.vector_store import VectorStore
 
 # Load .env từ rag-service
@@ -25,135 +32,246 @@ load_dotenv(env_path)
 print(f"📁 Loaded .env from: {env_path}")
 
 
-def fetch_articles_from_supabase():
-    """Fetch articles với thông tin document từ Supabase"""
-    print("\n📥 Fetching articles from Supabase...")
-    
+# Chỉ lấy các cột cần cho embedding (không kéo theo documents.noi_dung)
+ARTICLE_COLUMNS = ('id, mapc, ten, noi_dung, document_id, chuong, muc, thu_tu, updated_at, '
+                   'documents(ten, loai, so_hieu)')
+
+
+def create_supabase_client():
+    """Supabase client từ .env (None nếu thiếu credentials)"""
     supabase_url = os.getenv('SUPABASE_URL')
     supabase_key = os.getenv('SUPABASE_ANON_KEY')
     
     if not supabase_url or not supabase_key:
         print("❌ Missing Supabase credentials!")
-        return []
+        return None
+    
+    return create_client(supabase_url, supabase_key)
+
+
+def count_articles(supabase: Client, since=None):
+    """Tổng số articles (có updated_at >= since nếu có), chỉ để hiển thị tiến độ"""
+    query = supabase.table('articles').select('id', count='exact')
+    if since is not None:
+        query = query.gte('updated_at', since)
+    response = query.limit(1).execute()
+    return response.count or 0
+
+
+def format_article(art):
+    """Chuyển 1 row articles (kèm documents) sang format của vector store, None nếu bỏ qua"""
+    # Get article info
+    article_id = art.get('id')
+    if not article_id:
+        return None
+    
+    # Get document info
+    doc_info = art.get('documents', {})
+    if not doc_info:
+        doc_info = {}
+    
+    # Create mapc
+    mapc = art.get('mapc', f"article-{article_id}")
+    
+    # Combine content
+    ten = art.get('ten', 'Untitled')
+    noi_dung = art.get('noi_dung', '')
+    
+    # Skip if no content
+    if not noi_dung or len(noi_dung) < 20:
+        return None
+    
+    # Create rich content for embedding
+    doc_ten = doc_info.get('ten', '')
+    doc_loai = doc_info.get('loai', '')
+    chuong = art.get('chuong', '')
+    
+    # Tạo nội dung đầy đủ cho embedding
+    full_content = f"{ten}\n\n{noi_dung}"
+    if doc_ten:
+        full_content = f"Văn bản: {doc_ten}\n{ten}\n\n{noi_dung}"
+    
+    return {
+        'mapc': mapc,
+        'ten': ten,
+        'noidung': full_content,
+        'article_id': article_id,
+        'document_id': art.get('document_id'),
+        'document_name': doc_ten,
+        'document_type': doc_loai,
+        'document_number': doc_info.get('so_hieu', ''),
+        'chuong': chuong,
+        'muc': art.get('muc', ''),
+        'thu_tu': art.get('thu_tu', 0),
+    }
+
+
+def split_article(art, chunker):
+    """
+    Chia 1 article thành chunks theo Điều / Khoản / Điểm và ngân sách token (ingestion.chunker);
+    article vừa 1 chunk thì giữ nguyên
+    """
+    # format_article: "<văn bản + tên điều>\n\n<nội dung>", tiêu đề được lặp ở đầu mỗi chunk
+    header, _, body = art['noidung'].partition('\n\n')
+    return chunker.chunk(art, header=header, body=body)
+
+
+def split_long_articles(articles, chunker):
+    """Chia các articles dài thành chunks nhỏ hơn"""
+    return [chunk for art in articles for chunk in split_article(art, chunker)]
+
+
+def iter_articles(supabase: Client, page_size=500):
+    """Đọc articles theo từng trang (generator), chỉ giữ 1 trang trong RAM"""
+    for art in iter_table(supabase, 'articles', columns=ARTICLE_COLUMNS, page_size=page_size):
+        article = format_article(art)
+        if article is not None:
+            yield article
+
+
+def iter_changed_rows(supabase: Client, since, page_size=500, on_updated_at=None):
+    """
+    Rows articles cần sync lại (generator)
+    
+    since=None: tất cả articles. Ngược lại: articles có updated_at >= since,
+    cộng các articles thuộc documents có updated_at >= since (nội dung
+    embedding có tên văn bản, nhưng trigger chỉ cập nhật bảng documents).
+    on_updated_at được gọi với updated_at của mọi row đã đọc (để nâng watermark).
+    """
+    on_updated_at = on_updated_at or (lambda updated_at: None)
+    
+    if since is None:
+        for row in iter_table(supabase, 'articles', columns=ARTICLE_COLUMNS, page_size=page_size):
+            on_updated_at(row.get('updated_at'))
+            yield row
+        return
+    
+    changed_since = lambda query: query.gte('updated_at', since)
+    seen = set()
+    
+    for row in iter_table(supabase, 'articles', columns=ARTICLE_COLUMNS,
+                          page_size=page_size, filters=changed_since):
+        seen.add(row['id'])
+        on_updated_at(row.get('updated_at'))
+        yield row
+    
+    documents = list(iter_table(supabase, 'documents', columns='id, updated_at',
+                                page_size=page_size, filters=changed_since))
+    for start in range(0, len(documents), 100):
+        document_ids = [doc['id'] for doc in documents[start:start + 100]]
+        in_documents = lambda query: query.in_('document_id', document_ids)
+        for row in iter_table(supabase, 'articles', columns=ARTICLE_COLUMNS,
+                              page_size=page_size, filters=in_documents):
+            if row['id'] not in seen:
+                seen.add(row['id'])
+                yield row
+    
+    for doc in documents:
+        on_updated_at(doc.get('updated_at'))
+
+
+def find_deleted_articles(supabase: Client, state, since, page_size=500):
+    """
+    Article ids có trong state nhưng đã bị xóa khỏi Supabase
+    
+    Full sync (since=None): articles trong state không được chạm tới trong lần chạy này.
+    Incremental: đọc bảng deleted_articles (trigger AFTER DELETE) có deleted_at >= since,
+    không quét id của cả bảng articles.
+    """
+    if since is None:
+        return state.unseen_articles()
     
     try:
-        supabase: Client = create_client(supabase_url, supabase_key)
-        
-        # Fetch all articles with document info
-        print("   Querying articles table...")
-        response = supabase.table('articles').select('*, documents(*)').execute()
-        articles = response.data
-        
-        print(f"   Raw articles: {len(articles)}")
-        
-        # Convert to format compatible with vector store
-        formatted_articles = []
-        for art in articles:
-            # Get article info
-            article_id = art.get('id')
-            if not article_id:
-                continue
-            
-            # Get document info
-            doc_info = art.get('documents', {})
-            if not doc_info:
-                doc_info = {}
-            
-            # Create mapc
-            mapc = art.get('mapc', f"article-{article_id}")
-            
-            # Combine content
-            ten = art.get('ten', 'Untitled')
-            noi_dung = art.get('noi_dung', '')
-            
-            # Skip if no content
-            if not noi_dung or len(noi_dung) < 20:
-                continue
-            
-            # Create rich content for embedding
-            doc_ten = doc_info.get('ten', '')
-            doc_loai = doc_info.get('loai', '')
-            chuong = art.get('chuong', '')
-            
-            # Tạo nội dung đầy đủ cho embedding
-            full_content = f"{ten}\n\n{noi_dung}"
-            if doc_ten:
-                full_content = f"Văn bản: {doc_ten}\n{ten}\n\n{noi_dung}"
-            
-            article_data = {
-                'mapc': mapc,
-                'ten': ten,
-                'noidung': full_content,
-                'article_id': article_id,
-                'document_id': art.get('document_id'),
-                'document_name': doc_ten,
-                'document_type': doc_loai,
-                'document_number': doc_info.get('so_hieu', ''),
-                'chuong': chuong,
-                'muc': art.get('muc', ''),
-                'thu_tu': art.get('thu_tu', 0),
-            }
-            
-            formatted_articles.append(article_data)
-        
-        print(f"✅ Fetched {len(formatted_articles)} articles with content")
-        return formatted_articles
-        
+        rows = iter_table(supabase, 'deleted_articles', columns='id', page_size=page_size,
+                          filters=lambda query: query.gte('deleted_at', since))
+        deleted = [str(row['id']) for row in rows]
     except Exception as e:
-        print(f"❌ Error fetching articles: {e}")
-        import traceback
-        traceback.print_exc()
+        # Database chưa chạy migration (chưa có bảng deleted_articles)
+        print(f"   ⚠️  Cannot read deleted_articles ({e}), deleted articles are only detected by a full sync")
         return []
+    # Bỏ id vừa được sync lại trong lần này (article được tạo lại với cùng id)
+    return state.unseen_articles(deleted)
 
 
-def split_long_articles(articles, max_length=2000):
-    """Chia các articles dài thành chunks nhỏ hơn"""
-    chunks = []
+def make_uploader(vector_store, args):
+    return Uploader(
+        vector_store,
+        max_batch_vectors=args.batch_size,
+        max_batch_bytes=args.max_request_bytes,
+        max_retries=args.max_retries
+    )
+
+
+def upload_stages(vector_store, uploader, args):
+    """Các bước embed (N workers) -> upsert (M workers, retry + dead-letter qua Uploader)"""
+    def embed(batch):
+        return batch, vector_store.embed_articles(batch)
     
-    for art in articles:
-        content = art['noidung']
-        
-        # Nếu ngắn, giữ nguyên
-        if len(content) <= max_length:
-            chunks.append(art)
-            continue
-        
-        # Chia thành các chunks
-        # Cố gắng chia theo đoạn văn
-        paragraphs = content.split('\n\n')
-        current_chunk = []
-        current_length = 0
-        chunk_idx = 1
-        
-        for para in paragraphs:
-            para_length = len(para)
+    def upsert(item):
+        batch, embeddings = item
+        return uploader.upload(batch, embeddings)
+    
+    return [
+        Stage('embed', embed, workers=args.embed_workers),
+        Stage('upsert', upsert, workers=args.upsert_workers),
+    ]
+
+
+def replay_dead_letter(vector_store, uploader, args):
+    """Upsert lại các articles trong file dead-letter (lỗi lần này được ghi vào file mới)"""
+    path = uploader.dead_letter_path
+    articles = read_dead_letter(path)
+    if not articles:
+        print(f"\nℹ️  Dead-letter file is empty: {path}")
+        return
+    
+    replay_path = f"{path}.replay"
+    os.replace(path, replay_path)
+    print(f"\n🔁 Replaying {len(articles)} articles from {path}")
+    
+    pipeline = Pipeline(batched(articles, args.batch_size), upload_stages(vector_store, uploader, args),
+                        queue_size=args.queue_size)
+    for result in pipeline:
+        print(f"   📦 +{result['uploaded']} vectors, failed {result['failed']} "
+              f"({uploader.vectors_per_second():.1f} vectors/s)")
+    
+    vector_store.flush()
+    os.remove(replay_path)
+    print(f"\n✅ Replay done: {uploader.stats()}")
+
+
+def run_sync_pipeline(supabase, vector_store, uploader, chunker, args, stats, state, since):
+    """
+    fetch (từng trang) -> chunk -> embed (N workers) -> upsert (M workers)
+    
+    Các bước nối bằng hàng đợi giới hạn nên chạy chồng lên nhau và RAM
+    không tăng theo số articles. Source cập nhật state (chunks của từng
+    article, watermark) và gom mapc các chunk thừa vào stats['stale'].
+    Trả về Pipeline (iterate để chạy).
+    """
+    def chunks():
+        rows = iter_changed_rows(supabase, since, page_size=args.page_size, on_updated_at=state.advance)
+        for row in rows:
+            stats['articles'] += 1
             
-            if current_length + para_length > max_length and current_chunk:
-                # Tạo chunk
-                chunk = art.copy()
-                chunk['mapc'] = f"{art['mapc']}-p{chunk_idx}"
-                chunk['ten'] = f"{art['ten']} (Phần {chunk_idx})"
-                chunk['noidung'] = '\n\n'.join(current_chunk)
-                chunks.append(chunk)
-                
-                # Reset
-                current_chunk = [para]
-                current_length = para_length
-                chunk_idx += 1
+            article = format_article(row)
+            new_chunks = split_article(article, chunker) if article else []
+            new_mapcs = [chunk['mapc'] for chunk in new_chunks]
+            
+            stats['stale'] += [mapc for mapc in state.article_chunks(row['id']) if mapc not in new_mapcs]
+            if new_mapcs:
+                state.set_article_chunks(row['id'], new_mapcs)
             else:
-                current_chunk.append(para)
-                current_length += para_length
-        
-        # Thêm phần còn lại
-        if current_chunk:
-            chunk = art.copy()
-            if chunk_idx > 1:
-                chunk['mapc'] = f"{art['mapc']}-p{chunk_idx}"
-                chunk['ten'] = f"{art['ten']} (Phần {chunk_idx})"
-            chunk['noidung'] = '\n\n'.join(current_chunk)
-            chunks.append(chunk)
+                state.remove_article(row['id'])
+            
+            stats['chunks'] += len(new_chunks)
+            yield from new_chunks
     
-    return chunks
+    return Pipeline(
+        batched(chunks(), args.batch_size),
+        upload_stages(vector_store, uploader, args),
+        queue_size=args.queue_size
+    )
 
 
 def main():
@@ -164,6 +282,27 @@ def main():
                         help='Auto-confirm without prompting')
     parser.add_argument('--batch-size', type=int, default=50,
                         help='Batch size for uploading (default: 50)')
+    parser.add_argument('--page-size', type=int, default=500,
+                        help='Articles per Supabase page (default: 500)')
+    parser.add_argument('--embed-workers', type=int, default=2,
+                        help='Parallel embedding workers (default: 2)')
+    parser.add_argument('--embed-processes', type=int, default=int(os.getenv('EMBEDDING_PROCESSES', 0)),
+                        help='Encode on N worker processes, each with its own model copy (default: EMBEDDING_PROCESSES or off)')
+    parser.add_argument('--threads-per-process', type=int,
+                        default=int(os.getenv('EMBEDDING_THREADS_PER_PROCESS', 1)),
+                        help='Torch/ONNX threads per embedding process (default: 1)')
+    parser.add_argument('--upsert-workers', type=int, default=4,
+                        help='Parallel upsert workers (default: 4)')
+    parser.add_argument('--queue-size', type=int, default=4,
+                        help='Max batches waiting between stages (default: 4)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only sync articles changed since the last successful sync (updated_at watermark)')
+    parser.add_argument('--max-request-bytes', type=int, default=2 * 1024 * 1024,
+                        help='Max upsert request payload in bytes (default: 2MB)')
+    parser.add_argument('--max-retries', type=int, default=5,
+                        help='Retries for transient upsert errors (default: 5)')
+    parser.add_argument('--replay-dead-letter', action='store_true',
+                        help='Re-upload articles from the dead-letter file and exit')
     args = parser.parse_args()
     
     print("="*70)
@@ -187,30 +326,17 @@ def main():
         
         print(f"   Index: {index_name}")
     
-    # Fetch articles
-    articles = fetch_articles_from_supabase()
-    
-    if not articles:
-        print("\n❌ No articles found in Supabase!")
-        print("   Run: python crawler/generate_fake_data.py")
-        sys.exit(1)
-    
-    # Split long articles
-    print(f"\n✂️  Processing articles...")
-    chunks = split_long_articles(articles, max_length=2000)
-    print(f"   Created {len(chunks)} chunks from {len(articles)} articles")
-    
-    # Show statistics
-    print(f"\n📊 Statistics:")
-    print(f"   - Total articles: {len(articles)}")
-    print(f"   - Total chunks: {len(chunks)}")
-    avg_length = sum(len(c['noidung']) for c in chunks) / len(chunks)
-    print(f"   - Average chunk length: {int(avg_length)} chars")
-    
     # Initialize vector store
     print(f"\n🔌 Initializing {provider} vector store...")
     try:
-        vector_store = VectorStore(provider=provider)
+        embedder = None
+        if args.embed_processes > 1:
+            embedder = ProcessPoolEmbedder(processes=args.embed_processes,
+                                           threads_per_process=args.threads_per_process)
+            # Đủ batch đang encode cùng lúc để mọi process đều có việc
+            args.embed_workers = max(args.embed_workers, args.embed_processes)
+            print(f"   Embedding on {args.embed_processes} processes x {args.threads_per_process} threads")
+        vector_store = VectorStore(provider=provider, embedder=embedder)
         print("✅ Vector store connected")
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -218,11 +344,49 @@ def main():
         traceback.print_exc()
         sys.exit(1)
     
+    if args.replay_dead_letter:
+        replay_dead_letter(vector_store, make_uploader(vector_store, args), args)
+        return
+    
+    # Watermark của lần sync thành công gần nhất
+    state = SyncState(f"{provider}:{vector_store.index_name}")
+    # Đọc lại từ watermark - overlap: row commit muộn có thể mang updated_at nhỏ hơn watermark
+    since = state.since() if args.incremental else None
+    if args.incremental:
+        if since:
+            print(f"\n🕒 Incremental sync: articles updated since {since} (watermark {state.watermark})")
+        else:
+            print("\n🕒 No previous sync state found, running a full sync")
+    
+    # Count articles
+    print("\n📥 Connecting to Supabase...")
+    supabase = create_supabase_client()
+    if supabase is None:
+        sys.exit(1)
+    
+    try:
+        total_articles = count_articles(supabase)
+        changed_articles = count_articles(supabase, since) if since else total_articles
+    except Exception as e:
+        print(f"❌ Error counting articles: {e}")
+        sys.exit(1)
+    
+    if not total_articles:
+        print("\n❌ No articles found in Supabase!")
+        print("   Run: python crawler/generate_fake_data.py")
+        sys.exit(1)
+    
+    print(f"   Articles in Supabase: {total_articles}")
+    if since:
+        print(f"   Changed articles: {changed_articles} (+ articles of changed documents)")
+    
     # Confirm
     if not args.auto_confirm:
-        print(f"\n⚠️  About to create embeddings for {len(chunks)} text chunks")
-        print(f"   This may take 5-15 minutes depending on data size...")
-        print(f"   Embedding model: paraphrase-multilingual-mpnet-base-v2")
+        print(f"\n⚠️  About to create embeddings for {changed_articles} articles (long articles are split into chunks)")
+        if not since:
+            print(f"   This may take 5-15 minutes depending on data size...")
+        print(f"   Embedding model: {os.getenv('EMBEDDING_MODEL', 'paraphrase-multilingual-mpnet-base-v2')} "
+              f"({os.getenv('EMBEDDING_BACKEND', 'torch')})")
         
         confirm = input("\n   Continue? (y/n): ")
         if confirm.lower() != 'y':
@@ -231,36 +395,68 @@ def main():
     else:
         print("\n✅ Auto-confirm enabled, proceeding...")
     
-    # Upload to vector store
+    # Fetch -> chunk -> embed -> upsert (streaming)
     print(f"\n🚀 Creating embeddings and uploading to {provider}...")
-    print("   This will take a while, please be patient...")
+    print(f"   Pipeline: page={args.page_size}, batch={args.batch_size}, "
+          f"embed workers={args.embed_workers}, upsert workers={args.upsert_workers}")
+    
+    stats = {'articles': 0, 'chunks': 0, 'stale': []}
+    uploader = make_uploader(vector_store, args)
+    chunker = chunker_from_env(vector_store.embedder)
+    print(f"   Chunks: <= {chunker.max_tokens} tokens, overlap {chunker.overlap_tokens} tokens")
+    total_uploaded = 0
+    failed_count = 0
+    started = time.time()
     
     try:
-        batch_size = args.batch_size
-        total_uploaded = 0
-        failed_count = 0
+        pipeline = run_sync_pipeline(supabase, vector_store, uploader, chunker, args, stats, state, since)
+        for batch_num, result in enumerate(pipeline, 1):
+            total_uploaded += result['uploaded']
+            failed_count += result['failed']
+            print(f"   📦 Batch {batch_num}: +{result['uploaded']} vectors "
+                  f"(articles {stats['articles']}/{changed_articles}, uploaded {total_uploaded}, "
+                  f"{uploader.vectors_per_second():.1f} vectors/s, {time.time() - started:.0f}s)")
         
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i:i+batch_size]
-            batch_num = (i // batch_size) + 1
-            total_batches = (len(chunks) + batch_size - 1) // batch_size
-            
-            print(f"\n   📦 Batch {batch_num}/{total_batches} ({len(batch)} items)...")
-            
-            try:
-                count = vector_store.upsert_batch(batch)
-                total_uploaded += count
-                print(f"      ✅ Uploaded {count} vectors")
-                print(f"      Progress: {total_uploaded}/{len(chunks)} ({100*total_uploaded//len(chunks)}%)")
-            except Exception as e:
-                failed_count += len(batch)
-                print(f"      ❌ Batch failed: {e}")
+        # Xóa chunks thừa (article ngắn đi) và chunks của articles đã bị xóa
+        deleted_articles = find_deleted_articles(supabase, state, since, page_size=args.page_size)
+        for article_id in deleted_articles:
+            stats['stale'] += state.remove_article(article_id)
+        if stats['stale']:
+            vector_store.delete(stats['stale'])
+            print(f"   🗑️  Deleted {len(stats['stale'])} stale vectors ({len(deleted_articles)} deleted articles)")
+        
+        vector_store.flush()
+        
+        # Chỉ nâng watermark khi mọi batch thành công (lần sau sync lại phần lỗi)
+        if failed_count == 0:
+            state.save()
+            print(f"   🕒 Sync watermark: {state.watermark}")
+        else:
+            print("   ⚠️  Some batches failed, sync watermark not updated")
         
+        total_chunks = stats['chunks']
         print(f"\n{'='*70}")
         print(f"✅ UPLOAD COMPLETE!")
+        print(f"   - Articles: {stats['articles']}, chunks: {total_chunks}, stale vectors deleted: {len(stats['stale'])}")
         print(f"   - Successfully uploaded: {total_uploaded} vectors")
         print(f"   - Failed: {failed_count}")
-        print(f"   - Success rate: {100*total_uploaded//len(chunks)}%")
+        if failed_count:
+            print(f"     Dead-letter: {uploader.dead_letter_path} (re-run with --replay-dead-letter)")
+        print(f"   - Throughput: {uploader.vectors_per_second():.1f} vectors/s "
+              f"({uploader.requests} requests, {uploader.retries} retries)")
+        print(f"   - Success rate: {100*total_uploaded//total_chunks if total_chunks else 0}%")
+        print(f"   - Time: {time.time() - started:.0f}s")
+        print(f"   - Chunks/s (end to end): {total_chunks / max(time.time() - started, 1e-9):.1f}")
+        if isinstance(vector_store.embedder, ProcessPoolEmbedder):
+            embedding = vector_store.embedder.stats()
+            print(f"     ({embedding['processes']} processes: {embedding['texts_per_second']} texts/s "
+                  f"encoded, cache misses only)")
+        if vector_store.chunk_cache is not None:
+            cache = vector_store.chunk_cache.stats()
+            print(f"   - Embedding cache: {cache['hits']} hits, {cache['misses']} encoded")
+        for name, stage in pipeline.stats()['stages'].items():
+            print(f"   - {name}: {stage['processed']} batches, busy {stage['busy_seconds']}s "
+                  f"({stage['workers']} workers)")
         print(f"{'='*70}")
         
     except Exception as e:
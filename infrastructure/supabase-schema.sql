@@ -69,6 +69,148 @@ CREATE INDEX idx_articles_noidung ON articles USING gin(to_tsvector('simple', no
 -- Index cho sắp xếp theo thứ tự
 CREATE INDEX idx_articles_thutu ON articles(document_id, thu_tu);
 
+-- =====================================================
+-- FULL-TEXT SEARCH: tsvector lưu sẵn + hàm search_articles
+-- Viết dạng idempotent: có thể chạy lại riêng phần này
+-- trên database đã tồn tại
+-- =====================================================
+
+-- tsvector lưu sẵn (tên điều có trọng số A, nội dung trọng số B)
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(ten, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(noi_dung, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_articles_search_vector ON articles USING gin(search_vector);
+
+-- Index cho sync incremental (lọc theo updated_at)
+CREATE INDEX IF NOT EXISTS idx_articles_updated_at ON articles(updated_at);
+CREATE INDEX IF NOT EXISTS idx_documents_updated_at ON documents(updated_at);
+
+-- Articles đã bị xóa (trigger AFTER DELETE), để sync incremental phát hiện
+-- articles bị xóa mà không phải đọc lại id của cả bảng. TRUNCATE không kích
+-- hoạt trigger: sau TRUNCATE chạy full sync hoặc reconcile_pinecone.py.
+CREATE TABLE IF NOT EXISTS deleted_articles (
+    id INT PRIMARY KEY,
+    deleted_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_deleted_articles_deleted_at ON deleted_articles(deleted_at);
+
+CREATE OR REPLACE FUNCTION record_deleted_article()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO deleted_articles (id, deleted_at) VALUES (OLD.id, NOW())
+    ON CONFLICT (id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS record_articles_deleted ON articles;
+CREATE TRIGGER record_articles_deleted
+    AFTER DELETE ON articles
+    FOR EACH ROW
+    EXECUTE FUNCTION record_deleted_article();
+
+-- Âm tiết quá phổ biến (hư từ, từ để hỏi): có trong gần như mọi điều luật,
+-- nếu đưa vào truy vấn OR thì mỗi câu hỏi phải xếp hạng gần hết bảng
+CREATE OR REPLACE FUNCTION search_stopwords()
+RETURNS TEXT[]
+LANGUAGE sql IMMUTABLE
+AS $$
+    SELECT ARRAY[
+        'của', 'và', 'là', 'các', 'những', 'có', 'được', 'cho', 'trong', 'với',
+        'không', 'này', 'đó', 'khi', 'thì', 'một', 'người', 'theo', 'về', 'từ',
+        'tại', 'để', 'đến', 'bị', 'do', 'hoặc', 'nào', 'gì', 'bao', 'nhiêu',
+        'như', 'thế', 'sao', 'ra', 'lại', 'mà', 'nếu', 'đã', 'sẽ', 'phải',
+        'hay', 'vào', 'trên', 'đối', 'việc', 'bởi', 'nhưng', 'cũng', 'còn', 'ai'
+    ]::TEXT[];
+$$;
+
+-- Tìm kiếm điều luật xếp hạng bằng ts_rank trong 1 query
+-- - Khớp bất kỳ từ khóa nào (OR, bỏ các âm tiết trong search_stopwords()),
+--   khớp cả cụm từ được cộng điểm
+-- - Nếu không đủ match_limit kết quả thì bổ sung các điều luật mới nhất
+--   (updated_at giảm dần, rank = 0)
+-- Gọi qua PostgREST: POST /rest/v1/rpc/search_articles
+--   {"query_text": "...", "match_limit": 3}
+CREATE OR REPLACE FUNCTION search_articles(query_text TEXT, match_limit INT DEFAULT 3)
+RETURNS TABLE (
+    id INT,
+    mapc VARCHAR,
+    ten VARCHAR,
+    noi_dung TEXT,
+    document_id INT,
+    rank REAL
+)
+LANGUAGE plpgsql STABLE
+AS $$
+#variable_conflict use_column
+DECLARE
+    keyword_query tsquery;
+    phrase_query tsquery;
+    found_count INT := 0;
+BEGIN
+    SELECT to_tsquery('simple', string_agg(quote_literal(lexeme), ' | '))
+    INTO keyword_query
+    FROM unnest(tsvector_to_array(to_tsvector('simple', coalesce(query_text, '')))) AS lexeme
+    WHERE lexeme <> ALL (search_stopwords());
+
+    phrase_query := phraseto_tsquery('simple', coalesce(query_text, ''));
+
+    IF keyword_query IS NOT NULL THEN
+        RETURN QUERY
+        SELECT
+            a.id,
+            a.mapc,
+            a.ten,
+            a.noi_dung,
+            a.document_id,
+            (ts_rank(a.search_vector, keyword_query) +
+                CASE WHEN a.search_vector @@ phrase_query THEN 1 ELSE 0 END)::REAL
+        FROM articles a
+        WHERE a.search_vector @@ keyword_query
+        ORDER BY 6 DESC, a.id
+        LIMIT match_limit;
+
+        GET DIAGNOSTICS found_count = ROW_COUNT;
+    END IF;
+
+    IF found_count < match_limit THEN
+        RETURN QUERY
+        SELECT a.id, a.mapc, a.ten, a.noi_dung, a.document_id, 0::REAL
+        FROM articles a
+        WHERE keyword_query IS NULL OR NOT (a.search_vector @@ keyword_query)
+        ORDER BY a.updated_at DESC NULLS LAST, a.id DESC
+        LIMIT match_limit - found_count;
+    END IF;
+END;
+$$;
+
+-- Tìm kiếm cho nhiều câu hỏi trong 1 round trip (dùng cho POST /api/v1/questions)
+-- query_index: vị trí (bắt đầu từ 0) của câu hỏi trong mảng query_texts
+CREATE OR REPLACE FUNCTION search_articles_batch(query_texts TEXT[], match_limit INT DEFAULT 3)
+RETURNS TABLE (
+    query_index INT,
+    id INT,
+    mapc VARCHAR,
+    ten VARCHAR,
+    noi_dung TEXT,
+    document_id INT,
+    rank REAL
+)
+LANGUAGE sql STABLE
+AS $$
+    -- Giữ nguyên thứ tự search_articles trả về (rank DESC, id; các điều luật bổ sung
+    -- rank = 0 theo updated_at DESC NULLS LAST, id DESC) để khớp với câu hỏi đơn lẻ
+    SELECT (q.ord - 1)::INT, r.id, r.mapc, r.ten, r.noi_dung, r.document_id, r.rank
+    FROM unnest(query_texts) WITH ORDINALITY AS q(query_text, ord)
+    CROSS JOIN LATERAL search_articles(q.query_text, match_limit)
+        WITH ORDINALITY AS r(id, mapc, ten, noi_dung, document_id, rank, pos)
+    ORDER BY q.ord, r.pos;
+$$;
+
 -- =====================================================
 -- FUNCTIONS: Auto update updated_at timestamp
 -- =====================================================